@@ -0,0 +1,285 @@
+"""
+Admission control for the HTTP transport: rate limits, concurrency limits, load shedding.
+
+Every request that runs tools passes three gates, keyed by client address.
+Behind a reverse proxy every request arrives from the proxy, so the address
+is read from ``X-Forwarded-For`` instead: the entry added by the outermost of
+``MCP_TRUSTED_PROXIES`` proxies. Entries before it are whatever the client
+sent and are ignored, so a client can't pick a fresh key per request. The
+bearer token is not used: ``MCP_API_TOKEN`` is shared by every caller, and
+an unverified header would mint new keys just as easily.
+
+1. Token buckets, one per client and one for the server, refilled at
+   ``*_RATE`` requests per second up to ``*_BURST``. An empty bucket rejects
+   the request at once: 429, with Retry-After set to when the next token is due.
+2. The client's concurrency limit. Over it, the request waits in the client's
+   own bounded queue; if that is full or the deadline passes, 429.
+3. The server-wide concurrency limit, with a bounded FIFO queue; if that is
+   full or the deadline passes, 503.
+
+The deadline (``MCP_QUEUE_TIMEOUT``) covers both queues, so a request never
+waits longer than that before it starts or is turned away, and a client that
+floods the server fills its own queue first. Retry-After on a 503 is derived
+from the recent request duration and the queue length.
+
+Settings, read from the environment (0 turns a rate limit off):
+
+- ``MCP_ADMISSION``                  0 to admit everything (default on)
+- ``MCP_MAX_CONCURRENT``             requests running at once (default 64)
+- ``MCP_MAX_QUEUE``                  requests waiting for those (default 256)
+- ``MCP_MAX_CONCURRENT_PER_CLIENT``  per client (default 16)
+- ``MCP_MAX_QUEUE_PER_CLIENT``       per client (default 32)
+- ``MCP_QUEUE_TIMEOUT``              seconds a request may wait (default 2)
+- ``MCP_RATE`` / ``MCP_BURST``       server-wide requests/second and bucket size
+- ``MCP_RATE_PER_CLIENT`` / ``MCP_BURST_PER_CLIENT``  the same per client
+- ``MCP_TRUSTED_PROXIES``            reverse proxies in front of the server
+  (default 1 on Render, which sets ``RENDER``; otherwise 0)
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+import metrics
+
+ADMISSIONS = metrics.registry.counter(
+    "mcp_admission_total",
+    "Requests by admission outcome: admitted, queued (admitted after waiting), "
+    "rate_limited, client_busy (429) or overloaded (503)",
+    ("outcome",))
+QUEUE_SECONDS = metrics.registry.histogram("mcp_admission_wait_seconds", "Time admitted requests spent queued")
+
+# Clients whose buckets are remembered; the least recently seen are forgotten first
+MAX_CLIENTS = 10000
+
+
+class Rejected(Exception):
+    """A request turned away; ``status`` is 429 or 503"""
+
+    def __init__(self, status: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; 0 if there was one, else the seconds until there will be"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Limiter:
+    """At most ``limit`` holders; up to ``max_queue`` more wait in FIFO order"""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not self._waiters
+
+    async def acquire(self, timeout: float) -> bool:
+        """True once a slot is held; False if the queue is full or ``timeout`` passes"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_queue or timeout <= 0:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as exc:  # timed out, or the client went away
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as we gave up
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.TimeoutError):
+                return False
+            raise
+        return True
+
+    def release(self):
+        # Hand the slot straight to the next waiter so nobody can jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+
+class Ticket:
+    """An admitted request; ``release()`` exactly once when it is done"""
+
+    def __init__(self, admission: "Admission", key: Optional[str], client: Optional[Limiter]):
+        self._admission = admission
+        self._key = key
+        self._client = client
+        self._start = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._admission._release(self._key, self._client, time.monotonic() - self._start)
+
+
+class Admission:
+    """Rate limits, concurrency limits and bounded queues, per client and overall"""
+
+    def __init__(self, max_concurrent: int = 64, max_queue: int = 256,
+                 max_concurrent_per_client: int = 16, max_queue_per_client: int = 32,
+                 queue_timeout: float = 2.0, rate: float = 0.0, burst: float = 0.0,
+                 rate_per_client: float = 0.0, burst_per_client: float = 0.0,
+                 trusted_proxies: int = 0, enabled: bool = True):
+        self.enabled = enabled
+        self.trusted_proxies = max(0, trusted_proxies)
+        self.queue_timeout = queue_timeout
+        self.max_concurrent_per_client = max_concurrent_per_client
+        self.max_queue_per_client = max_queue_per_client
+        self.rate_per_client = rate_per_client
+        self.burst_per_client = burst_per_client or rate_per_client
+        self._global = Limiter(max_concurrent, max_queue)
+        self._bucket = TokenBucket(rate, burst or rate) if rate > 0 else None
+        self._clients: Dict[str, Limiter] = {}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._service_time = 0.05  # moving average of request duration, seconds
+
+    @classmethod
+    def from_env(cls) -> "Admission":
+        def number(name: str, default: float) -> float:
+            return float(os.getenv(name) or default)
+
+        return cls(
+            max_concurrent=int(number("MCP_MAX_CONCURRENT", 64)),
+            max_queue=int(number("MCP_MAX_QUEUE", 256)),
+            max_concurrent_per_client=int(number("MCP_MAX_CONCURRENT_PER_CLIENT", 16)),
+            max_queue_per_client=int(number("MCP_MAX_QUEUE_PER_CLIENT", 32)),
+            queue_timeout=number("MCP_QUEUE_TIMEOUT", 2.0),
+            rate=number("MCP_RATE", 0), burst=number("MCP_BURST", 0),
+            rate_per_client=number("MCP_RATE_PER_CLIENT", 0),
+            burst_per_client=number("MCP_BURST_PER_CLIENT", 0),
+            trusted_proxies=int(number("MCP_TRUSTED_PROXIES", 1 if os.getenv("RENDER") else 0)),
+            enabled=os.getenv("MCP_ADMISSION", "1").lower() not in ("0", "false", "no", "off"),
+        )
+
+    def client_address(self, forwarded_for: Optional[str], peer: Optional[str]) -> str:
+        """The client's address: ``peer`` (the connecting address), or with
+        trusted proxies the ``X-Forwarded-For`` entry the outermost one added"""
+        hops: List[str] = [h.strip() for h in (forwarded_for or "").split(",") if h.strip()]
+        hops.append(peer or "unknown")
+        # Each trusted proxy appended the address it was connected from; the
+        # nearest one is ``peer`` itself
+        return hops[max(0, len(hops) - 1 - self.trusted_proxies)]
+
+    def _client_bucket(self, key: str) -> Optional[TokenBucket]:
+        if self.rate_per_client <= 0:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate_per_client, self.burst_per_client)
+            if len(self._buckets) > MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _reject(self, status: int, retry_after: float, outcome: str, reason: str) -> Rejected:
+        if metrics.ENABLED:
+            ADMISSIONS.inc(outcome)
+        return Rejected(status, retry_after, reason)
+
+    def _backlog_seconds(self, limiter: Limiter) -> float:
+        """Rough time until a new arrival at ``limiter`` would get a slot"""
+        return self._service_time * (limiter.waiting + 1) / max(limiter.limit, 1)
+
+    async def admit(self, key: str) -> Ticket:
+        """Wait for a slot for client ``key``; raises Rejected when it can't have one in time"""
+        if not self.enabled:
+            return Ticket(self, None, None)
+        bucket = self._client_bucket(key)
+        wait = bucket.take() if bucket else 0.0
+        if wait:
+            raise self._reject(429, wait, "rate_limited", "Rate limit exceeded for this client")
+        if self._bucket is not None:
+            wait = self._bucket.take()
+            if wait:
+                raise self._reject(503, wait, "overloaded", "Server request rate limit reached")
+
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = Limiter(self.max_concurrent_per_client, self.max_queue_per_client)
+        if not await client.acquire(deadline - time.monotonic()):
+            retry = self._backlog_seconds(client)
+            self._forget_idle(key, client)
+            raise self._reject(429, retry, "client_busy", "Too many concurrent requests from this client")
+        try:
+            admitted = await self._global.acquire(deadline - time.monotonic())
+        except BaseException:
+            self._release_client(key, client)
+            raise
+        if not admitted:
+            self._release_client(key, client)
+            raise self._reject(503, self._backlog_seconds(self._global), "overloaded",
+                               "Server is overloaded; retry later")
+        waited = time.monotonic() - start
+        if metrics.ENABLED:
+            ADMISSIONS.inc("queued" if waited > 0.001 else "admitted")
+            QUEUE_SECONDS.observe(waited)
+        return Ticket(self, key, client)
+
+    def _release(self, key: Optional[str], client: Optional[Limiter], seconds: float):
+        if client is None:
+            return
+        self._service_time += (seconds - self._service_time) * 0.1
+        self._global.release()
+        self._release_client(key, client)
+
+    def _release_client(self, key: str, client: Limiter):
+        client.release()
+        self._forget_idle(key, client)
+
+    def _forget_idle(self, key: str, client: Limiter):
+        if client.idle and self._clients.get(key) is client:
+            del self._clients[key]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "active": self._global.active,
+            "queued": self._global.waiting,
+            "clients": len(self._clients),
+            "avg_request_seconds": round(self._service_time, 4),
+        }
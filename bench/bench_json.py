@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+CPU cost of encoding a large note, before and after the single-pass encoder.
+
+Three response paths are reproduced in-process, each for the old and the new
+encoding:
+
+- ``tools/call``: the tool result becomes the ``text`` of a content block,
+  then the envelope is rendered. Before: ``json.dumps`` twice. After:
+  ``jsonenc.dumps_str`` for the result and ``JSONBytesResponse`` for the envelope.
+- ``mcp/message``: the same content inside a JSON-RPC response.
+- ``GET /notes/{id}``: before, FastAPI validated the row against
+  ``response_model=Note`` and ran ``jsonable_encoder`` before rendering.
+  After, the row is rendered by ``JSONBytesResponse`` directly.
+
+Times are CPU time (``time.process_time``) per response. The fallback columns
+show jsonenc with orjson disabled.
+
+    python bench/bench_json.py --size 1000000 --iterations 50
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import jsonenc  # noqa: E402
+from schemas import Note  # noqa: E402
+
+
+def large_note(size: int, seed: int):
+    rng = random.Random(seed)
+    words = ["note", "project", "meeting", "design", "über", "naïve", "日本語", "\"quoted\"", "tab\there"]
+    lines, length = [], 0
+    while length < size:
+        line = " ".join(rng.choices(words, k=12))
+        lines.append(line)
+        length += len(line.encode()) + 1
+    content = "\n".join(lines)
+    return {"id": 1, "title": "A large note", "content": content, "tags": ["bench", "large"],
+            "size_bytes": len(content.encode()), "created_at": "2024-01-01T00:00:00+00:00",
+            "updated_at": "2024-01-02T00:00:00+00:00"}
+
+
+def old_tools_call(note):
+    result = {"success": True, "note": note}
+    return JSONResponse({"content": [{"type": "text", "text": json.dumps(result)}]}).body
+
+
+def new_tools_call(note):
+    result = {"success": True, "note": note}
+    return jsonenc.JSONBytesResponse({"content": [{"type": "text", "text": jsonenc.dumps_str(result)}]}).body
+
+
+def old_rpc(note):
+    result = {"success": True, "note": note}
+    content = {"content": [{"type": "text", "text": json.dumps(result)}]}
+    return JSONResponse({"jsonrpc": "2.0", "id": 1, "result": content}).body
+
+
+def new_rpc(note):
+    result = {"success": True, "note": note}
+    content = {"content": [{"type": "text", "text": jsonenc.dumps_str(result)}]}
+    return jsonenc.JSONBytesResponse({"jsonrpc": "2.0", "id": 1, "result": content}).body
+
+
+def old_get_note(note):
+    return JSONResponse(jsonable_encoder(Note(**note))).body
+
+
+def new_get_note(note):
+    return jsonenc.JSONBytesResponse(note).body
+
+
+def decoded(body: bytes):
+    """The response with any embedded ``text`` JSON parsed, for comparison"""
+    doc = json.loads(body)
+    blocks = doc.get("result", doc).get("content")
+    for block in blocks if isinstance(blocks, list) else []:
+        block["text"] = json.loads(block["text"])
+    return doc
+
+
+def cpu_ms(fn, note, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.process_time()
+        fn(note)
+        samples.append((time.process_time() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON encoding cost of a large note")
+    parser.add_argument("--size", type=int, default=1_000_000, help="note content size in bytes")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    note = large_note(args.size, args.seed)
+    print(f"🧪 {note['size_bytes'] / 1e6:.2f} MB note, median CPU ms over {args.iterations} runs"
+          f" (orjson {'installed' if jsonenc.orjson else 'not installed'})")
+    orjson = jsonenc.orjson
+    cases = [("tools/call", old_tools_call, new_tools_call),
+             ("mcp/message", old_rpc, new_rpc),
+             ("GET /notes/{id}", old_get_note, new_get_note)]
+    print(f"   {'path':<16} {'before':>9} {'after':>9} {'fallback':>9}")
+    for name, old, new in cases:
+        # Both must carry the same data; only whitespace and escaping differ
+        assert decoded(old(note)) == decoded(new(note)), name
+        before = cpu_ms(old, note, args.iterations)
+        after = cpu_ms(new, note, args.iterations)
+        jsonenc.orjson = None
+        try:
+            fallback = cpu_ms(new, note, args.iterations)
+        finally:
+            jsonenc.orjson = orjson
+        print(f"   {name:<16} {before:9.2f} {after:9.2f} {fallback:9.2f}   {before / after:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
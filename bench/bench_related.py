@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Build and query time of the related-notes index on a synthetic vault.
+
+Builds the index as the server does at startup (``add`` per note, then
+``finish``), times ``related`` and ``similar`` queries, then reopens the
+memory-mapped files to time a restart where no note has changed.
+
+    python bench/bench_related.py --notes 100000 --queries 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_search import percentile, synthetic_vault  # noqa: E402
+from related_index import DEFAULT_DIM, RelatedIndex  # noqa: E402
+
+
+def build(path, notes, dim):
+    index = RelatedIndex(path, dim)
+    for note in notes:
+        index.add(note)
+    asyncio.run(index.finish())
+    index.ready = True
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Related-notes index build and query time")
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    notes, vocabulary, weights = synthetic_vault(args.notes, args.seed)
+    rng = random.Random(args.seed + 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "related.npy")
+        start = time.perf_counter()
+        index = build(path, notes, args.dim)
+        built = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        print(f"🧪 {args.notes} notes, dim {args.dim}: built in {built:.1f}s, {size / 1e6:.0f} MB on disk")
+
+        samples = {"related": [], "similar": []}
+        for _ in range(args.queries):
+            note_id = rng.randint(1, args.notes)
+            start = time.perf_counter()
+            index.related(note_id, 10)
+            samples["related"].append((time.perf_counter() - start) * 1000)
+            text = " ".join(rng.choices(vocabulary, weights, k=8))
+            start = time.perf_counter()
+            index.similar(text, 10)
+            samples["similar"].append((time.perf_counter() - start) * 1000)
+        for name, values in samples.items():
+            print(f"   {name:<8} p50 {statistics.median(values):6.2f} ms   p95 {percentile(values, 95):6.2f} ms")
+
+        start = time.perf_counter()
+        reopened = build(path, notes, args.dim)
+        print(f"   restart with no changes: {time.perf_counter() - start:.1f}s"
+              f" ({len(reopened)} notes, vectors reused)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compare the BM25 index against the ilike scan on a synthetic vault.
+
+The ilike path is reproduced in-process as a case-insensitive substring scan
+over title and content - the work Postgres does for ``ilike '%q%'`` without a
+trigram index - so both sides are measured without network noise.
+
+A note counts as relevant when it contains every query token. Recall for
+ilike is the share of relevant notes it returns. For BM25 it is measured on
+the top-R results, where R is the number of relevant notes.
+
+    python bench/bench_search.py --notes 100000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from search_index import SearchIndex, tokenize  # noqa: E402
+
+
+def synthetic_vault(count: int, seed: int):
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(20000)] + [
+        "python", "project", "meeting", "design", "review", "journal", "research", "idea"]
+    # Zipf-like word frequencies, as in natural text
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    notes = []
+    for note_id in range(1, count + 1):
+        words = rng.choices(vocabulary, weights, k=rng.randint(30, 300))
+        title = " ".join(rng.choices(vocabulary, weights, k=4))
+        notes.append({"id": note_id, "title": title, "content": " ".join(words),
+                      "tags": [], "updated_at": "2024-01-01T00:00:00+00:00"})
+    return notes, vocabulary, weights
+
+
+def ilike_scan(notes, query: str):
+    needle = query.lower()
+    return [n["id"] for n in notes if needle in n["title"].lower() or needle in n["content"].lower()]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 index vs ilike scan")
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"🧪 Generating {args.notes} synthetic notes...")
+    notes, vocabulary, weights = synthetic_vault(args.notes, args.seed)
+    token_sets = {n["id"]: set(tokenize(n["title"])) | set(tokenize(n["content"])) for n in notes}
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    index = SearchIndex()
+    for note in notes:
+        index.add(note)
+    build_time = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux; the notes themselves were allocated before
+    index_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+    rng = random.Random(args.seed + 1)
+    mid_band = vocabulary[200:5000]
+    queries = []
+    for i in range(args.queries):
+        terms = rng.sample(mid_band, 1 if i % 3 == 0 else 2)
+        # Every few queries gets punctuation, as typed by users
+        queries.append(", ".join(terms) if i % 4 == 0 else " ".join(terms))
+
+    index_times, scan_times, index_recall, scan_recall = [], [], [], []
+    for query in queries:
+        terms = set(tokenize(query))
+        relevant = {note_id for note_id, tokens in token_sets.items() if terms <= tokens}
+
+        start = time.perf_counter()
+        scan_hits = ilike_scan(notes, query)
+        scan_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index_hits = index.search(query, limit=max(len(relevant), 20))
+        index_times.append(time.perf_counter() - start)
+
+        if relevant:
+            scan_recall.append(len(relevant & set(scan_hits)) / len(relevant))
+            top = {h["id"] for h in index_hits[:len(relevant)]}
+            index_recall.append(len(relevant & top) / len(relevant))
+
+    def row(name, times, recall):
+        ms = [t * 1000 for t in times]
+        mean_recall = statistics.mean(recall) if recall else float("nan")
+        print(f"   {name:<6} p50 {percentile(ms, 50):8.2f} ms   p95 {percentile(ms, 95):8.2f} ms   "
+              f"recall {mean_recall:6.3f}")
+
+    print(f"📊 {args.notes} notes, {len(queries)} queries ({len(index_recall)} with relevant notes)")
+    print(f"   index build {build_time:.1f} s, +{index_rss / 1024:.0f} MiB RSS, "
+          f"{index.stats()['terms']} terms, {index.stats()['postings']} postings")
+    row("bm25", index_times, index_recall)
+    row("ilike", scan_times, scan_recall)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Show that concurrent crud calls overlap instead of queueing.
+
+Starts the fake PostgREST with a fixed latency, fires N ``get_note`` calls
+at once through crud.py and compares the wall time with N sequential calls.
+With a non-blocking data layer the concurrent run takes roughly one latency,
+not N of them.
+
+    python bench/concurrency_demo.py --calls 20 --latency 100
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_postgrest import FakePostgrest, serve_in_thread  # noqa: E402
+
+
+async def run(calls: int):
+    import crud
+
+    start = time.perf_counter()
+    for i in range(calls):
+        await crud.get_note(i % 10 + 1)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(crud.get_note(i % 10 + 1) for i in range(calls)))
+    concurrent = time.perf_counter() - start
+
+    await crud.close_backend()
+    return sequential, concurrent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent vs sequential crud calls")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=100.0, help="fake backend latency (ms)")
+    args = parser.parse_args()
+
+    fake = FakePostgrest(latency_ms=args.latency, seed_notes=10)
+    url, server = serve_in_thread(fake)
+    os.environ["sb_url"] = url
+    os.environ["sb_api"] = "dev"
+
+    sequential, concurrent = asyncio.run(run(args.calls))
+    server.should_exit = True
+
+    print(f"📊 {args.calls} calls at {args.latency:.0f} ms backend latency")
+    print(f"   sequential: {sequential * 1000:8.1f} ms")
+    print(f"   concurrent: {concurrent * 1000:8.1f} ms ({sequential / concurrent:.1f}x)")
+    print(f"   max requests in flight at backend: {fake.max_in_flight}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+In-memory stand-in for the Supabase REST (PostgREST) endpoint.
+
+Implements the subset of PostgREST that crud.py uses - select/insert/update on
+``/rest/v1/<table>`` with eq/neq/gt/gte/lt/lte/like/ilike/in/cs filters, nested
+or()/and(), order, limit and single-object responses - plus an artificial
+per-request latency so concurrency behaviour can be observed locally. Deleting
+notes records ``note_tombstones`` rows, and every write to notes takes the
+next ``change_seq``, as the triggers in the README do; ``note_changes`` is
+served like the README's view over both.
+
+Run standalone:
+    python bench/fake_postgrest.py --port 54321 --latency 50 --notes 1000
+
+then point the server at it with ``sb_url=http://127.0.0.1:54321 sb_api=dev``.
+"""
+
+import argparse
+import asyncio
+import re
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+def utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top(expr: str) -> List[str]:
+    """Split on commas that are outside quotes, braces and parentheses"""
+    parts, depth, quoted, buf = [], 0, False, []
+    i = 0
+    while i < len(expr):
+        ch = expr[i]
+        if quoted:
+            buf.append(ch)
+            if ch == "\\" and i + 1 < len(expr):
+                buf.append(expr[i + 1])
+                i += 1
+            elif ch == '"':
+                quoted = False
+        elif ch == '"':
+            quoted = True
+            buf.append(ch)
+        elif ch in "({":
+            depth += 1
+            buf.append(ch)
+        elif ch in ")}":
+            depth -= 1
+            buf.append(ch)
+        elif ch == "," and depth == 0:
+            parts.append("".join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    if buf:
+        parts.append("".join(buf))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+
+def _coerce(sample: Any, value: str) -> Any:
+    if isinstance(sample, bool):
+        return value == "true"
+    if isinstance(sample, int):
+        return int(value)
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def _like(pattern: str, flags: int = 0):
+    regex = "".join(".*" if c in "*%" else re.escape(c) for c in pattern)
+    return re.compile(f"^{regex}$", flags | re.DOTALL)
+
+
+def _match(row: Dict[str, Any], column: str, op: str, raw: str) -> bool:
+    negate = op.startswith("not.")
+    if negate:
+        op = op[4:]
+    value = row.get(column)
+    if op == "is":
+        result = value is None if raw == "null" else value == (raw == "true")
+    elif value is None:
+        result = False
+    elif op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        other = _coerce(value, _unquote(raw))
+        result = {
+            "eq": value == other, "neq": value != other,
+            "gt": value > other, "gte": value >= other,
+            "lt": value < other, "lte": value <= other,
+        }[op]
+    elif op in ("like", "ilike"):
+        result = bool(_like(_unquote(raw), re.IGNORECASE if op == "ilike" else 0).match(str(value)))
+    elif op == "in":
+        items = [_coerce(value, _unquote(v)) for v in _split_top(raw[1:-1])]
+        result = value in items
+    elif op in ("cs", "ov"):
+        items = {_unquote(v) for v in _split_top(raw[1:-1]) if v}
+        have = set(value or [])
+        result = items <= have if op == "cs" else bool(items & have)
+    else:
+        raise ValueError(f"unsupported operator {op}")
+    return not result if negate else result
+
+
+def _logical(row: Dict[str, Any], kind: str, body: str) -> bool:
+    results = (_expr(row, part) for part in _split_top(body))
+    return any(results) if kind == "or" else all(results)
+
+
+def _expr(row: Dict[str, Any], expr: str) -> bool:
+    # col.op.value | or(...) | and(...)
+    for kind in ("or", "and"):
+        if expr.startswith(kind + "("):
+            return _logical(row, kind, expr[len(kind) + 1:-1])
+    column, rest = expr.split(".", 1)
+    op, raw = rest.split(".", 1)
+    if op == "not":
+        op2, raw = raw.split(".", 1)
+        op = "not." + op2
+    return _match(row, column, op, raw)
+
+
+class FakePostgrest:
+    """Holds the tables and builds the FastAPI app serving them"""
+
+    def __init__(self, latency_ms: float = 0.0, seed_notes: int = 0, seed: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.tables: Dict[str, List[Dict[str, Any]]] = {"notes": [], "note_tombstones": []}
+        self.sequences: Dict[str, int] = {}
+        self.change_seq = 0
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        if seed_notes:
+            self.seed(seed_notes, seed)
+        self.app = self._build_app()
+
+    def seed(self, count: int, seed: int = 0):
+        rng = random.Random(seed)
+        words = ["alpha", "beta", "gamma", "delta", "project", "meeting", "python",
+                 "design", "review", "idea", "journal", "research", "todo", "draft"]
+        for i in range(count):
+            body = " ".join(rng.choice(words) for _ in range(rng.randint(20, 200)))
+            content = f"# Note {i}\n\n{body}\n"
+            self._insert("notes", {
+                "title": f"Note {i} {rng.choice(words)}",
+                "content": content,
+                "tags": rng.sample(words, rng.randint(0, 3)),
+                "size_bytes": len(content.encode("utf-8")),
+            })
+
+    def _insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        rows = self.tables.setdefault(table, [])
+        row = dict(row)
+        if row.get("id") is None:
+            self.sequences[table] = self.sequences.get(table, 0) + 1
+            row["id"] = self.sequences[table]
+        else:
+            self.sequences[table] = max(self.sequences.get(table, 0), int(row["id"]))
+        now = utcnow()
+        if table == "notes":
+            row.setdefault("content", "")
+            row.setdefault("tags", [])
+            row.setdefault("size_bytes", None)
+        row.setdefault("created_at", now)
+        row.setdefault("updated_at", now)
+        rows.append(row)
+        if table == "notes":
+            self._drop_tombstones({row["id"]})
+            self._number(row)
+        return row
+
+    def _number(self, row: Dict[str, Any]):
+        self.change_seq += 1
+        row["change_seq"] = self.change_seq
+
+    def _drop_tombstones(self, ids):
+        self.tables["note_tombstones"] = [t for t in self.tables["note_tombstones"] if t["id"] not in ids]
+
+    def _record_tombstones(self, ids):
+        self._drop_tombstones(ids)
+        now = utcnow()
+        for note_id in sorted(ids):
+            tombstone = {"id": note_id, "deleted_at": now}
+            self._number(tombstone)
+            self.tables["note_tombstones"].append(tombstone)
+
+    def _view(self, table: str) -> List[Dict[str, Any]]:
+        if table != "note_changes":
+            return self.tables.setdefault(table, [])
+        notes = [{**n, "changed_at": n.get("updated_at"), "deleted_at": None, "deleted": False}
+                 for n in self.tables["notes"]]
+        deleted = [{"id": t["id"], "change_seq": t["change_seq"], "changed_at": t["deleted_at"],
+                    "deleted_at": t["deleted_at"], "deleted": True} for t in self.tables["note_tombstones"]]
+        return notes + deleted
+
+    def _filter(self, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        rows = self._view(table)
+        filters = [(k, v) for k, v in params
+                   if k not in ("select", "order", "limit", "offset", "on_conflict", "columns")]
+        out = []
+        for row in rows:
+            ok = True
+            for key, value in filters:
+                if key in ("or", "and"):
+                    ok = _logical(row, key, value[1:-1])
+                elif key.startswith("not.") and key[4:] in ("or", "and"):
+                    ok = not _logical(row, key[4:], value[1:-1])
+                else:
+                    op, raw = value.split(".", 1)
+                    if op == "not":
+                        op2, raw = raw.split(".", 1)
+                        op = "not." + op2
+                    ok = _match(row, key, op, raw)
+                if not ok:
+                    break
+            if ok:
+                out.append(row)
+        return out
+
+    @staticmethod
+    def _order(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+        if not order:
+            return rows
+        for term in reversed(order.split(",")):
+            parts = term.split(".")
+            column, desc = parts[0], len(parts) > 1 and parts[1] == "desc"
+            rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        return rows
+
+    @staticmethod
+    def _project(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+        if not select or select == "*":
+            return [dict(r) for r in rows]
+        columns = select.split(",")
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+    def _respond(self, request: Request, rows: List[Dict[str, Any]], status: int = 200,
+                 total: Optional[int] = None) -> Response:
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse({"message": "JSON object requested, multiple (or no) rows returned",
+                                     "details": f"Results contain {len(rows)} rows"}, status_code=406)
+            return JSONResponse(rows[0], status_code=status)
+        headers = {}
+        if total is not None:
+            headers["Content-Range"] = f"0-{max(len(rows) - 1, 0)}/{total}"
+        return JSONResponse(rows, status_code=status, headers=headers)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+        fake = self
+
+        @app.middleware("http")
+        async def inject_latency(request, call_next):
+            fake.requests += 1
+            fake._in_flight += 1
+            fake.max_in_flight = max(fake.max_in_flight, fake._in_flight)
+            try:
+                if fake.latency:
+                    await asyncio.sleep(fake.latency)
+                return await call_next(request)
+            finally:
+                fake._in_flight -= 1
+
+        @app.get("/rest/v1/{table}")
+        async def select(table: str, request: Request):
+            params = list(request.query_params.multi_items())
+            query = dict(params)
+            rows = fake._order(fake._filter(table, params), query.get("order"))
+            total = len(rows) if "count=exact" in request.headers.get("prefer", "") else None
+            offset = int(query.get("offset", 0))
+            if "limit" in query:
+                rows = rows[offset:offset + int(query["limit"])]
+            elif offset:
+                rows = rows[offset:]
+            return fake._respond(request, fake._project(rows, query.get("select")), total=total)
+
+        @app.post("/rest/v1/{table}")
+        async def insert(table: str, request: Request):
+            body = await request.json()
+            rows = body if isinstance(body, list) else [body]
+            prefer = request.headers.get("prefer", "")
+            conflict = request.query_params.get("on_conflict")
+            out = []
+            for row in rows:
+                existing = None
+                if conflict and row.get(conflict) is not None:
+                    existing = next((r for r in fake.tables.setdefault(table, [])
+                                     if r.get(conflict) == row[conflict]), None)
+                if existing is not None:
+                    if "ignore-duplicates" in prefer:
+                        continue
+                    existing.update(row)
+                    if table == "notes":
+                        fake._number(existing)
+                    out.append(existing)
+                else:
+                    out.append(fake._insert(table, row))
+            if "return=representation" not in prefer:
+                return Response(status_code=201)
+            return fake._respond(request, fake._project(out, request.query_params.get("select")), status=201)
+
+        @app.patch("/rest/v1/{table}")
+        async def update(table: str, request: Request):
+            values = await request.json()
+            rows = fake._filter(table, list(request.query_params.multi_items()))
+            for row in rows:
+                row.update(values)
+                if table == "notes":
+                    fake._number(row)
+            if "return=representation" not in request.headers.get("prefer", ""):
+                return Response(status_code=204)
+            return fake._respond(request, fake._project(rows, request.query_params.get("select")))
+
+        @app.delete("/rest/v1/{table}")
+        async def delete(table: str, request: Request):
+            rows = fake._filter(table, list(request.query_params.multi_items()))
+            doomed = {id(r) for r in rows}
+            fake.tables[table] = [r for r in fake.tables.get(table, []) if id(r) not in doomed]
+            if table == "notes":
+                fake._record_tombstones({r["id"] for r in rows})
+            if "return=representation" not in request.headers.get("prefer", ""):
+                return Response(status_code=204)
+            return fake._respond(request, fake._project(rows, request.query_params.get("select")))
+
+        return app
+
+
+def serve_in_thread(fake: FakePostgrest, port: int = 0) -> Tuple[str, Any]:
+    """Start the fake on a background uvicorn thread, return (url, server)"""
+    import socket
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", port))
+    port = sock.getsockname()[1]
+    config = uvicorn.Config(fake.app, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request (ms)")
+    parser.add_argument("--notes", type=int, default=0, help="number of synthetic notes to seed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakePostgrest(args.latency, args.notes, args.seed)
+    print(f"🧪 Fake PostgREST on http://127.0.0.1:{args.port} ({args.latency} ms latency, {args.notes} notes)")
+    uvicorn.run(fake.app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Load-test the MCP server end to end against the fake PostgREST.
+
+Starts ``bench/fake_postgrest.py`` (seeded synthetic vault, injected latency)
+and ``mcp-server.py`` as separate processes, waits for the note indexes to
+load, then drives a fixed number of tool calls through each transport with
+``--concurrency`` requests in flight:
+
+- ``tools_call``   POST /tools/call
+- ``mcp_message``  POST /mcp/message, one JSON-RPC request per POST
+- ``stdio``        JSON-RPC lines on the stdin/stdout of a stdio server
+
+The request mix (get_note_by_id, search_notes_content, search_by_tags,
+list_all_notes) is drawn from a seeded RNG, so two runs with the same flags
+send the same requests. Reported per transport: req/s, p50/p95/p99/max
+latency, errors, and the server's resident and peak memory.
+
+``--json out.json`` saves the results with the git commit and flags;
+``--compare base.json`` prints the change against an earlier run.
+
+    python bench/load_test.py --requests 5000 --concurrency 32 --latency 5
+    python bench/load_test.py --json before.json   # on the old commit
+    python bench/load_test.py --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSPORTS = ("tools_call", "mcp_message", "stdio")
+TOKEN = "bench-token"
+# Words seeded into the fake vault, so searches and tag queries find notes
+WORDS = ["alpha", "beta", "gamma", "delta", "project", "meeting", "python",
+         "design", "review", "idea", "journal", "research", "todo", "draft"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else float("nan")
+
+
+def memory_kib(pid: int) -> Dict[str, Optional[int]]:
+    """Resident and peak resident memory of ``pid`` (Linux /proc; None elsewhere)"""
+    out: Dict[str, Optional[int]] = {"rss_kib": None, "peak_rss_kib": None}
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    out["rss_kib"] = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    out["peak_rss_kib"] = int(line.split()[1])
+    except OSError:
+        pass
+    return out
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_workload(count: int, notes: int, seed: int) -> List[Dict[str, Any]]:
+    """``count`` tool calls with a fixed mix, reproducible for a given seed"""
+    rng = random.Random(seed)
+    calls = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.5:
+            calls.append({"name": "get_note_by_id", "arguments": {"note_id": rng.randint(1, notes)}})
+        elif roll < 0.75:
+            query = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+            calls.append({"name": "search_notes_content", "arguments": {"query": query, "limit": 20}})
+        elif roll < 0.9:
+            calls.append({"name": "search_by_tags", "arguments": {
+                "tags": rng.sample(WORDS, 2), "match": rng.choice(["any", "all"]), "limit": 50}})
+        else:
+            calls.append({"name": "list_all_notes", "arguments": {"limit": 50, "metadata_only": True}})
+    return calls
+
+
+def is_error(result: Any) -> bool:
+    """True for a failed tool call in any of the transports' response shapes"""
+    if not isinstance(result, dict) or "error" in result:
+        return True
+    if "result" in result:  # JSON-RPC envelope
+        result = result["result"]
+    if result.get("isError"):
+        return True
+    try:
+        payload = json.loads(result["content"][0]["text"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return True
+    return isinstance(payload, dict) and payload.get("success") is False
+
+
+class Server:
+    """The fake PostgREST plus one mcp-server.py process (HTTP or stdio)"""
+
+    def __init__(self, args, stdio: bool):
+        self.args = args
+        self.stdio = stdio
+        self.procs: List[subprocess.Popen] = []
+        self.port = free_port()
+        self.fake_url = ""
+
+    def __enter__(self):
+        fake_port = free_port()
+        self.fake_url = f"http://127.0.0.1:{fake_port}"
+        self.procs.append(subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "bench", "fake_postgrest.py"), "--port", str(fake_port),
+             "--latency", str(self.args.latency), "--notes", str(self.args.notes), "--seed", str(self.args.seed)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        wait_http(self.fake_url + "/rest/v1/notes?limit=1")
+
+        env = dict(os.environ, sb_url=self.fake_url, sb_api="dev", MCP_API_TOKEN=TOKEN,
+                   STORAGE_BACKEND="supabase", PYTHONUNBUFFERED="1")
+        env.pop("PORT", None)
+        command = [sys.executable, os.path.join(ROOT, "mcp-server.py")]
+        if self.stdio:
+            self.server = subprocess.Popen(command, env=env, stdin=subprocess.PIPE,
+                                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        else:
+            env["PORT"] = str(self.port)
+            self.server = subprocess.Popen(command + ["--http"], env=env,
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            wait_http(f"http://127.0.0.1:{self.port}/health")
+        self.procs.append(self.server)
+        return self
+
+    def __exit__(self, *exc):
+        for proc in reversed(self.procs):
+            proc.terminate()
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def wait_http(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            time.sleep(0.05)
+
+
+async def drive(send, calls: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """Run ``calls`` through ``send`` with ``concurrency`` workers"""
+    queue = iter(calls)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for call in queue:
+            start = time.perf_counter()
+            try:
+                failed = is_error(await send(call))
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ms = [t * 1000 for t in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2),
+    }
+
+
+async def wait_ready(send, timeout: float = 60.0):
+    # get_tag_counts fails with "still loading" until the startup indexes are built
+    deadline = time.monotonic() + timeout
+    while is_error(await send({"name": "get_tag_counts", "arguments": {}})):
+        if time.monotonic() > deadline:
+            raise RuntimeError("server indexes did not load in time")
+        await asyncio.sleep(0.1)
+
+
+async def run_http(args, transport: str, calls, warmup) -> Dict[str, Any]:
+    with Server(args, stdio=False) as server:
+        base = f"http://127.0.0.1:{server.port}"
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60.0,
+                                     headers={"Authorization": f"Bearer {TOKEN}"}) as client:
+            ids = iter(range(1, 1 << 62))
+
+            async def send(call):
+                if transport == "tools_call":
+                    response = await client.post("/tools/call", json=call)
+                else:
+                    response = await client.post("/mcp/message", json={
+                        "jsonrpc": "2.0", "id": next(ids), "method": "tools/call", "params": call})
+                return response.json()
+
+            await wait_ready(send)
+            await drive(send, warmup, args.concurrency)
+            result = await drive(send, calls, args.concurrency)
+        result.update(memory_kib(server.server.pid))
+    return result
+
+
+async def run_stdio(args, calls, warmup) -> Dict[str, Any]:
+    with Server(args, stdio=True) as server:
+        proc = server.server
+        loop = asyncio.get_running_loop()
+        pending: Dict[int, asyncio.Future] = {}
+        ids = iter(range(1, 1 << 62))
+        stdout_reader = asyncio.StreamReader(limit=64 * 1024 * 1024)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stdout_reader), proc.stdout)
+        # Non-blocking writes: a blocked stdin write would stop us draining stdout
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, proc.stdin)
+        stdin = asyncio.StreamWriter(transport, protocol, None, loop)
+
+        async def read_responses():
+            while True:
+                line = await stdout_reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                future = pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+            for future in pending.values():
+                future.set_exception(RuntimeError("stdio server exited"))
+
+        reader = asyncio.create_task(read_responses())
+
+        async def send(call):
+            request_id = next(ids)
+            future = pending[request_id] = loop.create_future()
+            line = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": call})
+            stdin.write(line.encode() + b"\n")
+            await stdin.drain()
+            return await future
+
+        await wait_ready(send)
+        await drive(send, warmup, args.concurrency)
+        result = await drive(send, calls, args.concurrency)
+        result.update(memory_kib(proc.pid))
+        stdin.close()
+        reader.cancel()
+    return result
+
+
+def print_row(name: str, r: Dict[str, Any], base: Optional[Dict[str, Any]] = None):
+    def delta(key: str) -> str:
+        if not base or not base.get(key):
+            return ""
+        return f" ({(r[key] - base[key]) / base[key]:+.0%})"
+
+    mem = f"{r['rss_kib'] / 1024:6.0f} MiB rss, {r['peak_rss_kib'] / 1024:.0f} peak" if r.get("rss_kib") else "memory n/a"
+    print(f"   {name:<12} {r['rps']:8.1f} req/s{delta('rps')}   p50 {r['p50_ms']:7.2f}{delta('p50_ms')}   "
+          f"p95 {r['p95_ms']:7.2f}{delta('p95_ms')}   p99 {r['p99_ms']:7.2f}{delta('p99_ms')} ms   "
+          f"max {r['max_ms']:7.1f} ms   {r['errors']} errors   {mem}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against the fake PostgREST")
+    parser.add_argument("--requests", type=int, default=2000, help="measured tool calls per transport")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured calls first")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--latency", type=float, default=5.0, help="fake backend latency per query (ms)")
+    parser.add_argument("--notes", type=int, default=1000, help="synthetic notes in the vault")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--transports", default=",".join(TRANSPORTS),
+                        help=f"comma-separated subset of {', '.join(TRANSPORTS)}")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    transports = [t.strip() for t in args.transports.split(",") if t.strip()]
+    unknown = set(transports) - set(TRANSPORTS)
+    if unknown:
+        parser.error(f"unknown transports: {', '.join(sorted(unknown))}")
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh).get("results", {})
+
+    calls = make_workload(args.requests, args.notes, args.seed)
+    warmup = make_workload(args.warmup, args.notes, args.seed + 1)
+    print(f"🧪 {args.requests} calls per transport, {args.concurrency} in flight, "
+          f"{args.latency:g} ms backend latency, {args.notes} notes (seed {args.seed})")
+
+    results = {}
+    for transport in transports:
+        if transport == "stdio":
+            results[transport] = asyncio.run(run_stdio(args, calls, warmup))
+        else:
+            results[transport] = asyncio.run(run_http(args, transport, calls, warmup))
+        print_row(transport, results[transport], baseline.get(transport))
+
+    if args.json:
+        report = {
+            "commit": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+            "results": results,
+        }
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"💾 Results written to {args.json}")
+    sys.exit(1 if any(r["errors"] for r in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
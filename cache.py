@@ -0,0 +1,128 @@
+"""
+In-process cache for notes and query results.
+
+Entries are evicted least-recently-used once the cache holds more than
+``max_bytes`` of (estimated) payload, and expire ``ttl`` seconds after they
+were stored. Settings come from the environment:
+
+- ``CACHE_MAX_BYTES``  memory budget in bytes (default 64 MiB, 0 disables)
+- ``CACHE_TTL``        seconds an entry stays valid (default 300)
+
+Cached values are shared, not copied - callers must not mutate them.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """Rough payload size in bytes; strings dominate for notes"""
+    if value is None or isinstance(value, bool):
+        return 8
+    if isinstance(value, str):
+        return len(value) + 49
+    if isinstance(value, (int, float)):
+        return 24
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(v) for v in value)
+    return 64
+
+
+class NoteCache:
+    """Byte-bounded LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size in bytes, monotonic expiry time), least recently used first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "NoteCache":
+        return cls(
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            ttl=float(os.getenv("CACHE_TTL", 300)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        value, _, expires = entry
+        if expires < time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if not self.enabled:
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # Never let one oversized value flush everything else
+            self.invalidate(key)
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, size, time.monotonic() + self.ttl)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            old_key = next(iter(self._entries))
+            self._drop(old_key)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if key in self._entries:
+            self._drop(key)
+            self.invalidations += 1
+
+    def invalidate_prefix(self, prefix: Hashable):
+        """Drop every tuple key whose first element is ``prefix``"""
+        doomed = [k for k in self._entries if isinstance(k, tuple) and k and k[0] == prefix]
+        for key in doomed:
+            self._drop(key)
+        self.invalidations += len(doomed)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def _drop(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -1,33 +1,389 @@
+import asyncio
+import base64
+import contextlib
+import json
+import logging
 import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
-from schemas import Note, NoteCreate
-from typing import List, Optional
+import weakref
+from datetime import datetime, timezone
+from storage import APIResponse, backend_class, close_backend, get_backend
+from note_edit import append_text, apply_edits, prepend_text
+from note_outline import build_outline, read_bytes, section_by_path
+from cache import MISSING, NoteCache
+from singleflight import SingleFlight
+from write_behind import WriteBehind
+from search_index import SearchIndex, make_snippet, tokenize
+from tag_index import MATCH_MODES, TagIndex
+from link_index import LINK_DIRECTIONS, LinkIndex
+from related_index import RelatedIndex
+from typing import Any, Dict, List, Optional
 
-load_dotenv()
-url: str = os.getenv("sb_url")
-key: str = os.getenv("sb_api")
-supabase: Client = create_client(url, key)
+# Where notes are stored, picked by STORAGE_BACKEND; see storage.py. The
+# backend itself is created by the first get_backend() call, not at import
+_native_indexes = backend_class().native_indexes
 
-async def get_notes():
-    """Get all notes from the database"""
-    response = supabase.table("notes").select("*").execute()
-    return response
+# Notes are cached under ("note", id), list/search results under ("query", ...);
+# see cache.py for the CACHE_* settings
+cache: NoteCache = NoteCache.from_env()
+
+# Cache misses for the same key that arrive while the first one is still
+# querying the backend wait for its result instead of querying again
+flights: SingleFlight = SingleFlight()
+
+# With WRITE_BEHIND=1, updates are acknowledged once logged and flushed in
+# batches; rows not yet flushed are read from ``writes.pending`` first. See
+# write_behind.py
+writes: WriteBehind = WriteBehind.from_env()
+
+# In-process indexes, filled by build_indexes() at startup and kept current by
+# create_note/update_note. Until an index is ready its queries go to the
+# backend. Backends with their own full-text and tag indexes (SQLite) skip
+# those two; every backend gets the wikilink graph and the related-notes
+# vectors (RELATED_* settings, needs NumPy), which only live here.
+search_index: SearchIndex = SearchIndex()
+tag_index: TagIndex = TagIndex()
+link_index: LinkIndex = LinkIndex()
+related_index: RelatedIndex = RelatedIndex.from_env()
+_indexes = ((link_index,) if _native_indexes else (search_index, tag_index, link_index)) + (
+    (related_index,) if related_index.enabled else ())
+
+logger = logging.getLogger(__name__)
+
+# Notes written by another process (vault_sync, a second server) reach these
+# indexes and the note cache through the changes feed, polled every
+# INDEX_SYNC_INTERVAL seconds once the indexes are built; 0 turns it off
+INDEX_SYNC_INTERVAL = float(os.getenv("INDEX_SYNC_INTERVAL", 30))
+_sync_cursor: Optional[str] = None
+_sync_task: Optional[asyncio.Task] = None
+
+# Bumped on every write so a query that raced with it isn't cached afterwards
+_write_generation = 0
+
+async def _cached_query(key: tuple, fetch):
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return APIResponse(*cached)
+
+    async def fetch_and_cache():
+        generation = _write_generation
+        response = await fetch()
+        if generation == _write_generation:
+            cache.set(key, (response.data, response.count))
+        return response
+
+    return await flights.do(key, fetch_and_cache)
+
+async def _flush_writes(rows):
+    """Bulk update for the write-behind flusher; rows of notes deleted since are dropped"""
+    global _write_generation
+    await get_backend().update_notes(rows)
+    # Listings and backend searches cached before the flush didn't have these rows
+    _write_generation += 1
+    cache.invalidate_prefix("query")
+    flights.forget_prefix("query")
+
+def start_write_behind():
+    """Start flushing logged writes (those replayed from the log first); a no-op when it's off"""
+    if writes.enabled:
+        writes.start(_flush_writes)
+
+async def stop_write_behind():
+    """Flush what is pending and stop; anything that can't be written stays logged"""
+    await writes.close()
+
+async def _settle_writes(note_ids):
+    """Flush logged writes to these notes before writing them directly, so a
+    later flush can't overwrite the direct write"""
+    if writes.has_pending(note_ids):
+        start_write_behind()
+        await writes.flush(note_ids)
+
+async def _flush_pending():
+    """Write every pending update before a search or tag query the backend
+    answers from its own data, so it matches the new content and tags"""
+    if writes.pending:
+        start_write_behind()
+        await writes.flush()
+
+def _overlay(rows: List[dict], columns: str = "*") -> List[dict]:
+    """``rows`` with any note that has an unflushed write replaced by that write"""
+    if not writes.pending:
+        return rows
+    fields = None if columns == "*" else columns.split(",")
+    out = []
+    for row in rows:
+        pending = writes.pending.get(row["id"]) if row else None
+        if pending is not None:
+            row = {**row, **(pending if fields is None else {f: pending[f] for f in fields if f in pending})}
+        out.append(row)
+    return out
+
+def _note_lock(note_id: int) -> asyncio.Lock:
+    lock = _edit_locks.get(note_id)
+    if lock is None:
+        lock = _edit_locks[note_id] = asyncio.Lock()
+    return lock
+
+def _write_through(rows):
+    """Refresh cached copies of written notes and drop stale query results"""
+    global _write_generation
+    _write_generation += 1
+    for row in rows or []:
+        cache.set(("note", row["id"]), row)
+        cache.invalidate(("outline", row["id"]))
+        flights.forget(("note", row["id"]))
+        for index in _indexes:
+            index.add(row)
+    cache.invalidate_prefix("query")
+    flights.forget_prefix("query")
+    flights.forget_prefix("notes")
+
+# Paginated listings
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+SUMMARY_COLUMNS = "id,title,tags,size_bytes,updated_at,change_seq"
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 500))
+NOTE_FIELDS = ("title", "content", "tags")
+ORDERINGS = ("id", "updated_at")
+# Default chunk for byte-range reads of a note
+READ_CHUNK_BYTES = int(os.getenv("READ_CHUNK_BYTES", 16384))
+# Re-reads allowed when an edit without expected_updated_at races another write
+EDIT_RETRIES = int(os.getenv("EDIT_RETRIES", 3))
+# Edits (and write-behind updates) of one note in this process queue up here;
+# the updated_at check only has to catch writers elsewhere
+_edit_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+class ConflictError(Exception):
+    """The note changed after the ``expected_updated_at`` the caller passed"""
+
+    def __init__(self, note_id: int, updated_at: Optional[str]):
+        super().__init__(f"Note {note_id} was modified (updated_at {updated_at}); read it again and retry")
+        self.note_id = note_id
+        self.updated_at = updated_at
+
+def _encode_token(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_token(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(data, dict):
+        raise ValueError("Invalid cursor")
+    return data
+
+def encode_cursor(order_by: str, row: dict) -> str:
+    """Opaque cursor pointing just past ``row`` in the given ordering"""
+    key = [row["id"]] if order_by == "id" else [row["updated_at"], row["id"]]
+    return _encode_token({"o": order_by, "k": key})
+
+def decode_cursor(cursor: str, order_by: str) -> list:
+    data = _decode_token(cursor)
+    if "k" not in data:
+        raise ValueError("Invalid cursor")
+    if data.get("o") != order_by:
+        raise ValueError(f"Cursor was issued for order_by={data.get('o')!r}")
+    return data["k"]
+
+def _decode_changes_cursor(cursor: Optional[str]) -> tuple:
+    """(last change_seq seen, or a timestamp to start from) for changes_since"""
+    if not cursor:
+        return None, None
+    try:
+        since = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+    except ValueError:
+        data = _decode_token(cursor)
+        if data.get("o") != "changes":
+            raise ValueError("Cursor was not issued by changes_since")
+        if data.get("s") is not None:
+            return int(data["s"]), None
+        # An empty first page keeps its start time; cursors from before
+        # change_seq held (updated_at, id) positions and resume from the
+        # earlier of the two, which may repeat a few changes
+        stamps = [data["t"]] if data.get("t") else [k[0] for k in (data.get("n"), data.get("d")) if k]
+        if not stamps:
+            return None, None
+        since = min(datetime.fromisoformat(t.replace("Z", "+00:00")) for t in stamps)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return None, since.astimezone(timezone.utc).isoformat()
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _size_bytes(content: Optional[str]) -> int:
+    return len((content or "").encode("utf-8"))
+
+def _same_time(a: Optional[str], b: Optional[str]) -> bool:
+    # Postgres and clients may spell the same instant differently (Z vs +00:00)
+    try:
+        return datetime.fromisoformat(a) == datetime.fromisoformat(b)
+    except (TypeError, ValueError):
+        return a == b
+
+def _check_batch(items: list):
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(items)} exceeds the maximum of {MAX_BATCH_SIZE}")
+
+def _note_error(item: Any, require_title: bool) -> Optional[str]:
+    if not isinstance(item, dict):
+        return "Expected an object"
+    unknown = set(item) - set(NOTE_FIELDS) - {"id"}
+    if unknown:
+        return f"Unknown fields: {', '.join(sorted(unknown))}"
+    if require_title and not isinstance(item.get("title"), str):
+        return "title is required"
+    if item.get("title") is not None and not isinstance(item["title"], str):
+        return "title must be a string"
+    if item.get("content") is not None and not isinstance(item["content"], str):
+        return "content must be a string"
+    tags = item.get("tags")
+    if tags is not None and not (isinstance(tags, list) and all(isinstance(t, str) for t in tags)):
+        return "tags must be a list of strings"
+    return None
+
+def cache_stats():
+    """Hit/miss/eviction counters of the note cache, how many reads shared a
+    query, and the write-behind queue"""
+    return {**cache.stats(), "coalescing": flights.stats(), "write_behind": writes.stats()}
+
+async def get_notes(limit: Optional[int] = None, cursor: Optional[str] = None,
+                    metadata_only: bool = False, order_by: str = "id", use_cache: bool = True):
+    """Get one page of notes ordered by ``order_by``, resuming after ``cursor``.
+
+    ``metadata_only`` leaves out ``content``. The response's ``next_cursor``
+    fetches the following page and is None once the listing is exhausted.
+    """
+    if order_by not in ORDERINGS:
+        raise ValueError(f"order_by must be one of {', '.join(ORDERINGS)}")
+    limit = max(1, min(limit or PAGE_SIZE, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor, order_by) if cursor else None
+    columns = SUMMARY_COLUMNS if metadata_only else "*"
+
+    async def fetch():
+        # One extra row tells us whether another page exists
+        return APIResponse(await get_backend().list_notes(columns, order_by, after, limit + 1))
+
+    if use_cache:
+        key = ("query", "page", order_by, cursor, limit, metadata_only)
+        rows = (await _cached_query(key, fetch)).data
+    else:
+        rows = (await fetch()).data
+    page = _overlay(rows[:limit], columns)
+    next_cursor = encode_cursor(order_by, page[-1]) if len(rows) > limit else None
+    return APIResponse(page, next_cursor=next_cursor)
 
 async def get_note(note_id: int):
     """Get a specific note by ID"""
-    response = supabase.table("notes").select("*").eq("id", note_id).single().execute()
-    return response
+    pending = writes.pending.get(note_id)
+    if pending is not None:
+        return APIResponse(pending)
+    key = ("note", note_id)
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return APIResponse(cached)
+
+    async def fetch():
+        generation = _write_generation
+        note = await get_backend().get_note(note_id)
+        if note is not None and generation == _write_generation:
+            cache.set(key, note)
+        return note
+
+    return APIResponse(await flights.do(key, fetch))
+
+async def get_notes_by_ids(note_ids: List[int]):
+    """Get many notes in one query; ``data`` holds a row or None per requested id"""
+    _check_batch(note_ids)
+    found = {}
+    missing = []
+    for note_id in dict.fromkeys(note_ids):
+        cached = writes.pending.get(note_id) or cache.get(("note", note_id))
+        if cached is MISSING:
+            missing.append(note_id)
+        else:
+            found[note_id] = cached
+    if missing:
+        async def fetch():
+            generation = _write_generation
+            rows = await get_backend().get_notes(missing)
+            if generation == _write_generation:
+                for row in rows:
+                    cache.set(("note", row["id"]), row)
+            return rows
+
+        for row in await flights.do(("notes", tuple(missing)), fetch):
+            found[row["id"]] = row
+    return APIResponse([found.get(note_id) for note_id in note_ids])
+
+def _outline(note: dict) -> dict:
+    """The note's outline, computed once per version (``updated_at``)"""
+    key = ("outline", note["id"])
+    cached = cache.get(key)
+    if cached is not MISSING and cached["updated_at"] == note.get("updated_at"):
+        return cached
+    outline = {"id": note["id"], "title": note.get("title"), "updated_at": note.get("updated_at"),
+               **build_outline(note.get("content") or "")}
+    cache.set(key, outline)
+    return outline
+
+async def get_note_outline(note_id: int):
+    """A note's heading tree with the byte offset and size of each section; None if missing"""
+    cached = cache.get(("outline", note_id))
+    if cached is not MISSING:
+        return APIResponse(cached)
+    note = (await get_note(note_id)).data
+    return APIResponse(_outline(note) if note is not None else None)
+
+async def read_note_section(note_id: int, path: Optional[List[str]] = None,
+                            offset: int = 0, length: Optional[int] = None):
+    """Part of a note's content: the section under the heading ``path``, or
+    ``length`` bytes (default READ_CHUNK_BYTES) from byte ``offset``.
+
+    A section read is limited to ``length`` bytes only if one is given.
+    ``data`` is None if the note doesn't exist; ``next_offset`` is where the
+    following chunk starts, None at the end of the section or note.
+    """
+    note = (await get_note(note_id)).data
+    if note is None:
+        return APIResponse(None)
+    outline = _outline(note)
+    section = None
+    if path:
+        section = section_by_path(outline, path)
+        if section is None:
+            raise ValueError(f"Heading not found: {' > '.join(path)}")
+        stop = section["offset"] + section["size"]
+        # A non-zero offset continues a section read from its next_offset
+        offset = max(offset, section["offset"])
+        length = stop - offset if length is None else min(length, stop - offset)
+    else:
+        stop = outline["size_bytes"]
+        length = READ_CHUNK_BYTES if length is None else length
+    if offset < 0 or length < 0:
+        raise ValueError("offset and length must not be negative")
+    text, start, end = read_bytes(note.get("content") or "", offset, length)
+    return APIResponse({
+        "id": note_id, "title": note.get("title"), "updated_at": note.get("updated_at"),
+        "heading": section["heading"] if section else None, "path": section["path"] if section else None,
+        "offset": start, "length": end - start, "next_offset": end if end < stop else None,
+        "size_bytes": outline["size_bytes"], "content": text,
+    })
 
 async def create_note(title: str, content: str = "", tags: Optional[List[str]] = None):
     """Create a new note"""
     note_data = {
         "title": title,
         "content": content,
-        "tags": tags or []
+        "tags": tags or [],
+        "size_bytes": _size_bytes(content)
     }
-    response = supabase.table("notes").insert(note_data).execute()
-    return response
+    rows = await get_backend().insert_notes([note_data])
+    _write_through(rows)
+    return APIResponse(rows)
 
 async def update_note(note_id: int, title: str = None, content: str = None, tags: Optional[List[str]] = None):
     """Update an existing note"""
@@ -36,20 +392,469 @@ async def update_note(note_id: int, title: str = None, content: str = None, tags
         update_data["title"] = title
     if content is not None:
         update_data["content"] = content
+        update_data["size_bytes"] = _size_bytes(content)
     if tags is not None:
         update_data["tags"] = tags
-    
-    response = supabase.table("notes").update(update_data).eq("id", note_id).execute()
-    return response
-
-async def search_notes(query: str):
-    """Search notes by title or content"""
-    response = supabase.table("notes").select("*").or_(
-        f"title.ilike.%{query}%,content.ilike.%{query}%"
-    ).execute()
-    return response
-
-async def search_notes_by_tags(tags: List[str]):
-    """Search notes by tags"""
-    response = supabase.table("notes").select("*").contains("tags", tags).execute()
-    return response
\ No newline at end of file
+    update_data["updated_at"] = _now()
+    if writes.enabled:
+        return await _update_behind(note_id, update_data)
+
+    # Drop the cached copy first so a failed update can't leave it stale
+    cache.invalidate(("note", note_id))
+    rows = await get_backend().update_note(note_id, update_data)
+    _write_through(rows)
+    return APIResponse(rows)
+
+async def _update_behind(note_id: int, values: Dict[str, Any]):
+    """update_note in write-behind mode: log the merged row and return it unflushed"""
+    start_write_behind()
+    async with _note_lock(note_id):
+        note = (await get_note(note_id)).data
+        if note is None:
+            return APIResponse([])
+        row = {"id": note_id, "title": note["title"], "content": note.get("content") or "",
+               "tags": note.get("tags") or [], "size_bytes": note.get("size_bytes"),
+               **({"created_at": note["created_at"]} if note.get("created_at") else {}), **values}
+        if row["size_bytes"] is None:
+            row["size_bytes"] = _size_bytes(row["content"])
+        await writes.append(row)
+        _write_through([row])
+    return APIResponse([row])
+
+async def _edit_content(note_id: int, edit, expected_updated_at: Optional[str] = None):
+    """Read-modify-write of one note's content, guarded by ``updated_at``.
+
+    ``edit(content)`` returns (new content, changed regions). The write only
+    lands if the row still has the ``updated_at`` we read; if another write got
+    in between, a caller-supplied ``expected_updated_at`` raises ConflictError,
+    otherwise the edit is re-applied to a fresh read. ``data`` is None if the
+    note doesn't exist, else its new updated_at and size_bytes and the regions.
+    """
+    async with _note_lock(note_id):
+        await _settle_writes([note_id])
+        for _ in range(EDIT_RETRIES):
+            note = (await get_note(note_id)).data
+            if note is None:
+                return APIResponse(None)
+            if expected_updated_at is not None and not _same_time(note.get("updated_at"), expected_updated_at):
+                raise ConflictError(note_id, note.get("updated_at"))
+            content, changes = edit(note.get("content") or "")
+            values = {"content": content, "size_bytes": _size_bytes(content), "updated_at": _now()}
+            # Dropped so the next attempt reads the row that beat us
+            cache.invalidate(("note", note_id))
+            flights.forget(("note", note_id))
+            rows = await get_backend().update_note(note_id, values, expected_updated_at=note.get("updated_at"))
+            if rows:
+                _write_through(rows)
+                return APIResponse({"id": note_id, "updated_at": rows[0]["updated_at"],
+                                    "size_bytes": rows[0].get("size_bytes"), "changes": changes})
+        raise ConflictError(note_id, note.get("updated_at"))
+
+async def append_to_note(note_id: int, text: str, expected_updated_at: Optional[str] = None):
+    """Add ``text`` as new lines at the end of a note"""
+    return await _edit_content(note_id, lambda content: append_text(content, text), expected_updated_at)
+
+async def prepend_to_note(note_id: int, text: str, expected_updated_at: Optional[str] = None):
+    """Add ``text`` as new lines at the top of a note, below its frontmatter"""
+    return await _edit_content(note_id, lambda content: prepend_text(content, text), expected_updated_at)
+
+async def patch_note(note_id: int, edits: List[Dict[str, Any]], expected_updated_at: Optional[str] = None):
+    """Apply line- or heading-anchored ``edits`` (see note_edit.py) to a note"""
+    return await _edit_content(note_id, lambda content: apply_edits(content, edits), expected_updated_at)
+
+async def create_notes(notes: List[Dict[str, Any]]):
+    """Create many notes with one bulk insert.
+
+    ``data`` holds ``{"success", "note"|"error"}`` per input item, in order.
+    Invalid items are reported without failing the rest of the batch.
+    """
+    _check_batch(notes)
+    results: List[Dict[str, Any]] = [{} for _ in notes]
+    rows, positions = [], []
+    for i, item in enumerate(notes):
+        error = _note_error(item, require_title=True)
+        if error or "id" in item:
+            results[i] = {"success": False, "error": error or "id is assigned by the database"}
+            continue
+        content = item.get("content") or ""
+        rows.append({"title": item["title"], "content": content,
+                     "tags": item.get("tags") or [], "size_bytes": _size_bytes(content)})
+        positions.append(i)
+
+    if rows:
+        try:
+            inserted = await get_backend().insert_notes(rows)
+        except Exception as e:
+            for i in positions:
+                results[i] = {"success": False, "error": str(e)}
+        else:
+            _write_through(inserted)
+            for i, row in zip(positions, inserted):
+                results[i] = {"success": True, "note": row}
+    return APIResponse(results)
+
+async def update_notes(updates: List[Dict[str, Any]]):
+    """Update many notes with one read and one bulk update.
+
+    Each item is ``{"id": ..., "title"?, "content"?, "tags"?}``; fields left out
+    keep their current value. Several items for the same id are applied in
+    order. ``data`` holds ``{"success", "note"|"error"}`` per input item.
+    """
+    _check_batch(updates)
+    results: List[Dict[str, Any]] = [{} for _ in updates]
+    valid: Dict[int, List[int]] = {}  # note id -> input positions
+    for i, item in enumerate(updates):
+        error = _note_error(item, require_title=False)
+        if not error and not isinstance(item.get("id"), int):
+            error = "id is required"
+        if error:
+            results[i] = {"success": False, "error": error}
+        else:
+            valid.setdefault(item["id"], []).append(i)
+    if not valid:
+        return APIResponse(results)
+
+    await _settle_writes(valid)
+    for note_id in valid:
+        cache.invalidate(("note", note_id))
+    current = await get_notes_by_ids(list(valid))
+    now = _now()
+    rows = []
+    for note_id, row in zip(valid, current.data):
+        if row is None:
+            for i in valid[note_id]:
+                results[i] = {"success": False, "error": "Note not found"}
+            continue
+        merged = {"id": note_id, "title": row["title"], "content": row.get("content") or "",
+                  "tags": row.get("tags") or []}
+        for i in valid[note_id]:
+            merged.update({k: v for k, v in updates[i].items() if k in NOTE_FIELDS and v is not None})
+        merged["size_bytes"] = _size_bytes(merged["content"])
+        merged["updated_at"] = now
+        rows.append(merged)
+    if not rows:
+        return APIResponse(results)
+
+    try:
+        written = await get_backend().update_notes(rows)
+    except Exception as e:
+        for row in rows:
+            for i in valid[row["id"]]:
+                results[i] = {"success": False, "error": str(e)}
+    else:
+        _write_through(written)
+        # A note deleted since it was read matches no row and isn't brought back
+        for row in rows:
+            for i in valid[row["id"]]:
+                results[i] = {"success": False, "error": "Note not found"}
+        for row in written:
+            for i in valid[row["id"]]:
+                results[i] = {"success": True, "note": row}
+    return APIResponse(results)
+
+async def delete_notes(note_ids: List[int]):
+    """Delete notes by ID; ``data`` lists the ids that existed and were removed"""
+    global _write_generation
+    _check_batch(note_ids)
+    if not note_ids:
+        return APIResponse([])
+    ids = list(dict.fromkeys(note_ids))
+    async with contextlib.AsyncExitStack() as held:
+        # A write-behind update of one of these notes either finishes first
+        # (and is discarded) or runs after and finds the note gone
+        for note_id in sorted(ids):
+            await held.enter_async_context(_note_lock(note_id))
+        await writes.discard(ids)
+        deleted = await get_backend().delete_notes(ids)
+        _write_generation += 1
+        for note_id in deleted:
+            cache.invalidate(("note", note_id))
+            cache.invalidate(("outline", note_id))
+            flights.forget(("note", note_id))
+            for index in _indexes:
+                index.remove(note_id)
+        cache.invalidate_prefix("query")
+        flights.forget_prefix("query")
+        flights.forget_prefix("notes")
+    return APIResponse(deleted)
+
+async def changes_since(cursor: Optional[str] = None, limit: Optional[int] = None,
+                        metadata_only: bool = False, use_cache: bool = True):
+    """Notes created or updated, and notes deleted, after ``cursor``.
+
+    ``cursor`` is the ``next_cursor`` of a previous call, an ISO 8601
+    timestamp (changes at or after it), or None for everything. ``data`` is
+    ``{"notes", "deleted", "next_cursor", "has_more"}``: up to ``limit``
+    changes in the order they were committed, split into notes and
+    ``{"id", "deleted_at", "change_seq"}`` tombstones. The cursor is the
+    database's change sequence, not a clock, so a change committed late or
+    stamped by another clock is never skipped. ``next_cursor`` is always set;
+    call again at once while ``has_more``, otherwise poll with it later.
+    """
+    limit = max(1, min(limit or PAGE_SIZE, MAX_PAGE_SIZE))
+    after, since = _decode_changes_cursor(cursor)
+    if writes.pending:
+        # Logged updates must reach the database before its ordering can include them
+        start_write_behind()
+        await writes.flush()
+    columns = SUMMARY_COLUMNS if metadata_only else "*"
+
+    async def fetch():
+        notes, deleted = await get_backend().list_changes(columns, after, since, limit + 1)
+        changes = sorted(notes + deleted, key=lambda row: row["change_seq"])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if changes:
+            position = {"s": changes[-1]["change_seq"]}
+        else:
+            position = {"s": after} if after is not None else {"t": since}
+        page = {id(row) for row in changes}
+        return APIResponse({
+            "notes": [row for row in notes if id(row) in page],
+            "deleted": [row for row in deleted if id(row) in page],
+            "next_cursor": _encode_token({"o": "changes", **position}),
+            "has_more": has_more,
+        })
+
+    if not use_cache:
+        return await fetch()
+    return await _cached_query(("query", "changes", cursor, limit, metadata_only), fetch)
+
+async def iter_notes(page_size: int = MAX_PAGE_SIZE, metadata_only: bool = False,
+                     order_by: str = "id", cursor: Optional[str] = None):
+    """Yield every note (after ``cursor``), one keyset page at a time, bypassing the cache"""
+    while True:
+        page = await get_notes(page_size, cursor, metadata_only, order_by, use_cache=False)
+        for row in page.data:
+            yield row
+        cursor = page.next_cursor
+        if cursor is None:
+            return
+
+async def build_indexes():
+    """Load every note into the in-process indexes, then keep them in sync"""
+    global _sync_cursor
+    related_index.open()
+    # Changes committed while the notes are read are applied again by the sync
+    _sync_cursor = _now()
+    if _native_indexes:
+        logger.info("Storage backend indexes search and tags itself; building the link graph only")
+    try:
+        async for row in iter_notes():
+            for index in _indexes:
+                index.add(row)
+    except Exception:
+        logger.exception("Building the note indexes failed; queries keep going to the backend")
+        return
+    if related_index.enabled:
+        await related_index.finish()
+    for index in _indexes:
+        index.ready = True
+    logger.info("Note indexes ready: %s", search_index.stats() if search_index.ready else link_index.stats())
+    start_index_sync()
+
+async def sync_indexes():
+    """Apply the changes committed since the last call, by any process, to the
+    in-process indexes and the note cache"""
+    global _sync_cursor, _write_generation
+    while True:
+        changes = (await changes_since(_sync_cursor, MAX_PAGE_SIZE, use_cache=False)).data
+        if changes["notes"] or changes["deleted"]:
+            _write_generation += 1
+            # Dropped rather than refreshed: a newer local write may already be cached
+            for note_id in [row["id"] for row in changes["notes"] + changes["deleted"]]:
+                cache.invalidate(("note", note_id))
+                cache.invalidate(("outline", note_id))
+                flights.forget(("note", note_id))
+            for index in _indexes:
+                for row in changes["notes"]:
+                    index.add(row)
+                for tombstone in changes["deleted"]:
+                    index.remove(tombstone["id"])
+            cache.invalidate_prefix("query")
+            flights.forget_prefix("query")
+            flights.forget_prefix("notes")
+        _sync_cursor = changes["next_cursor"]
+        if not changes["has_more"]:
+            return
+
+def start_index_sync():
+    """Poll the changes feed in the background; a no-op when INDEX_SYNC_INTERVAL is 0"""
+    global _sync_task
+    if INDEX_SYNC_INTERVAL > 0 and _sync_task is None:
+        _sync_task = asyncio.get_running_loop().create_task(_run_index_sync())
+
+async def _run_index_sync():
+    while True:
+        await asyncio.sleep(INDEX_SYNC_INTERVAL)
+        try:
+            await sync_indexes()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Reading the changes feed failed (%s); retrying in %gs", e, INDEX_SYNC_INTERVAL)
+
+async def stop_index_sync():
+    global _sync_task
+    if _sync_task is None:
+        return
+    _sync_task.cancel()
+    try:
+        await _sync_task
+    except asyncio.CancelledError:
+        pass
+    _sync_task = None
+
+async def open_connections(connections: int = 1):
+    """Connect to the backend before the first query needs it (startup warm-up)"""
+    await get_backend().connect(connections)
+
+async def prime_cache():
+    """Cache the first page of the default listing, with and without content:
+    what a client usually asks for first"""
+    await get_notes()
+    await get_notes(metadata_only=True)
+
+def _search_hit(row: dict, terms: List[str]) -> dict:
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "tags": row.get("tags"),
+        "updated_at": row.get("updated_at"),
+        "score": row.get("score"),
+        "snippet": make_snippet(row.get("content"), terms),
+    }
+
+async def search_notes(query: str, limit: int = 20):
+    """Search notes by title or content, best matches first"""
+    if search_index.ready:
+        return APIResponse(search_index.search(query, limit))
+
+    async def fetch():
+        return APIResponse(await get_backend().search(query, limit))
+
+    await _flush_pending()
+    response = await _cached_query(("query", "search", query, limit), fetch)
+    terms = tokenize(query)
+    return APIResponse([_search_hit(row, terms) for row in _overlay(response.data)])
+
+async def iter_search_notes(query: str, limit: Optional[int] = None, page_size: int = 200):
+    """Yield search hits as they become available.
+
+    From the index hits come best-first; otherwise they arrive page by page,
+    best-first from a ranking backend (SQLite FTS5) and in id order from the
+    Supabase ilike fallback.
+    """
+    if search_index.ready:
+        for hit in search_index.iter_search(query, limit):
+            yield hit
+        return
+
+    await _flush_pending()
+    terms = tokenize(query)
+    async for row in get_backend().iter_search(query, limit, page_size):
+        yield _search_hit(row, terms)
+
+async def search_notes_by_tags(tags: List[str], match: str = "any",
+                               exclude: Optional[List[str]] = None, limit: Optional[int] = None):
+    """Search notes by tags.
+
+    ``match`` is "any" or "all" of ``tags``; notes carrying any ``exclude`` tag
+    are dropped. Tags may be patterns: ``project/*`` (tag and its children) or
+    ``proj*`` (prefix). Returns id/title/tags/updated_at rows, ``count`` is the
+    number of matches before ``limit``.
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+    if tag_index.ready:
+        ids = tag_index.query(tags, match, exclude or ())
+        rows = [tag_index.summary(note_id) for note_id in ids[:limit]]
+        return APIResponse(rows, count=len(ids))
+
+    async def fetch():
+        rows, count = await get_backend().query_tags(list(tags), match, list(exclude or ()), limit)
+        return APIResponse(rows, count=count)
+
+    await _flush_pending()
+    key = ("query", "tags", tuple(tags), match, tuple(exclude or ()), limit)
+    return await _cached_query(key, fetch)
+
+async def tag_counts(prefix: Optional[str] = None):
+    """Number of notes per tag, from the tag index or the backend's own"""
+    if tag_index.ready:
+        return tag_index.counts(prefix)
+    if _native_indexes:
+        await _flush_pending()
+        return await get_backend().tag_counts(prefix)
+    raise ValueError("The tag index is still loading")
+
+def _require_links():
+    if not link_index.ready:
+        raise ValueError("The link index is still loading")
+
+def _linked_summaries(note_ids: List[int]) -> List[dict]:
+    return [link_index.summary(note_id) for note_id in note_ids]
+
+async def get_backlinks(note_id: int):
+    """Notes whose [[links]] point at this note's title; None if the note is unknown"""
+    _require_links()
+    if note_id not in link_index:
+        return APIResponse(None)
+    return APIResponse(_linked_summaries(link_index.backlinks(note_id)))
+
+async def get_outgoing_links(note_id: int):
+    """This note's [[links]] as ``{"target", "notes"}``; ``notes`` is empty for a dangling link"""
+    _require_links()
+    if note_id not in link_index:
+        return APIResponse(None)
+    return APIResponse([{"target": target, "notes": _linked_summaries(ids)}
+                        for target, ids in link_index.outgoing(note_id)])
+
+async def get_link_neighborhood(note_id: int, hops: int = 1, direction: str = "both",
+                                limit: Optional[int] = 100):
+    """Notes within ``hops`` links of this one, nearest first, each with its ``distance``"""
+    _require_links()
+    if direction not in LINK_DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(LINK_DIRECTIONS)}")
+    if note_id not in link_index:
+        return APIResponse(None)
+    found = link_index.neighborhood(note_id, max(0, hops), direction, limit)
+    return APIResponse([{**link_index.summary(i), "distance": d} for i, d in found.items()])
+
+async def link_report(limit: Optional[int] = 100):
+    """Orphans (notes with no links in or out) and dangling links (targets with no note)"""
+    _require_links()
+    orphans = link_index.orphans()
+    dangling = link_index.dangling()
+    targets = sorted(dangling, key=lambda t: (-len(dangling[t]), t.casefold()))[:limit]
+    return APIResponse({
+        "orphan_count": len(orphans),
+        "orphans": _linked_summaries(orphans[:limit]),
+        "dangling_count": len(dangling),
+        "dangling": [{"target": t, "linked_from": _linked_summaries(dangling[t])} for t in targets],
+    })
+
+async def save_indexes():
+    """Persist what the indexes keep on disk (the related-notes matrix)"""
+    if related_index.enabled and related_index.ready:
+        await related_index.save()
+
+def _require_related():
+    if not related_index.enabled:
+        raise ValueError("Related notes are disabled (RELATED_INDEX=0 or NumPy is not installed)")
+    if not related_index.ready:
+        raise ValueError("The related-notes index is still loading")
+
+def _scored(hits) -> List[dict]:
+    return [{"id": note_id, "title": related_index.title(note_id), "score": score} for note_id, score in hits]
+
+async def find_related_notes(note_id: int, k: int = 10):
+    """The ``k`` notes most similar to this one by content; None if the note is unknown"""
+    _require_related()
+    hits = related_index.related(note_id, max(1, min(k, MAX_PAGE_SIZE)))
+    return APIResponse(_scored(hits) if hits is not None else None)
+
+async def similar_to(text: str, k: int = 10):
+    """The ``k`` notes most similar to free ``text``"""
+    _require_related()
+    return APIResponse(_scored(related_index.similar(text, max(1, min(k, MAX_PAGE_SIZE)))))
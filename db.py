@@ -0,0 +1,240 @@
+"""
+Async access to the Supabase REST (PostgREST) endpoint.
+
+The supabase-py client is synchronous, so calling ``.execute()`` from an async
+handler blocks the event loop for the whole round trip. This module talks to
+PostgREST directly over a shared ``httpx.AsyncClient`` instead, with a bounded
+connection pool, explicit timeouts and a cap on queries in flight.
+
+The pool belongs to the event loop that opened it. Used from another loop, the
+client opens a new pool and closes the old one on its own loop if that loop is
+still running. A loop that has ended can't close its connections any more, so
+``aclose()`` (or ``storage.close_backend()``) should run before it ends.
+
+Tuning (all optional, read from the environment):
+
+- ``DB_TIMEOUT``          read/write timeout per query in seconds (default 10)
+- ``DB_CONNECT_TIMEOUT``  connect timeout in seconds (default 5)
+- ``DB_POOL_SIZE``        max open connections (default 20)
+- ``DB_POOL_KEEPALIVE``   idle connections kept for reuse (default 10)
+- ``DB_MAX_CONCURRENCY``  queries allowed in flight at once (default DB_POOL_SIZE)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+from dotenv import load_dotenv
+
+from metrics import record_db
+from storage import APIResponse  # noqa: F401 - re-exported for older imports
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+Params = Union[Dict[str, str], Sequence[Tuple[str, str]]]
+
+
+class APIError(Exception):
+    """Raised when PostgREST answers with an error status"""
+
+    def __init__(self, status_code: int, message: str, details: Any = None):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+        self.details = details
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class PostgrestClient:
+    """Pooled async client for one PostgREST endpoint.
+
+    The httpx pool and the concurrency semaphore belong to the event loop they
+    were created on, so they are (re)built on first use from a new loop. In the
+    normal server process that happens exactly once.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        pool_size: int = 20,
+        pool_keepalive: int = 10,
+        max_concurrency: Optional[int] = None,
+    ):
+        if not url or not key:
+            raise ValueError("Supabase URL and key are required (sb_url / sb_api)")
+        self.base_url = url.rstrip("/") + "/rest/v1"
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_keepalive,
+        )
+        self.max_concurrency = max_concurrency or pool_size
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "PostgrestClient":
+        pool_size = _env_int("DB_POOL_SIZE", 20)
+        return cls(
+            os.getenv("sb_url"),
+            os.getenv("sb_api"),
+            timeout=_env_float("DB_TIMEOUT", 10.0),
+            connect_timeout=_env_float("DB_CONNECT_TIMEOUT", 5.0),
+            pool_size=pool_size,
+            pool_keepalive=_env_int("DB_POOL_KEEPALIVE", min(10, pool_size)),
+            max_concurrency=_env_int("DB_MAX_CONCURRENCY", pool_size),
+        )
+
+    def _session(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._release(self._client, self._loop)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    def _release(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """Close a client left open by another event loop"""
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        elif not client.is_closed:
+            logger.warning("The Supabase client's event loop ended without aclose(); "
+                           "its pooled connections are dropped unclosed")
+
+    async def request(
+        self,
+        method: str,
+        table: str,
+        params: Optional[Params] = None,
+        json: Any = None,
+        prefer: Optional[List[str]] = None,
+        single: bool = False,
+    ) -> APIResponse:
+        client = self._session()
+        headers = {}
+        if single:
+            headers["Accept"] = "application/vnd.pgrst.object+json"
+        if prefer:
+            headers["Prefer"] = ",".join(prefer)
+
+        # Pool waits count as database time: that's where a slow Supabase shows up
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                resp = await client.request(method, f"/{table}", params=params, json=json, headers=headers)
+        except Exception:
+            record_db("supabase", method, time.perf_counter() - start, failed=True)
+            raise
+        failed = resp.status_code >= 400 and not (single and resp.status_code == 406)
+        record_db("supabase", method, time.perf_counter() - start, failed)
+
+        # PostgREST answers 406 when a single-object request matched no rows
+        if single and resp.status_code == 406:
+            return APIResponse(None)
+        if resp.status_code >= 400:
+            try:
+                body = resp.json()
+            except ValueError:
+                body = {"message": resp.text}
+            raise APIError(resp.status_code, body.get("message", resp.reason_phrase), body.get("details"))
+
+        data = resp.json() if resp.content else None
+        return APIResponse(data, _parse_count(resp.headers.get("content-range")))
+
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        params: Optional[Params] = None,
+        single: bool = False,
+        count: bool = False,
+        order: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> APIResponse:
+        query = [("select", columns)] + _items(params)
+        if order:
+            query.append(("order", order))
+        if limit is not None:
+            query.append(("limit", str(limit)))
+        prefer = ["count=exact"] if count else None
+        return await self.request("GET", table, params=query, prefer=prefer, single=single)
+
+    async def insert(self, table: str, rows: Union[Dict, List[Dict]]) -> APIResponse:
+        return await self.request("POST", table, json=rows, prefer=["return=representation"])
+
+    async def update(self, table: str, values: Dict, params: Params) -> APIResponse:
+        return await self.request("PATCH", table, params=params, json=values, prefer=["return=representation"])
+
+    async def upsert(self, table: str, rows: List[Dict], on_conflict: str = "id") -> APIResponse:
+        """Insert ``rows`` or merge them into existing rows with the same key"""
+        return await self.request(
+            "POST", table, params={"on_conflict": on_conflict}, json=rows,
+            prefer=["resolution=merge-duplicates", "return=representation"],
+        )
+
+    async def delete(self, table: str, params: Params, columns: str = "id") -> APIResponse:
+        """Delete matching rows; ``data`` lists them (only ``columns``)"""
+        query = _items(params) + [("select", columns)]
+        return await self.request("DELETE", table, params=query, prefer=["return=representation"])
+
+    async def connect(self, connections: int = 1):
+        """Open up to ``connections`` pooled connections (at most the keep-alive
+        limit) with that many concurrent one-row queries, so the first real
+        queries don't pay for DNS, TCP and TLS"""
+        connections = max(1, min(connections, self.limits.max_keepalive_connections or 1))
+        await asyncio.gather(*(self.select("notes", "id", limit=1) for _ in range(connections)))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+def _items(params: Optional[Params]) -> List[Tuple[str, str]]:
+    if not params:
+        return []
+    if isinstance(params, dict):
+        return list(params.items())
+    return list(params)
+
+
+def _parse_count(content_range: Optional[str]) -> Optional[int]:
+    # "0-24/3573" or "*/0"; the total is "*" unless count=exact was requested
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def quote(value: str) -> str:
+    """Quote a value for use inside a PostgREST filter expression"""
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
@@ -0,0 +1,77 @@
+"""
+One JSON encoder for every response path.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise (and for the rare values orjson refuses, such as integers beyond 64
+bits). Both produce compact UTF-8 bytes, and both write datetimes as ISO 8601.
+
+``JSONBytesResponse`` renders through ``dumps`` and also accepts bytes that
+are already encoded. Returning one from a FastAPI route skips
+``jsonable_encoder`` and the response_model pass, so a large note is encoded
+once instead of being walked again by pydantic. It is created on first
+access, so code that only encodes (the stdio transport) never imports Starlette.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    for method in ("model_dump", "dict"):  # pydantic v2 / v1 models
+        if hasattr(value, method):
+            return getattr(value, method)()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(value: Any) -> str:
+    # ASCII output keeps the str -> bytes step a plain copy
+    return json.dumps(value, default=_default, separators=(",", ":"))
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return _stdlib_dumps(value).encode()
+
+
+def dumps_str(value: Any) -> str:
+    """``dumps`` for JSON that is embedded in another document as a string"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS).decode()
+        except TypeError:
+            pass
+    return _stdlib_dumps(value)
+
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+def __getattr__(name: str) -> Any:
+    if name != "JSONBytesResponse":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from starlette.responses import Response
+
+    class JSONBytesResponse(Response):
+        media_type = "application/json"
+
+        def render(self, content: Any) -> bytes:
+            return content if isinstance(content, bytes) else dumps(content)
+
+    globals()[name] = JSONBytesResponse
+    return JSONBytesResponse
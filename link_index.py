@@ -0,0 +1,197 @@
+"""
+In-memory ``[[wikilink]]`` graph between notes.
+
+Links point at note titles, as in Obsidian: ``[[Note]]``, ``[[Note|alias]]``,
+``[[Note#Heading]]``, ``[[folder/Note]]`` and ``![[Note]]`` embeds all link
+to the note titled "Note", compared case-insensitively. Links inside code
+blocks and inline code are ignored.
+
+Every link target and title is interned to an integer name id. Each note keeps
+a sorted ``array('q')`` of the name ids it links to, and each name keeps
+sorted arrays of the notes linking to it and of the notes with that title.
+Backlinks and outgoing links are therefore read straight off one array each,
+in time proportional to the note's degree. A note that is renamed keeps its
+backlinks from notes that already used the new title, and links to the old
+title become dangling, as in Obsidian.
+"""
+
+import re
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+LINK_DIRECTIONS = ("out", "in", "both")
+
+WIKILINK_RE = re.compile(r"!?\[\[([^\[\]|#^\n]+)[^\[\]\n]*\]\]")
+FENCE_RE = re.compile(r"^(```|~~~).*?^\1", re.MULTILINE | re.DOTALL)
+INLINE_CODE_RE = re.compile(r"`[^`\n]*`")
+
+
+def normalize_target(target: str) -> str:
+    """The title a link or note name refers to: last path part, no .md, casefolded"""
+    name = target.strip().rsplit("/", 1)[-1]
+    if name.lower().endswith(".md"):
+        name = name[:-3]
+    return name.strip().casefold()
+
+
+def extract_links(content: str) -> List[str]:
+    """Link targets in ``content`` as written, first occurrence order, without duplicates"""
+    if "[[" not in content:
+        return []
+    text = INLINE_CODE_RE.sub("", FENCE_RE.sub("", content))
+    return list(dict.fromkeys(m.group(1).strip() for m in WIKILINK_RE.finditer(text)))
+
+
+def _insert(postings: array, value: int):
+    pos = bisect_left(postings, value)
+    if pos == len(postings) or postings[pos] != value:
+        postings.insert(pos, value)
+
+
+def _discard(postings: array, value: int):
+    pos = bisect_left(postings, value)
+    if pos < len(postings) and postings[pos] == value:
+        del postings[pos]
+
+
+class LinkIndex:
+    """Title/link adjacency arrays with backlink, neighborhood and orphan queries"""
+
+    def __init__(self):
+        self.ready = False
+        self._name_ids: Dict[str, int] = {}
+        self._names: List[str] = []  # name id -> target as first written
+        self._linked_from: Dict[int, array] = {}  # name id -> ids of notes linking to it
+        self._titled: Dict[int, array] = {}  # name id -> ids of notes with that title
+        # note id -> (title, title name id, sorted linked name ids, updated_at)
+        self._notes: Dict[int, Tuple[str, int, array, Any]] = {}
+
+    def __len__(self):
+        return len(self._notes)
+
+    def _intern(self, target: str) -> int:
+        key = normalize_target(target)
+        name_id = self._name_ids.get(key)
+        if name_id is None:
+            name_id = self._name_ids[key] = len(self._names)
+            self._names.append(target.strip())
+        return name_id
+
+    def add(self, note: Dict[str, Any]):
+        """Index ``note``'s title and links, replacing whatever was indexed for it before"""
+        note_id = note["id"]
+        previous = self._notes.get(note_id)
+        if previous and previous[3] and note.get("updated_at") and previous[3] > note["updated_at"]:
+            return  # a newer version is already indexed
+        title = note.get("title") or ""
+        title_id = self._intern(title)
+        if "content" in note or previous is None:
+            links = array("q", sorted({self._intern(t) for t in extract_links(note.get("content") or "")}
+                                      - {title_id}))
+        else:
+            links = previous[2]  # a metadata-only row leaves the links as they were
+        if previous is not None:
+            self._unlink(note_id, previous, links, title_id)
+        for name_id in links if previous is None else set(links) - set(previous[2]):
+            _insert(self._linked_from.setdefault(name_id, array("q")), note_id)
+        if previous is None or previous[1] != title_id:
+            _insert(self._titled.setdefault(title_id, array("q")), note_id)
+        self._notes[note_id] = (title, title_id, links, note.get("updated_at"))
+
+    def remove(self, note_id: int):
+        previous = self._notes.pop(note_id, None)
+        if previous is not None:
+            self._unlink(note_id, previous, array("q"), None)
+
+    def _unlink(self, note_id: int, previous: tuple, links: array, title_id: Optional[int]):
+        for name_id in set(previous[2]) - set(links):
+            self._drop(self._linked_from, name_id, note_id)
+        if previous[1] != title_id:
+            self._drop(self._titled, previous[1], note_id)
+
+    @staticmethod
+    def _drop(table: Dict[int, array], name_id: int, note_id: int):
+        postings = table.get(name_id)
+        if postings is not None:
+            _discard(postings, note_id)
+            if not postings:
+                del table[name_id]
+
+    def __contains__(self, note_id: int) -> bool:
+        return note_id in self._notes
+
+    def summary(self, note_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._notes.get(note_id)
+        return {"id": note_id, "title": entry[0]} if entry else None
+
+    def backlinks(self, note_id: int) -> List[int]:
+        """Sorted ids of the notes linking to ``note_id``'s title"""
+        entry = self._notes.get(note_id)
+        if entry is None:
+            return []
+        return [i for i in self._linked_from.get(entry[1], ()) if i != note_id]
+
+    def outgoing(self, note_id: int) -> List[Tuple[str, List[int]]]:
+        """(target as written, ids of notes with that title) per link of ``note_id``;
+        an empty id list is a dangling link"""
+        entry = self._notes.get(note_id)
+        if entry is None:
+            return []
+        return [(self._names[name_id], list(self._titled.get(name_id, ()))) for name_id in entry[2]]
+
+    def _neighbors(self, note_id: int, direction: str) -> Iterable[int]:
+        entry = self._notes[note_id]
+        if direction in ("out", "both"):
+            for name_id in entry[2]:
+                yield from self._titled.get(name_id, ())
+        if direction in ("in", "both"):
+            yield from self._linked_from.get(entry[1], ())
+
+    def neighborhood(self, note_id: int, hops: int = 1, direction: str = "both",
+                     limit: Optional[int] = None) -> Dict[int, int]:
+        """Note id -> hop distance for notes within ``hops`` links of ``note_id``
+        (breadth-first, so the nearest are kept when ``limit`` cuts it short)"""
+        if direction not in LINK_DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(LINK_DIRECTIONS)}")
+        if note_id not in self._notes:
+            return {}
+        distances = {note_id: 0}
+        queue = deque([note_id])
+        found: Dict[int, int] = {}
+        while queue:
+            current = queue.popleft()
+            distance = distances[current] + 1
+            if distance > hops:
+                break
+            for neighbor in self._neighbors(current, direction):
+                if neighbor in distances:
+                    continue
+                distances[neighbor] = distance
+                found[neighbor] = distance
+                if limit is not None and len(found) >= limit:
+                    return found
+                queue.append(neighbor)
+        return found
+
+    def orphans(self) -> List[int]:
+        """Sorted ids of notes with no resolved links in or out"""
+        out = []
+        for note_id, (_, title_id, links, _) in self._notes.items():
+            if any(i != note_id for i in self._linked_from.get(title_id, ())):
+                continue
+            if any(name_id in self._titled for name_id in links):
+                continue
+            out.append(note_id)
+        return sorted(out)
+
+    def dangling(self) -> Dict[str, List[int]]:
+        """Link target -> sorted ids of the notes linking to it, for targets no note has as title"""
+        return {self._names[name_id]: list(sources)
+                for name_id, sources in self._linked_from.items() if name_id not in self._titled}
+
+    def stats(self) -> Dict[str, int]:
+        return {"notes": len(self._notes),
+                "links": sum(len(entry[2]) for entry in self._notes.values()),
+                "targets": len(self._linked_from)}
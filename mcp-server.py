@@ -1,140 +1,172 @@
+# Imported first so the startup clock covers the imports below; see startup.py
+from startup import Startup
+startup = Startup.from_env()
+
 from mcp.server.fastmcp import FastMCP
-from crud import get_notes, get_note, update_note, create_note, search_notes, search_notes_by_tags
-from fastapi import HTTPException, Header, Depends
-from fastapi.responses import JSONResponse
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List, Optional
-import json
+from crud import get_notes_by_ids as fetch_notes_by_ids, create_notes as bulk_create_notes, update_notes as bulk_update_notes
+from crud import append_to_note as append_note_text, prepend_to_note as prepend_note_text, patch_note as apply_note_edits, ConflictError
+from crud import get_note_outline as fetch_note_outline, read_note_section as fetch_note_section
+from crud import get_backlinks as fetch_backlinks, get_outgoing_links as fetch_outgoing_links, get_link_neighborhood, link_report
+from crud import find_related_notes as fetch_related_notes, similar_to as fetch_similar_notes, save_indexes
+from crud import start_write_behind, stop_write_behind, stop_index_sync, close_backend, changes_since as fetch_changes, open_connections, prime_cache
+from crud import get_notes, get_note, update_note, create_note, search_notes, search_notes_by_tags, iter_notes, iter_search_notes, tag_counts, cache_stats, build_indexes
+from typing import Any, Dict, List, Optional, Union
+from admission import Admission, Rejected
+import metrics
 import os
+import time
 
-# Create an MCP server
-mcp = FastMCP("Obsidian")
+# FastAPI is only imported by the HTTP transport: the auth dependency and
+# everything registered in configure_http() are created when the app is built
 
-# Security setup
-security = HTTPBearer(auto_error=False)
+def auth_dependencies():
+    """verify_token, as a route dependency"""
+    from fastapi import HTTPException, Depends
+    from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+    # Security setup
+    security = HTTPBearer(auto_error=False)
+
+    async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        """Verify API token - optional for development"""
+        expected_token = os.getenv("MCP_API_TOKEN")
+
+        # If no token is set in environment, allow all requests
+        if not expected_token:
+            return True
+
+        # If token is set, verify it
+        if not credentials or credentials.credentials != expected_token:
+            raise HTTPException(status_code=401, detail="Invalid API token")
 
-async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify API token - optional for development"""
-    expected_token = os.getenv("MCP_API_TOKEN")
-    
-    # If no token is set in environment, allow all requests
-    if not expected_token:
         return True
-    
-    # If token is set, verify it
-    if not credentials or credentials.credentials != expected_token:
-        raise HTTPException(status_code=401, detail="Invalid API token")
-    
-    return True
-
-# Add CORS and authentication to the FastMCP app
-@mcp.app.middleware("http")
-async def add_cors_header(request, call_next):
-    response = await call_next(request)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response.headers["Access-Control-Allow-Headers"] = "*"
-    return response
-
-# Add a health check endpoint
-@mcp.app.get("/")
-async def health_check():
-    """Health check endpoint"""
-    return JSONResponse({
-        "status": "healthy",
-        "service": "Obsidian MCP Server",
-        "version": "1.0.0",
-        "endpoints": {
-            "mcp": "/mcp/message",
-            "initialize": "/initialize",
-            "tools_list": "/tools/list", 
-            "tools_call": "/tools/call",
-            "health": "/"
-        },
-        "message": "Server is running! Use POST endpoints for MCP requests.",
-        "authentication": "Bearer token supported" if os.getenv("MCP_API_TOKEN") else "No authentication required",
-        "mcp_protocol": "2024-11-05"
-    })
-
-@mcp.app.get("/health")
-async def health():
-    """Alternative health check endpoint"""
-    return JSONResponse({"status": "healthy", "service": "Obsidian MCP Server"})
-
-# Keep the original MCP message handler for backward compatibility
-@mcp.app.post("/mcp/message")
-async def handle_mcp_message(message: dict, token_valid: bool = Depends(verify_token)):
-    """Handle MCP messages with optional authentication (backward compatibility)"""
-    return await mcp._dispatch(message)
-
-# Override the default MCP endpoints to be more compliant
-@mcp.app.post("/initialize")
-async def initialize_mcp(request: dict, token_valid: bool = Depends(verify_token)):
-    """Initialize MCP connection"""
-    return {
-        "protocolVersion": "2024-11-05",
-        "capabilities": {
-            "tools": {},
-            "prompts": {},
-            "resources": {}
-        },
-        "serverInfo": {
-            "name": "Obsidian Notes MCP Server",
-            "version": "1.0.0"
-        }
-    }
 
-@mcp.app.post("/tools/list")
-async def list_tools_mcp(token_valid: bool = Depends(verify_token)):
-    """List available tools"""
-    tools = []
-    for name, fn in mcp.tools.items():
-        tools.append({
-            "name": name,
-            "description": fn.__doc__ or f"Tool: {name}",
-            "inputSchema": {
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
+    return [Depends(verify_token)]
+
+# Create an MCP server; verify_token guards /mcp/message, /initialize and /tools/*
+mcp = FastMCP(
+    "Obsidian",
+    dependencies=auth_dependencies,
+    batch_concurrency=int(os.getenv("MCP_BATCH_CONCURRENCY", 8)),
+    max_batch=int(os.getenv("MCP_MAX_BATCH", 100)),
+    call_timeout=float(os.getenv("MCP_CALL_TIMEOUT", 30)),
+    stdio_max_in_flight=int(os.getenv("MCP_STDIO_MAX_IN_FLIGHT", 64)),
+)
+
+# Rate and concurrency limits per client and overall; see admission.py
+admission = Admission.from_env()
+ADMITTED_PATHS = ("/mcp/message", "/tools/call", "/tools/stream")
+
+def _client_key(request) -> str:
+    return admission.client_address(request.headers.get("x-forwarded-for"),
+                                    request.client.host if request.client else None)
+
+@mcp.on_http_app()
+def configure_http(app):
+    """Middleware, health checks and CORS preflight routes of the HTTP transport"""
+    from fastapi.responses import JSONResponse
+
+    # Registered first so it runs innermost: rejections still get CORS headers and metrics
+    @app.middleware("http")
+    async def admit_request(request, call_next):
+        if not admission.enabled or request.method != "POST" or request.url.path not in ADMITTED_PATHS:
+            return await call_next(request)
+        try:
+            ticket = await admission.admit(_client_key(request))
+        except Rejected as e:
+            return JSONResponse({"error": e.reason}, status_code=e.status,
+                                headers={"Retry-After": str(e.retry_after)})
+        try:
+            response = await call_next(request)
+        except BaseException:
+            ticket.release()
+            raise
+
+        async def body_then_release(body):
+            # Streamed bodies (/tools/stream) keep their slot until the last chunk
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                ticket.release()
+
+        response.body_iterator = body_then_release(response.body_iterator)
+        return response
+
+    # Add CORS and authentication to the FastMCP app
+    @app.middleware("http")
+    async def add_cors_header(request, call_next):
+        response = await call_next(request)
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = "*"
+        return response
+
+    @app.middleware("http")
+    async def record_http_metrics(request, call_next):
+        if not metrics.ENABLED:
+            return await call_next(request)
+        metrics.HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Label by route template, not raw path, to keep the series bounded
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            metrics.HTTP_IN_FLIGHT.dec()
+            metrics.HTTP_REQUESTS.inc(request.method, path, str(status))
+            metrics.HTTP_SECONDS.observe(time.perf_counter() - start, request.method, path)
+
+    # Add a health check endpoint
+    @app.get("/")
+    async def health_check():
+        """Health check endpoint"""
+        return JSONResponse({
+            "status": "healthy",
+            "service": "Obsidian MCP Server",
+            "version": "1.0.0",
+            "endpoints": {
+                "mcp": "/mcp/message",
+                "initialize": "/initialize",
+                "tools_list": "/tools/list", 
+                "tools_call": "/tools/call",
+                "metrics": "/metrics",
+                "health": "/"
+            },
+            "message": "Server is running! Use POST endpoints for MCP requests.",
+            "authentication": "Bearer token supported" if os.getenv("MCP_API_TOKEN") else "No authentication required",
+            "mcp_protocol": "2024-11-05"
         })
-    return {"tools": tools}
 
-@mcp.app.post("/tools/call")
-async def call_tool_mcp(request: dict, token_valid: bool = Depends(verify_token)):
-    """Call a specific tool"""
-    name = request.get("name")
-    arguments = request.get("arguments", {})
-    
-    if name not in mcp.tools:
-        return {"error": f"Tool '{name}' not found"}
-    
-    try:
-        fn = mcp.tools[name]
-        if hasattr(fn, '__code__') and fn.__code__.co_flags & 0x80:  # Check if async
-            result = await fn(**arguments)
-        else:
-            result = fn(**arguments)
-        return {"content": [{"type": "text", "text": json.dumps(result)}]}
-    except Exception as e:
-        return {"error": str(e)}
+    @app.get("/health")
+    async def health():
+        """Readiness check: 503 while MCP_WARMUP is still warming up, with startup timings"""
+        return JSONResponse({
+            "status": "healthy" if startup.ready else "starting",
+            "service": "Obsidian MCP Server",
+            "startup": startup.stats(),
+        }, status_code=200 if startup.ready else 503)
 
-# Add OPTIONS handlers for CORS
-@mcp.app.options("/initialize")
-async def options_initialize():
-    return JSONResponse({"status": "ok"})
+    # Add OPTIONS handlers for CORS
+    @app.options("/initialize")
+    async def options_initialize():
+        return JSONResponse({"status": "ok"})
 
-@mcp.app.options("/tools/list")
-async def options_tools_list():
-    return JSONResponse({"status": "ok"})
+    @app.options("/tools/list")
+    async def options_tools_list():
+        return JSONResponse({"status": "ok"})
 
-@mcp.app.options("/tools/call")
-async def options_tools_call():
-    return JSONResponse({"status": "ok"})
+    @app.options("/tools/call")
+    async def options_tools_call():
+        return JSONResponse({"status": "ok"})
 
-@mcp.app.options("/mcp/message")
-async def options_mcp_message():
-    return JSONResponse({"status": "ok"})
+    @app.options("/mcp/message")
+    async def options_mcp_message():
+        return JSONResponse({"status": "ok"})
 
 @mcp.prompt()
 def obsidian(user_name: str = "User", user_title: str = "Note Taker") -> str:
@@ -145,11 +177,15 @@ You are an assistant helping {user_name} ({user_title}) manage their Obsidian no
 
 **Capabilities:**
 - Search through notes by content or title
-- Read specific notes by ID
+- Read specific notes by ID, or just the outline and one section of a large note
 - Create new notes in markdown format
 - Update existing notes
-- Search by tags
-- List all notes
+- Append, prepend or patch part of a note (by line or heading) without resending it
+- Read, create and update many notes in one call
+- Search by tags (any/all/exclude, `project/*` hierarchies) and count notes per tag
+- Find notes related to a note or to a piece of text
+- Follow [[wikilinks]]: backlinks, outgoing links, linked notes a few hops away, orphans and dangling links
+- List notes page by page (optionally metadata only), or only what changed since a cursor
 
 **Preferences:** 
 - When creating or updating notes, use markdown formatting
@@ -157,19 +193,60 @@ You are an assistant helping {user_name} ({user_title}) manage their Obsidian no
 - Always confirm successful operations
 """
 
+@mcp.on_startup()
+async def load_indexes():
+    """Start flushing logged writes, then load all notes into the in-process
+    indexes. With MCP_WARMUP=1, connect first and prime the cache after, and
+    only then report ready"""
+    start_write_behind()
+    if not startup.warmup:
+        startup.mark_ready()
+        with startup.phase("indexes"):
+            await build_indexes()
+        return
+    await startup.warm_up([
+        ("connect", lambda: open_connections(startup.connections)),
+        ("indexes", build_indexes),
+        ("cache", prime_cache),
+    ])
+
+@mcp.on_shutdown()
+async def persist_indexes():
+    """Stop syncing the indexes, flush logged writes, save the related-notes
+    matrix so the next start only re-vectorises changed notes, and close the
+    database connections"""
+    await stop_index_sync()
+    await stop_write_behind()
+    await save_indexes()
+    await close_backend()
+
 # Define tools
 @mcp.tool()
-async def list_all_notes():
-    """Get all notes from the database"""
+async def list_all_notes(limit: Optional[int] = None, cursor: Optional[str] = None, metadata_only: bool = False, order_by: str = "id"):
+    """List notes one page at a time; pass next_cursor back to get the next page. metadata_only returns id, title, tags, size_bytes, updated_at and change_seq without content. order_by is "id" or "updated_at"."""
     try:
-        response = await get_notes()
-        if response.data:
-            return {
-                "success": True,
-                "count": len(response.data),
-                "notes": response.data
-            }
-        return {"success": True, "count": 0, "notes": []}
+        response = await get_notes(limit, cursor, metadata_only, order_by)
+        return {
+            "success": True,
+            "count": len(response.data),
+            "notes": response.data,
+            "next_cursor": response.next_cursor
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.stream("list_all_notes")
+async def stream_all_notes(metadata_only: bool = False, order_by: str = "id", cursor: Optional[str] = None, page_size: int = 200):
+    """Stream every note (after cursor), fetched from the database page by page"""
+    async for note in iter_notes(page_size, metadata_only, order_by, cursor):
+        yield note
+
+@mcp.tool()
+async def changes_since(cursor: Optional[str] = None, limit: Optional[int] = None, metadata_only: bool = False):
+    """Notes created or updated and ids of notes deleted since cursor, for keeping a copy of the vault in sync. cursor is next_cursor from the previous call, an ISO timestamp, or omitted for everything. Call again right away while has_more is true."""
+    try:
+        response = await fetch_changes(cursor, limit, metadata_only)
+        return {"success": True, **response.data}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -184,6 +261,33 @@ async def get_note_by_id(note_id: int):
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@mcp.tool()
+async def get_note_outline(note_id: int, max_level: int = 6):
+    """Get a note's headings without its content: each section's heading, level, path (outer to inner headings), line, byte offset and size in bytes. Use it to find the part of a large note to read with read_note_section"""
+    try:
+        response = await fetch_note_outline(note_id)
+        if response.data is None:
+            return {"success": False, "error": "Note not found"}
+        outline = response.data
+        sections = outline["sections"]
+        if max_level < 6:
+            sections = [s for s in sections if s["level"] <= max_level]
+        return {"success": True, **outline, "sections": sections}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def read_note_section(note_id: int, heading: Union[str, List[str], None] = None, offset: int = 0, length: Optional[int] = None):
+    """Read part of a note. heading returns that heading's section including subsections; it is a heading text ("Tasks") or a path of headings (["Projects", "Tasks"]). Without heading, reads length bytes (default 16 KB) starting at byte offset. Continue with offset=next_offset until next_offset is null"""
+    try:
+        path = [heading] if isinstance(heading, str) else heading
+        response = await fetch_note_section(note_id, path, offset, length)
+        if response.data is None:
+            return {"success": False, "error": "Note not found"}
+        return {"success": True, **response.data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @mcp.tool()
 async def create_new_note(title: str, content: str = "", tags: Optional[List[str]] = None):
     """Create a new note with title, content, and optional tags"""
@@ -206,11 +310,90 @@ async def update_existing_note(note_id: int, title: str = None, content: str = N
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def _edit_result(response):
+    if response.data is None:
+        return {"success": False, "error": "Note not found"}
+    return {"success": True, **response.data}
+
+def _conflict_result(e: ConflictError):
+    return {"success": False, "error": str(e), "conflict": True, "updated_at": e.updated_at}
+
+@mcp.tool()
+async def append_to_note(note_id: int, text: str, expected_updated_at: Optional[str] = None):
+    """Append text as new lines at the end of a note without sending the whole note. Returns only the added lines, the new updated_at and size_bytes. Pass expected_updated_at to fail instead of writing if the note changed since you read it"""
+    try:
+        return _edit_result(await append_note_text(note_id, text, expected_updated_at))
+    except ConflictError as e:
+        return _conflict_result(e)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @mcp.tool()
-async def search_notes_content(query: str):
-    """Search notes by title or content using a text query"""
+async def prepend_to_note(note_id: int, text: str, expected_updated_at: Optional[str] = None):
+    """Insert text as new lines at the top of a note (below YAML frontmatter). Returns only the added lines, the new updated_at and size_bytes. Pass expected_updated_at to fail instead of writing if the note changed since you read it"""
     try:
-        response = await search_notes(query)
+        return _edit_result(await prepend_note_text(note_id, text, expected_updated_at))
+    except ConflictError as e:
+        return _conflict_result(e)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def patch_note(note_id: int, edits: List[Dict[str, Any]], expected_updated_at: Optional[str] = None):
+    """Edit part of a note, applied in order. Each edit is one of {"op": "replace_lines", "start", "end"?, "text"}, {"op": "insert_lines", "after" (0 = top), "text"}, {"op": "delete_lines", "start", "end"?}, or {"op": "replace_section" | "append_to_section" | "prepend_to_section", "heading" (e.g. "## Tasks" or "Tasks"), "text"}. Lines count from 1, ranges are inclusive. Pass the updated_at you read as expected_updated_at so the patch fails with conflict=true if the note changed meanwhile. Returns the changed lines, new updated_at and size_bytes"""
+    try:
+        return _edit_result(await apply_note_edits(note_id, edits, expected_updated_at))
+    except ConflictError as e:
+        return _conflict_result(e)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def _batch_result(results: List[Dict[str, Any]]):
+    succeeded = sum(1 for r in results if r.get("success"))
+    return {
+        "success": succeeded == len(results),
+        "count": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }
+
+@mcp.tool()
+async def get_notes_by_ids(note_ids: List[int]):
+    """Get several notes by ID in one call; results are in the same order as note_ids"""
+    try:
+        response = await fetch_notes_by_ids(note_ids)
+        return _batch_result([
+            {"id": note_id, "success": True, "note": note} if note is not None
+            else {"id": note_id, "success": False, "error": "Note not found"}
+            for note_id, note in zip(note_ids, response.data)
+        ])
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def create_notes(notes: List[Dict[str, Any]]):
+    """Create several notes in one call. Each item is {"title", "content"?, "tags"?}; results are reported per item"""
+    try:
+        response = await bulk_create_notes(notes)
+        return _batch_result(response.data)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def update_notes(updates: List[Dict[str, Any]]):
+    """Update several notes in one call. Each item is {"id", "title"?, "content"?, "tags"?}; omitted fields are unchanged and results are reported per item"""
+    try:
+        response = await bulk_update_notes(updates)
+        return _batch_result(response.data)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def search_notes_content(query: str, limit: int = 20):
+    """Search notes by title or content; returns the best matches first with a snippet of each"""
+    try:
+        response = await search_notes(query, limit)
         if response.data:
             return {
                 "success": True,
@@ -222,22 +405,105 @@ async def search_notes_content(query: str):
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@mcp.stream("search_notes_content")
+async def stream_search_notes(query: str, limit: Optional[int] = None):
+    """Stream search hits as they are produced, best matches first"""
+    async for hit in iter_search_notes(query, limit):
+        yield hit
+
 @mcp.tool()
-async def search_by_tags(tags: List[str]):
-    """Search notes that contain any of the specified tags"""
+async def search_by_tags(tags: List[str], match: str = "any", exclude: Optional[List[str]] = None, limit: int = 100):
+    """Find notes by tag. match="any" (default) or "all" of the tags; exclude drops notes with any of those tags. Tags may be patterns: "project/*" matches project and its sub-tags, "proj*" any tag starting with proj"""
     try:
-        response = await search_notes_by_tags(tags)
-        if response.data:
-            return {
-                "success": True,
-                "tags": tags,
-                "count": len(response.data),
-                "notes": response.data
-            }
-        return {"success": True, "tags": tags, "count": 0, "notes": []}
+        response = await search_notes_by_tags(tags, match, exclude, limit)
+        return {
+            "success": True,
+            "tags": tags,
+            "match": match,
+            "exclude": exclude or [],
+            "count": response.count if response.count is not None else len(response.data),
+            "notes": response.data
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def get_tag_counts(prefix: Optional[str] = None):
+    """Count notes per tag, optionally only for tags starting with prefix (e.g. "project/")"""
+    try:
+        counts = await tag_counts(prefix)
+        return {"success": True, "count": len(counts), "tags": counts}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@mcp.tool()
+async def get_backlinks(note_id: int):
+    """List the notes that link to this note with [[wikilinks]] to its title"""
+    try:
+        response = await fetch_backlinks(note_id)
+        if response.data is None:
+            return {"success": False, "error": "Note not found"}
+        return {"success": True, "note_id": note_id, "count": len(response.data), "notes": response.data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def get_outgoing_links(note_id: int):
+    """List this note's [[wikilinks]] and the notes they resolve to; a link with no notes is dangling"""
+    try:
+        response = await fetch_outgoing_links(note_id)
+        if response.data is None:
+            return {"success": False, "error": "Note not found"}
+        return {"success": True, "note_id": note_id, "count": len(response.data), "links": response.data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def get_linked_notes(note_id: int, hops: int = 2, direction: str = "both", limit: int = 100):
+    """Find notes within hops [[wikilinks]] of a note, nearest first, each with its distance. direction is "both" (default), "out" (notes it links to) or "in" (notes linking to it)"""
+    try:
+        response = await get_link_neighborhood(note_id, hops, direction, limit)
+        if response.data is None:
+            return {"success": False, "error": "Note not found"}
+        return {"success": True, "note_id": note_id, "hops": hops, "direction": direction,
+                "count": len(response.data), "notes": response.data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def get_link_report(limit: int = 100):
+    """Report orphan notes (no links in or out) and dangling [[wikilinks]] (no note has that title), most-linked first"""
+    try:
+        response = await link_report(limit)
+        return {"success": True, **response.data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def find_related_notes(note_id: int, k: int = 10):
+    """Find the k notes most similar in content to this one (hashed TF-IDF cosine similarity, works offline), best first with a score between 0 and 1"""
+    try:
+        response = await fetch_related_notes(note_id, k)
+        if response.data is None:
+            return {"success": False, "error": "Note not found"}
+        return {"success": True, "note_id": note_id, "count": len(response.data), "notes": response.data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+async def similar_to(text: str, k: int = 10):
+    """Find the k notes most similar in content to a piece of free text, best first with a score between 0 and 1. Unlike search_notes_content it also finds notes that share only some of the words"""
+    try:
+        response = await fetch_similar_notes(text, k)
+        return {"success": True, "count": len(response.data), "notes": response.data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool()
+def get_cache_stats():
+    """Get hit/miss/eviction counters and memory use of the note cache, how many reads were coalesced, and pending write-behind updates"""
+    return {"success": True, "cache": cache_stats(), "admission": admission.stats()}
+
 if __name__ == "__main__":
     import sys
     import os
@@ -245,14 +511,22 @@ if __name__ == "__main__":
     # Get port from environment (Render sets this)
     port = int(os.getenv("PORT", 8000))
     
+    startup.mark_imported()
+
     # Check if HTTP mode is requested or if PORT env var is set (Render deployment)
     if len(sys.argv) > 1 and sys.argv[1] == "--http" or os.getenv("PORT"):
+        with startup.phase("http_app"):
+            mcp.app
         print("🌐 Starting Obsidian MCP Server on HTTP...")
+        print(f"⏱️ Loaded in {startup.elapsed():.2f}s (import {startup.phases['import']:.2f}s); "
+              f"startup timings at /health")
         print(f"📡 Server will be available at: http://0.0.0.0:{port}")
         print("🔗 MCP endpoint: /mcp/message")
         print("🛑 Press Ctrl+C to stop the server")
         mcp.run(transport='http', host='0.0.0.0', port=port)
     else:
-        print("📝 Starting Obsidian MCP Server on stdio...")
-        print("🔗 Use --http flag for HTTP mode")
+        # stdout carries the protocol in stdio mode, so status goes to stderr
+        print("📝 Starting Obsidian MCP Server on stdio...", file=sys.stderr)
+        print(f"⏱️ Loaded in {startup.phases['import']:.2f}s", file=sys.stderr)
+        print("🔗 Use --http flag for HTTP mode", file=sys.stderr)
         mcp.run(transport='stdio')
\ No newline at end of file
@@ -1,78 +1,173 @@
 import sys
-import json
+import time
 import asyncio
-from typing import Any, Callable, Dict, List
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import metrics
+from jsonenc import dumps, dumps_str, loads
+from mcp.server.schema import ArgumentError, compile_signature
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+REQUEST_TIMEOUT = -32000
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def rpc_error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def _dump_response(res: Any) -> bytes:
+    """Encode a response or batch; one that can't be encoded becomes an
+    INTERNAL_ERROR for its id, and the rest of a batch is kept"""
+    try:
+        return dumps(res)
+    except Exception as exc:
+        if isinstance(res, list):
+            return b"[" + b",".join(_dump_response(item) for item in res) + b"]"
+        request_id = res.get("id") if isinstance(res, dict) else None
+        logger.exception("Could not encode the response to request %r", request_id)
+        return dumps(rpc_error(request_id, INTERNAL_ERROR, f"Could not encode the response: {exc}"))
+
+
+class Tool:
+    """A registered handler, compiled once: input schema, validator, call style"""
+
+    __slots__ = ("name", "fn", "is_async", "description", "input_schema", "validate")
+
+    def __init__(self, name: str, fn: Callable):
+        self.name = name
+        self.fn = fn
+        self.is_async = asyncio.iscoroutinefunction(fn)
+        self.description = fn.__doc__ or f"Tool: {name}"
+        self.input_schema, self.validate = compile_signature(fn)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "description": self.description, "inputSchema": self.input_schema}
 
 
 class FastMCP:
     """A minimal reference MCP helper providing simple decorators and transports.
 
     - Use `@mcp.prompt()`, `@mcp.resource(name)`, `@mcp.tool()` to register handlers.
-    - Call `mcp.run(transport='stdio')` to run a minimal stdio loop for local testing,
+    - Use `@mcp.on_startup()` for coroutines that prepare state (indexes, caches),
+      and `@mcp.on_shutdown()` for ones that persist it.
+    - Call `mcp.run(transport='stdio')` to serve newline-delimited JSON over stdin/stdout,
       or `mcp.run(transport='http')` to serve an HTTP endpoint at /mcp/message.
+
+    /mcp/message accepts JSON-RPC 2.0 requests, batches (arrays) of them, and the
+    legacy `{type, payload}` messages. Requests in a batch run concurrently, at
+    most `batch_concurrency` at a time, each bounded by `call_timeout` seconds;
+    responses come back in request order. `dependencies` (e.g. an auth check)
+    apply to every MCP route; pass a function returning them to create them
+    only when the HTTP app is built.
+
+    FastAPI is only imported when `mcp.app` is first read, so a stdio server
+    starts without it. Add HTTP middleware and routes in a function registered
+    with `@mcp.on_http_app()`, which receives the app once it exists.
+
+    The stdio transport runs on one event loop for its whole life. Up to
+    `stdio_max_in_flight` requests are handled concurrently and each response
+    line is written as soon as it is ready, tagged with its request's `id`;
+    once that many are outstanding, stdin is not read until one finishes.
+
+    Tools with a streaming variant (`@mcp.stream(name)`, an async generator)
+    can be called on /tools/stream: items are sent as NDJSON lines, or as
+    server-sent events when the client accepts `text/event-stream`, while the
+    generator produces them. The stream ends with a `{"done": true, "count": n}`
+    record, or an `{"error": ...}` record if the generator fails midway.
+
+    Each tool's `inputSchema` is generated from its type hints when it is
+    registered, and arguments are validated against it before the call
+    (JSON-RPC answers -32602 on a mismatch). The `tools/list` response is
+    built once and served with an ETag.
+
+    Requests are parsed and responses encoded with jsonenc (orjson when it is
+    installed): a tool result is encoded once, then embedded in the envelope,
+    and routes return raw responses so FastAPI doesn't walk them again.
+
+    Unless MCP_METRICS=0, every tool call records its latency, outcome,
+    database time and result-encoding time (see metrics.py), and GET /metrics
+    serves them in the Prometheus text format.
     """
 
-    def __init__(self, name: str):
+    def __init__(
+        self,
+        name: str,
+        dependencies: Union[Sequence[Any], Callable[[], Sequence[Any]], None] = None,
+        batch_concurrency: int = 8,
+        max_batch: int = 100,
+        call_timeout: float = 30.0,
+        stdio_max_in_flight: int = 64,
+    ):
         self.name = name
         self.prompts: Dict[str, Callable] = {}
         self.resources: Dict[str, Callable] = {}
         self.tools: Dict[str, Callable] = {}
-        self.app = FastAPI()
-
-        @self.app.post("/mcp/message")
-        async def handle_message(message: Dict[str, Any]):
-            return await self._dispatch(message)
-        
-        # Add MCP protocol endpoints
-        @self.app.post("/initialize")
-        async def initialize(request: Dict[str, Any]):
-            return {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {
-                    "tools": {},
-                    "prompts": {},
-                    "resources": {}
-                },
-                "serverInfo": {
-                    "name": self.name,
-                    "version": "1.0.0"
-                }
-            }
-        
-        @self.app.post("/tools/list")
-        async def list_tools():
-            tools = []
-            for name, fn in self.tools.items():
-                tools.append({
-                    "name": name,
-                    "description": fn.__doc__ or f"Tool: {name}",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                })
-            return {"tools": tools}
-        
-        @self.app.post("/tools/call")
-        async def call_tool(request: Dict[str, Any]):
-            name = request.get("name")
-            arguments = request.get("arguments", {})
-            
-            if name not in self.tools:
-                return {"error": f"Tool '{name}' not found"}
-            
-            try:
-                fn = self.tools[name]
-                if asyncio.iscoroutinefunction(fn):
-                    result = await fn(**arguments)
-                else:
-                    result = fn(**arguments)
-                return {"content": [{"type": "text", "text": json.dumps(result)}]}
-            except Exception as e:
-                return {"error": str(e)}
+        self.streams: Dict[str, Callable] = {}
+        # Dispatch tables, filled at registration
+        self._tools: Dict[str, Tool] = {}
+        self._streams: Dict[str, Tool] = {}
+        self._tools_list: Optional[Dict[str, Any]] = None
+        self._tools_list_body: Optional[Tuple[bytes, str]] = None
+        self.startup_handlers: List[Callable] = []
+        self.shutdown_handlers: List[Callable] = []
+        self.batch_concurrency = batch_concurrency
+        self.max_batch = max_batch
+        self.call_timeout = call_timeout
+        self.stdio_max_in_flight = stdio_max_in_flight
+        self._background: set = set()
+        self._rpc_methods: Dict[str, Callable] = {
+            "initialize": self._rpc_initialize,
+            "ping": self._rpc_ping,
+            "notifications/initialized": self._rpc_ping,
+            "tools/list": self._rpc_list_tools,
+            "tools/call": self._rpc_call_tool,
+            "prompts/list": self._rpc_list_prompts,
+            "prompts/get": self._rpc_get_prompt,
+            "resources/list": self._rpc_list_resources,
+            "resources/read": self._rpc_read_resource,
+        }
+        self._dependencies = dependencies
+        self._http_setup: List[Callable] = []
+        self._app = None
+
+    @property
+    def app(self):
+        """The FastAPI app of the HTTP transport, built (and FastAPI imported) on first access"""
+        if self._app is None:
+            from mcp.server.http_app import create_app
+
+            dependencies = self._dependencies() if callable(self._dependencies) else self._dependencies
+            self._app = create_app(self, dependencies)
+            for fn in self._http_setup:
+                fn(self._app)
+        return self._app
+
+    def on_http_app(self):
+        """Register ``fn(app)`` to add middleware and routes to the FastAPI app
+        when it is built; it runs right away if the app already exists"""
+        def decorator(fn: Callable):
+            self._http_setup.append(fn)
+            if self._app is not None:
+                fn(self._app)
+            return fn
+
+        return decorator
 
     def prompt(self, name: str = None):
         def decorator(fn: Callable):
@@ -93,10 +188,228 @@ class FastMCP:
         def decorator(fn: Callable):
             key = name or fn.__name__
             self.tools[key] = fn
+            self._tools[key] = Tool(key, fn)
+            self._tools_list = self._tools_list_body = None
+            return fn
+
+        return decorator
+
+    def stream(self, name: str = None):
+        """Register an async generator as the streaming variant of tool `name`"""
+        def decorator(fn: Callable):
+            key = name or fn.__name__
+            self.streams[key] = fn
+            self._streams[key] = Tool(key, fn)
+            return fn
+
+        return decorator
+
+    def on_startup(self):
+        """Register a coroutine to run when the server starts.
+
+        Over HTTP it runs as a background task; over stdio it completes before
+        the first message is read.
+        """
+        def decorator(fn: Callable):
+            self.startup_handlers.append(fn)
+            return fn
+
+        return decorator
+
+    def on_shutdown(self):
+        """Register a coroutine to run when the server stops (after stdin closes over stdio)"""
+        def decorator(fn: Callable):
+            self.shutdown_handlers.append(fn)
             return fn
 
         return decorator
 
+    async def _run_shutdown_handlers(self):
+        for fn in self.shutdown_handlers:
+            try:
+                await fn()
+            except Exception:
+                logger.exception("Shutdown handler %s failed", getattr(fn, "__name__", fn))
+
+    def server_info(self) -> Dict[str, Any]:
+        return {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {
+                "tools": {},
+                "prompts": {},
+                "resources": {}
+            },
+            "serverInfo": {
+                "name": self.name,
+                "version": "1.0.0"
+            }
+        }
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        return self._tools_list_result()["tools"]
+
+    def _tools_list_result(self) -> Dict[str, Any]:
+        # Shared between responses; built again only when a tool is registered
+        if self._tools_list is None:
+            self._tools_list = {"tools": [tool.describe() for tool in self._tools.values()]}
+        return self._tools_list
+
+    def _serialized_tools_list(self) -> Tuple[bytes, str]:
+        if self._tools_list_body is None:
+            body = dumps(self._tools_list_result())
+            self._tools_list_body = (body, '"%s"' % hashlib.sha256(body).hexdigest()[:32])
+        return self._tools_list_body
+
+    @staticmethod
+    async def _invoke(fn: Callable, args: Dict[str, Any]):
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(**args)
+        return fn(**args)
+
+    async def _call_tool(self, name: str, args: Dict[str, Any], via: str):
+        """Validate `args` and run tool `name`, recording latency, outcome and database time"""
+        tool = self._tools[name]
+        if not metrics.ENABLED:
+            tool.validate(args)
+            return await tool.fn(**args) if tool.is_async else tool.fn(**args)
+        status = "error"
+        metrics.TOOLS_IN_FLIGHT.inc(name)
+        start = time.perf_counter()
+        with metrics.db_timer() as db_time:
+            try:
+                tool.validate(args)
+                result = await tool.fn(**args) if tool.is_async else tool.fn(**args)
+                # Tools report handled failures as {"success": false, ...}
+                if not (isinstance(result, dict) and result.get("success") is False):
+                    status = "ok"
+                return result
+            finally:
+                metrics.TOOLS_IN_FLIGHT.dec(name)
+                metrics.TOOL_CALLS.inc(name, via, status)
+                metrics.TOOL_SECONDS.observe(time.perf_counter() - start, name, via)
+                metrics.TOOL_DB_SECONDS.observe(db_time[0], name)
+
+    @staticmethod
+    def _encode_result(name: str, result: Any) -> str:
+        start = time.perf_counter()
+        text = dumps_str(result)
+        if metrics.ENABLED:
+            metrics.TOOL_SERIALIZE_SECONDS.observe(time.perf_counter() - start, name)
+        return text
+
+    async def handle_message(self, message: Any) -> Any:
+        """Answer a JSON-RPC request, a JSON-RPC batch or a legacy message.
+
+        Returns None when there is nothing to send back (notifications only).
+        """
+        if isinstance(message, list):
+            return await self._handle_batch(message)
+        if isinstance(message, dict) and "jsonrpc" in message:
+            return await self._handle_rpc(message)
+        if isinstance(message, dict):
+            result = await self._dispatch(message)
+            if "id" in message:
+                result["id"] = message["id"]
+            return result
+        return rpc_error(None, INVALID_REQUEST, "Invalid Request")
+
+    async def _handle_batch(self, batch: List[Any]):
+        if not batch:
+            return rpc_error(None, INVALID_REQUEST, "Invalid Request: empty batch")
+        if len(batch) > self.max_batch:
+            return rpc_error(None, INVALID_REQUEST, f"Invalid Request: batch larger than {self.max_batch}")
+
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def run(request):
+            async with semaphore:
+                return await self._handle_rpc(request)
+
+        responses = await asyncio.gather(*(run(request) for request in batch))
+        responses = [r for r in responses if r is not None]
+        return responses or None
+
+    async def _handle_rpc(self, request: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" \
+                or not isinstance(request.get("method"), str):
+            request_id = request.get("id") if isinstance(request, dict) else None
+            return rpc_error(request_id, INVALID_REQUEST, "Invalid Request")
+
+        notification = "id" not in request
+        request_id = request.get("id")
+        handler = self._rpc_methods.get(request["method"])
+        params = request.get("params") or {}
+        try:
+            if handler is None:
+                raise RPCError(METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "params must be an object")
+            result = await asyncio.wait_for(handler(params), self.call_timeout)
+        except RPCError as exc:
+            return None if notification else rpc_error(request_id, exc.code, exc.message)
+        except asyncio.TimeoutError:
+            message = f"Request timed out after {self.call_timeout:g}s"
+            return None if notification else rpc_error(request_id, REQUEST_TIMEOUT, message)
+        except Exception as exc:
+            return None if notification else rpc_error(request_id, INTERNAL_ERROR, str(exc))
+        return None if notification else {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    async def _rpc_initialize(self, params):
+        return self.server_info()
+
+    async def _rpc_ping(self, params):
+        return {}
+
+    async def _rpc_list_tools(self, params):
+        return self._tools_list_result()
+
+    async def _rpc_call_tool(self, params):
+        name = params.get("name")
+        if name not in self.tools:
+            raise RPCError(INVALID_PARAMS, f"Unknown tool: {name}")
+        arguments = params.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise RPCError(INVALID_PARAMS, "arguments must be an object")
+        try:
+            result = await self._call_tool(name, arguments, "rpc")
+        except ArgumentError as exc:
+            raise RPCError(INVALID_PARAMS, str(exc))
+        except Exception as exc:
+            return {"content": [{"type": "text", "text": str(exc)}], "isError": True}
+        return {"content": [{"type": "text", "text": self._encode_result(name, result)}], "isError": False}
+
+    async def _rpc_list_prompts(self, params):
+        return {"prompts": [
+            {"name": name, "description": fn.__doc__ or f"Prompt: {name}"}
+            for name, fn in self.prompts.items()
+        ]}
+
+    async def _rpc_get_prompt(self, params):
+        name = params.get("name")
+        fn = self.prompts.get(name)
+        if fn is None:
+            raise RPCError(INVALID_PARAMS, f"Unknown prompt: {name}")
+        text = await self._invoke(fn, params.get("arguments") or {})
+        return {
+            "description": fn.__doc__ or "",
+            "messages": [{"role": "user", "content": {"type": "text", "text": str(text)}}]
+        }
+
+    async def _rpc_list_resources(self, params):
+        return {"resources": [
+            {"uri": name, "name": name, "description": fn.__doc__ or ""}
+            for name, fn in self.resources.items()
+        ]}
+
+    async def _rpc_read_resource(self, params):
+        uri = params.get("uri")
+        fn = self.resources.get(uri)
+        if fn is None:
+            raise RPCError(INVALID_PARAMS, f"Unknown resource: {uri}")
+        value = await self._invoke(fn, {})
+        text = value if isinstance(value, str) else dumps_str(value)
+        return {"contents": [{"uri": uri, "text": text}]}
+
     async def _dispatch(self, message: Dict[str, Any]):
         t = message.get("type")
         payload = message.get("payload", {}) or {}
@@ -116,10 +429,10 @@ class FastMCP:
             return {"error": f"no handler registered for {t}:{name}"}
 
         try:
-            if asyncio.iscoroutinefunction(fn):
-                result = await fn(**args)
+            if t == "tool":
+                result = await self._call_tool(name, args, "legacy")
             else:
-                result = fn(**args)
+                result = await self._invoke(fn, args)
             return {"result": result}
         except Exception as exc:
             return {"error": str(exc)}
@@ -130,16 +443,74 @@ class FastMCP:
 
             uvicorn.run(self.app, host=host, port=port)
         elif transport == "stdio":
-            # Simple stdio loop: read JSON per-line, write JSON per-line
-            for line in sys.stdin:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    message = json.loads(line)
-                    res = asyncio.run(self._dispatch(message))
-                    print(json.dumps(res), flush=True)
-                except Exception as exc:
-                    print(json.dumps({"error": str(exc)}), flush=True)
+            asyncio.run(self._serve_stdio())
         else:
             raise ValueError("unknown transport")
+
+    async def _serve_stdio(self):
+        for fn in self.startup_handlers:
+            await fn()
+        if metrics.ENABLED:
+            monitor = asyncio.create_task(metrics.monitor_event_loop())
+
+        readline = await _stdin_reader()
+        slots = asyncio.Semaphore(self.stdio_max_in_flight)
+        pending: set = set()
+        while True:
+            line = await readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            # Backpressure: stop reading stdin while every slot is busy
+            await slots.acquire()
+            task = asyncio.create_task(self._stdio_handle(line, slots))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+        if metrics.ENABLED:
+            monitor.cancel()
+        await self._run_shutdown_handlers()
+
+    async def _stdio_handle(self, line: bytes, slots: asyncio.Semaphore):
+        message = None
+        try:
+            try:
+                message = loads(line)
+            except ValueError:
+                res = rpc_error(None, PARSE_ERROR, "Parse error")
+            else:
+                res = await self.handle_message(message)
+        except Exception as exc:
+            res = rpc_error(message.get("id") if isinstance(message, dict) else None, INTERNAL_ERROR, str(exc))
+        finally:
+            slots.release()
+        if res is not None:
+            start = time.perf_counter()
+            data = _dump_response(res)
+            if metrics.ENABLED:
+                metrics.ENCODE_SECONDS.observe(time.perf_counter() - start, "stdio")
+            sys.stdout.buffer.write(data + b"\n")
+            sys.stdout.buffer.flush()
+
+
+# Tool arguments can carry whole notes, so allow long lines on stdin
+STDIO_LINE_LIMIT = 64 * 1024 * 1024
+
+
+async def _stdin_reader():
+    """Return an async readline() for stdin.
+
+    Pipes and terminals are read without blocking the loop. Regular files
+    (``< input.jsonl``) can't be registered with the loop, so they are read
+    on a worker thread instead.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=STDIO_LINE_LIMIT)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (ValueError, OSError):
+        return lambda: loop.run_in_executor(None, sys.stdin.buffer.readline)
+    return reader.readline
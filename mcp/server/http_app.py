@@ -0,0 +1,163 @@
+"""
+The HTTP transport of FastMCP: a FastAPI app serving the MCP routes.
+
+Imported only when ``FastMCP.app`` is first read (``run(transport="http")``
+or code that adds routes), so the stdio transport never loads FastAPI.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+import metrics
+from jsonenc import JSONBytesResponse, dumps, loads
+from mcp.server.fastmcp import PARSE_ERROR, rpc_error
+from mcp.server.schema import ArgumentError
+
+
+def create_app(server, dependencies: Optional[Sequence[Any]] = None) -> FastAPI:
+    """The FastAPI app for ``server`` (a FastMCP); ``dependencies`` guard every MCP route"""
+    app = FastAPI()
+    route_deps = list(dependencies or [])
+
+    @app.on_event("startup")
+    async def run_startup_handlers():
+        # Run in the background so the server accepts requests right away
+        handlers = [fn() for fn in server.startup_handlers]
+        if metrics.ENABLED:
+            handlers.append(metrics.monitor_event_loop())
+        for coro in handlers:
+            task = asyncio.create_task(coro)
+            server._background.add(task)
+            task.add_done_callback(server._background.discard)
+
+    @app.on_event("shutdown")
+    async def run_shutdown_handlers():
+        await server._run_shutdown_handlers()
+
+    @app.post("/mcp/message", dependencies=route_deps)
+    async def handle_message(request: Request):
+        try:
+            message = loads(await request.body())
+        except ValueError:
+            return JSONBytesResponse(rpc_error(None, PARSE_ERROR, "Parse error"))
+        result = await server.handle_message(message)
+        if result is None:
+            # Only notifications: nothing to answer
+            return Response(status_code=202)
+        return _json_response(result)
+
+    # Add MCP protocol endpoints
+    @app.post("/initialize", dependencies=route_deps)
+    async def initialize(request: Dict[str, Any]):
+        return server.server_info()
+
+    @app.api_route("/tools/list", methods=["GET", "POST"], dependencies=route_deps)
+    async def list_tools(request: Request):
+        body, etag = server._serialized_tools_list()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return JSONBytesResponse(body, headers=headers)
+
+    @app.post("/tools/call", dependencies=route_deps)
+    async def call_tool(request: Request):
+        body = await _read_object(request)
+        if body is None:
+            return JSONBytesResponse({"error": "Request body must be a JSON object"}, status_code=400)
+        name = body.get("name")
+        arguments = body.get("arguments", {})
+
+        if name not in server.tools:
+            return JSONBytesResponse({"error": f"Tool '{name}' not found"})
+
+        try:
+            result = await server._call_tool(name, arguments, "http")
+            return _json_response({"content": [{"type": "text", "text": server._encode_result(name, result)}]})
+        except Exception as e:
+            return JSONBytesResponse({"error": str(e)})
+
+    @app.post("/tools/stream", dependencies=route_deps)
+    async def stream_tool(request: Request):
+        body = await _read_object(request)
+        if body is None:
+            return JSONBytesResponse({"error": "Request body must be a JSON object"}, status_code=400)
+        name = body.get("name")
+        spec = server._streams.get(name)
+        if spec is None:
+            return JSONBytesResponse({"error": f"Tool '{name}' does not support streaming"}, status_code=404)
+        arguments = body.get("arguments") or {}
+        try:
+            if not isinstance(arguments, dict):
+                raise ArgumentError("arguments must be an object")
+            spec.validate(arguments)
+            items = spec.fn(**arguments)
+        except (ArgumentError, TypeError) as e:
+            return JSONBytesResponse({"error": str(e)}, status_code=400)
+        sse = "text/event-stream" in request.headers.get("accept", "")
+        if metrics.ENABLED:
+            items = _metered_stream(name, items)
+        return StreamingResponse(
+            _encode_stream(items, sse),
+            media_type="text/event-stream" if sse else "application/x-ndjson",
+            # Ask proxies not to buffer, or the first items arrive late
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    if metrics.ENABLED:
+        @app.get("/metrics")
+        async def metrics_endpoint():
+            return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+    return app
+
+
+async def _read_object(request: Request) -> Optional[Dict[str, Any]]:
+    """The request body as a JSON object, or None if it isn't one"""
+    try:
+        body = loads(await request.body())
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _json_response(content: Any) -> JSONBytesResponse:
+    start = time.perf_counter()
+    response = JSONBytesResponse(content)
+    if metrics.ENABLED:
+        metrics.ENCODE_SECONDS.observe(time.perf_counter() - start, "http")
+    return response
+
+
+async def _metered_stream(name: str, items):
+    """Record a streamed tool call like a regular one, from first to last item"""
+    status = "error"
+    metrics.TOOLS_IN_FLIGHT.inc(name)
+    start = time.perf_counter()
+    try:
+        async for item in items:
+            yield item
+        status = "ok"
+    finally:
+        metrics.TOOLS_IN_FLIGHT.dec(name)
+        metrics.TOOL_CALLS.inc(name, "stream", status)
+        metrics.TOOL_SECONDS.observe(time.perf_counter() - start, name, "stream")
+
+
+async def _encode_stream(items, sse: bool):
+    def frame(event: str, payload: Any) -> bytes:
+        data = dumps(payload)
+        return b"event: %s\ndata: %s\n\n" % (event.encode(), data) if sse else data + b"\n"
+
+    count = 0
+    try:
+        async for item in items:
+            count += 1
+            yield frame("item", item)
+    except Exception as exc:
+        yield frame("error", {"error": str(exc)})
+        return
+    yield frame("done", {"done": True, "count": count})
@@ -0,0 +1,157 @@
+"""
+JSON Schema and argument validators generated from a handler's signature.
+
+``compile_signature(fn)`` walks the type hints once, at registration, and
+returns the ``inputSchema`` advertised in ``tools/list`` together with a
+validator closure that checks an ``arguments`` object against it. Supported
+hints: str, int, float, bool, None, Any, List[...], Dict[str, ...],
+Optional[...], Union[...] and Literal[...]; anything else is accepted as-is.
+"""
+
+import inspect
+import json
+import types
+import typing
+from typing import Any, Callable, Dict, List, Tuple
+
+Check = Callable[[Any], bool]
+
+
+class ArgumentError(ValueError):
+    """Arguments that don't match the handler's signature"""
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_SCALARS: Dict[Any, Tuple[Dict[str, Any], Check]] = {
+    str: ({"type": "string"}, lambda v: isinstance(v, str)),
+    int: ({"type": "integer"}, _is_int),
+    float: ({"type": "number"}, _is_number),
+    bool: ({"type": "boolean"}, lambda v: isinstance(v, bool)),
+    type(None): ({"type": "null"}, lambda v: v is None),
+}
+
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean",
+               type(None): "null", list: "array", dict: "object"}
+
+
+def _anything(value: Any) -> bool:
+    return True
+
+
+def compile_type(hint: Any) -> Tuple[Dict[str, Any], Check]:
+    """(JSON Schema, checker) for one type hint"""
+    if hint in _SCALARS:
+        schema, check = _SCALARS[hint]
+        return dict(schema), check
+    origin, args = typing.get_origin(hint), typing.get_args(hint)
+    if origin in (typing.Union, types.UnionType):
+        compiled = [compile_type(arg) for arg in args]
+        checks = [check for _, check in compiled]
+        schemas = [schema for schema, _ in compiled]
+        if all(set(s) == {"type"} for s in schemas):
+            # Optional[int] -> {"type": ["integer", "null"]}
+            schema = {"type": [s["type"] for s in schemas]}
+        else:
+            schema = {"anyOf": schemas}
+        return schema, lambda v: any(check(v) for check in checks)
+    if origin is list:
+        item_schema, item_check = compile_type(args[0]) if args else ({}, _anything)
+        schema = {"type": "array"}
+        if item_schema:
+            schema["items"] = item_schema
+        if item_check is _anything:
+            return schema, lambda v: isinstance(v, list)
+        return schema, lambda v: isinstance(v, list) and all(item_check(i) for i in v)
+    if origin is dict:
+        value_schema, value_check = compile_type(args[1]) if len(args) == 2 else ({}, _anything)
+        schema = {"type": "object"}
+        if value_schema:
+            schema["additionalProperties"] = value_schema
+        if value_check is _anything:
+            return schema, lambda v: isinstance(v, dict)
+        return schema, lambda v: isinstance(v, dict) and all(value_check(i) for i in v.values())
+    if origin is typing.Literal:
+        allowed = list(args)
+        return {"enum": allowed}, lambda v: v in allowed
+    if hint is list:
+        return {"type": "array"}, lambda v: isinstance(v, list)
+    if hint is dict:
+        return {"type": "object"}, lambda v: isinstance(v, dict)
+    return {}, _anything
+
+
+def _describe(schema: Dict[str, Any]) -> str:
+    if "enum" in schema:
+        return "one of " + ", ".join(json.dumps(v) for v in schema["enum"])
+    if "anyOf" in schema:
+        return " or ".join(_describe(s) for s in schema["anyOf"])
+    kind = schema.get("type", "any value")
+    if isinstance(kind, list):
+        return " or ".join(kind)
+    if kind == "array" and "items" in schema:
+        return f"array of {_describe(schema['items'])}"
+    return kind
+
+
+def compile_signature(fn: Callable) -> Tuple[Dict[str, Any], Callable[[Dict[str, Any]], None]]:
+    """(inputSchema, validate) for ``fn``; ``validate`` raises ArgumentError"""
+    signature = inspect.signature(fn)
+    try:
+        hints = typing.get_type_hints(fn)
+    except Exception:
+        hints = {}
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    checks: Dict[str, Tuple[Check, str]] = {}
+    open_ended = False
+    for name, param in signature.parameters.items():
+        if param.kind is param.VAR_KEYWORD:
+            open_ended = True
+            continue
+        if param.kind is param.VAR_POSITIONAL:
+            continue
+        hint = hints.get(name, Any)
+        if param.default is None and hint is not Any:
+            hint = typing.Optional[hint]  # ``title: str = None``
+        schema, check = compile_type(hint)
+        if param.default is param.empty:
+            required.append(name)
+        else:
+            try:
+                json.dumps(param.default)
+                schema["default"] = param.default
+            except (TypeError, ValueError):
+                pass
+        properties[name] = schema
+        if check is not _anything:
+            checks[name] = (check, _describe(schema))
+
+    input_schema = {"type": "object", "properties": properties, "required": required}
+    if not open_ended:
+        input_schema["additionalProperties"] = False
+    known = frozenset(properties)
+    required_names = tuple(required)
+
+    def validate(arguments: Dict[str, Any]):
+        if not open_ended:
+            unknown = arguments.keys() - known
+            if unknown:
+                raise ArgumentError(f"Unexpected argument(s): {', '.join(sorted(unknown))}")
+        for name in required_names:
+            if name not in arguments:
+                raise ArgumentError(f"Missing required argument: {name}")
+        for name, value in arguments.items():
+            entry = checks.get(name)
+            if entry is not None and not entry[0](value):
+                got = _JSON_TYPES.get(type(value), type(value).__name__)
+                raise ArgumentError(f"Invalid argument {name}: expected {entry[1]}, got {got}")
+
+    return input_schema, validate
@@ -0,0 +1,194 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Counters, gauges and histograms are plain dicts keyed by label values, so
+recording one sample is a dict lookup and an add; everything is recorded on
+the event loop thread. ``registry.render()`` produces the ``/metrics`` body.
+
+Time spent in the database is attributed to the tool call that caused it: a
+call opens a ``db_timer()`` scope and every query made inside it (including in
+tasks it spawns) adds its duration via ``record_db()``.
+
+Set ``MCP_METRICS=0`` to turn recording and the endpoint off.
+"""
+
+import asyncio
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+ENABLED = os.getenv("MCP_METRICS", "1").lower() not in ("0", "false", "no", "off")
+
+# Seconds; from sub-millisecond cache hits to calls that hit the timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str):
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.label_names, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+TOOL_CALLS = registry.counter(
+    "mcp_tool_calls_total", "Tool calls by outcome (error: raised or returned success=false)",
+    ("tool", "via", "status"))
+TOOL_SECONDS = registry.histogram("mcp_tool_seconds", "Tool call latency, without encoding the result", ("tool", "via"))
+TOOL_DB_SECONDS = registry.histogram("mcp_tool_db_seconds", "Database time within one tool call", ("tool",))
+TOOL_SERIALIZE_SECONDS = registry.histogram(
+    "mcp_tool_serialize_seconds", "JSON encoding of one tool result", ("tool",))
+TOOLS_IN_FLIGHT = registry.gauge("mcp_tools_in_flight", "Tool calls currently running", ("tool",))
+ENCODE_SECONDS = registry.histogram(
+    "mcp_response_encode_seconds", "JSON encoding of a whole response envelope", ("transport",))
+DB_SECONDS = registry.histogram("mcp_db_query_seconds", "Storage backend query latency", ("backend", "operation"))
+DB_ERRORS = registry.counter("mcp_db_errors_total", "Storage backend queries that failed", ("backend", "operation"))
+HTTP_REQUESTS = registry.counter("mcp_http_requests_total", "HTTP requests", ("method", "route", "status"))
+HTTP_SECONDS = registry.histogram("mcp_http_request_seconds", "HTTP request latency", ("method", "route"))
+HTTP_IN_FLIGHT = registry.gauge("mcp_http_requests_in_flight", "HTTP requests currently being handled")
+LOOP_LAG = registry.histogram(
+    "mcp_event_loop_lag_seconds", "How late a periodic timer fired; high values mean a blocked loop")
+
+_db_time: ContextVar[Optional[List[float]]] = ContextVar("db_time", default=None)
+
+
+@contextmanager
+def db_timer() -> Iterator[List[float]]:
+    """Attribute database time to this scope (and tasks started in it).
+
+    Yields the one-element accumulator that ``record_db`` adds to.
+    """
+    acc = [0.0]
+    token = _db_time.set(acc)
+    try:
+        yield acc
+    finally:
+        _db_time.reset(token)
+
+
+def record_db(backend: str, operation: str, seconds: float, failed: bool = False):
+    if not ENABLED:
+        return
+    DB_SECONDS.observe(seconds, backend, operation)
+    if failed:
+        DB_ERRORS.inc(backend, operation)
+    acc = _db_time.get()
+    if acc is not None:
+        acc[0] += seconds
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Sample event-loop lag forever: the delay of a timer past its deadline"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
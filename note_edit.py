@@ -0,0 +1,187 @@
+"""
+Line- and heading-anchored edits of a note's markdown content.
+
+``apply_edits(content, edits)`` applies a list of edit operations in order
+and returns the new content plus, for each edit, the region it changed, so a
+caller can confirm an edit without reading the whole note back. Lines are
+numbered from 1 and ranges are inclusive; every edit sees the content as
+left by the edits before it.
+
+    {"op": "replace_lines", "start": 3, "end": 5, "text": "..."}
+    {"op": "insert_lines", "after": 0, "text": "..."}       # 0 = top of note
+    {"op": "delete_lines", "start": 3, "end": 5}
+    {"op": "replace_section", "heading": "## Tasks", "text": "..."}
+    {"op": "append_to_section", "heading": "Tasks", "text": "..."}
+    {"op": "prepend_to_section", "heading": "Tasks", "text": "..."}
+
+A section is the lines under a heading up to the next heading of the same or
+a higher level; ``replace_section`` keeps the heading line itself. A heading
+anchor given with its ``#`` marks only matches that level, one without them
+matches any level; the first match wins. Headings inside fenced code blocks
+are ignored.
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+EDIT_OPS = ("replace_lines", "insert_lines", "delete_lines",
+            "replace_section", "append_to_section", "prepend_to_section")
+
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.*?)(?:[ \t]+#+)?[ \t]*$")
+FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+
+
+class EditError(ValueError):
+    """An edit that doesn't apply to the note's current content"""
+
+
+def split_lines(content: str) -> Tuple[List[str], bool]:
+    """(lines, ends with newline); "" is zero lines"""
+    if not content:
+        return [], False
+    if content.endswith("\n"):
+        return content[:-1].split("\n"), True
+    return content.split("\n"), False
+
+
+def join_lines(lines: List[str], trailing_newline: bool) -> str:
+    return "\n".join(lines) + ("\n" if trailing_newline and lines else "")
+
+
+def headings(lines: List[str]) -> List[Tuple[int, int, str]]:
+    """(line index, level, text) of each markdown heading outside code fences"""
+    found = []
+    fence = None
+    for i, line in enumerate(lines):
+        opening = FENCE_RE.match(line)
+        if opening:
+            if fence is None:
+                fence = opening.group(1)
+            elif opening.group(1) == fence:
+                fence = None
+            continue
+        if fence is None and line.startswith("#"):
+            match = HEADING_RE.match(line)
+            if match:
+                found.append((i, len(match.group(1)), match.group(2)))
+    return found
+
+
+def find_section(lines: List[str], heading: str) -> Tuple[int, int]:
+    """(heading line index, index just past the section's last line)"""
+    anchor = HEADING_RE.match(heading.strip())
+    level, text = (len(anchor.group(1)), anchor.group(2)) if anchor else (None, heading.strip())
+    found = headings(lines)
+    for n, (index, found_level, found_text) in enumerate(found):
+        if found_text == text and (level is None or found_level == level):
+            end = next((i for i, lvl, _ in found[n + 1:] if lvl <= found_level), len(lines))
+            return index, end
+    raise EditError(f"Heading not found: {heading!r}")
+
+
+def frontmatter_end(lines: List[str]) -> int:
+    """Index of the first line after a leading ``---`` YAML block (0 if none)"""
+    if not lines or lines[0].rstrip() != "---":
+        return 0
+    for i in range(1, len(lines)):
+        if lines[i].rstrip() in ("---", "..."):
+            return i + 1
+    return 0
+
+
+def _text_lines(text: Any) -> List[str]:
+    if not isinstance(text, str):
+        raise EditError("text must be a string")
+    return split_lines(text)[0]
+
+
+def _line_number(edit: Dict[str, Any], key: str, low: int, high: int) -> int:
+    value = edit.get(key)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise EditError(f"{edit['op']}: {key} must be an integer")
+    if not low <= value <= high:
+        raise EditError(f"{edit['op']}: {key}={value} is outside {low}..{high}")
+    return value
+
+
+def _span(edit: Dict[str, Any], count: int) -> Tuple[int, int]:
+    start = _line_number(edit, "start", 1, count)
+    end = _line_number(edit, "end", start, count) if "end" in edit else start
+    return start - 1, end
+
+
+def _apply(lines: List[str], edit: Dict[str, Any]) -> Tuple[int, int, int]:
+    """Apply one edit in place; returns (first changed index, lines added, lines removed)"""
+    op = edit.get("op")
+    if op == "replace_lines":
+        start, end = _span(edit, len(lines))
+        new = _text_lines(edit.get("text"))
+    elif op == "delete_lines":
+        start, end = _span(edit, len(lines))
+        new = []
+    elif op == "insert_lines":
+        start = end = _line_number(edit, "after", 0, len(lines))
+        new = _text_lines(edit.get("text"))
+    elif op in ("replace_section", "append_to_section", "prepend_to_section"):
+        if not isinstance(edit.get("heading"), str):
+            raise EditError(f"{op}: heading must be a string")
+        index, section_end = find_section(lines, edit["heading"])
+        new = _text_lines(edit.get("text"))
+        if op == "replace_section":
+            start, end = index + 1, section_end
+        elif op == "prepend_to_section":
+            start = end = index + 1
+        else:
+            # After the section's last non-blank line, before the gap to the next heading
+            start = section_end
+            while start > index + 1 and not lines[start - 1].strip():
+                start -= 1
+            end = start
+    else:
+        raise EditError(f"op must be one of {', '.join(EDIT_OPS)}")
+    lines[start:end] = new
+    return start, len(new), end - start
+
+
+def apply_edits(content: str, edits: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Apply ``edits`` in order; returns (new content, changed region per edit).
+
+    A region is ``{"op", "start_line", "end_line", "removed_lines", "text"}``
+    where start_line..end_line are the edit's lines in the content as it stood
+    right after that edit (end_line < start_line when lines were only removed).
+    Raises EditError, leaving nothing applied, if any edit is invalid.
+    """
+    if not isinstance(edits, list) or not edits:
+        raise EditError("edits must be a non-empty list")
+    lines, trailing = split_lines(content or "")
+    changes = []
+    for edit in edits:
+        if not isinstance(edit, dict):
+            raise EditError("Each edit must be an object")
+        start, added, removed = _apply(lines, edit)
+        changes.append({"op": edit["op"], "start_line": start + 1, "end_line": start + added,
+                        "removed_lines": removed, "text": "\n".join(lines[start:start + added])})
+    return join_lines(lines, trailing or not content), changes
+
+
+def append_text(content: str, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """``text`` added as new lines at the end of ``content``; same return as apply_edits"""
+    lines, _ = split_lines(content or "")
+    start = len(lines)
+    new = _text_lines(text)
+    lines.extend(new)
+    return join_lines(lines, True), [_region("append", start, new)]
+
+
+def prepend_text(content: str, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """``text`` added as new lines at the top of ``content``, below any frontmatter"""
+    lines, trailing = split_lines(content or "")
+    start = frontmatter_end(lines)
+    new = _text_lines(text)
+    lines[start:start] = new
+    return join_lines(lines, trailing or not content), [_region("prepend", start, new)]
+
+
+def _region(op: str, start: int, new: List[str]) -> Dict[str, Any]:
+    return {"op": op, "start_line": start + 1, "end_line": start + len(new),
+            "removed_lines": 0, "text": "\n".join(new)}
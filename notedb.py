@@ -1,10 +1,12 @@
+import hashlib
 import os
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Response, status
 from fastapi.security import APIKeyHeader
-from typing import List
-from crud import get_notes, get_note, update_note
-from schemas import Note, NoteCreate
+from typing import List, Optional, Union
+from crud import get_notes, get_note, update_note, changes_since
+from schemas import Note, NoteCreate, NoteSummary
 from dotenv import load_dotenv
+from jsonenc import JSONBytesResponse
 
 load_dotenv()
 
@@ -20,21 +22,68 @@ async def get_api_key(api_key: str = Depends(api_key_header)):
         )
     return api_key
 
-@app.get("/notes", response_model=List[Note], dependencies=[Depends(get_api_key)])
-async def read_notes():
-    response = await get_notes()
-    return response.data
+def make_etag(*parts) -> str:
+    """Weak ETag over the values that determine a response (the JSON bytes may
+    differ between encoders, so it isn't a strong one)"""
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag.removeprefix("W/") for t in tags)
+
+def _rows_etag(rows, *extra) -> str:
+    # change_seq moves with every write, including ones from other clients;
+    # updated_at covers a write-behind row served before its flush numbers it
+    return make_etag(*extra, *(f"{row['id']}@{row.get('change_seq')}@{row.get('updated_at')}" for row in rows))
+
+def _respond(data, etag: str, if_none_match: Optional[str], headers: Optional[dict] = None):
+    headers = {**(headers or {}), "ETag": etag}
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONBytesResponse(data, headers=headers)
+
+@app.get("/notes", response_model=List[Union[Note, NoteSummary]], dependencies=[Depends(get_api_key)])
+async def read_notes(limit: Optional[int] = None, cursor: Optional[str] = None,
+                     metadata_only: bool = False, order_by: str = "id",
+                     if_none_match: Optional[str] = Header(None)):
+    """One page of notes; the next page's cursor is in the X-Next-Cursor header"""
+    try:
+        page = await get_notes(limit, cursor, metadata_only, order_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": page.next_cursor} if page.next_cursor else None
+    # Rows come straight from the backend; encode them once, skipping response_model
+    # The same rows differ in shape with metadata_only, and in order with order_by
+    etag = _rows_etag(page.data, page.next_cursor, f"metadata_only={metadata_only}", f"order_by={order_by}")
+    return _respond(page.data, etag, if_none_match, headers)
+
+@app.get("/notes/changes", dependencies=[Depends(get_api_key)])
+async def read_changes(cursor: Optional[str] = None, limit: Optional[int] = None, metadata_only: bool = False,
+                       if_none_match: Optional[str] = Header(None)):
+    """Notes changed and deleted after ``cursor``; see crud.changes_since"""
+    try:
+        response = await changes_since(cursor, limit, metadata_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    changes = response.data
+    # An idle vault gives the same cursor back, so a poll with its ETag gets a 304
+    etag = _rows_etag(changes["notes"], changes["next_cursor"], f"metadata_only={metadata_only}",
+                      *(f"-{t['id']}@{t['change_seq']}" for t in changes["deleted"]))
+    return _respond(changes, etag, if_none_match)
 
 @app.get("/notes/{note_id}", response_model=Note, dependencies=[Depends(get_api_key)])
-async def read_note(note_id: int):
+async def read_note(note_id: int, if_none_match: Optional[str] = Header(None)):
     response = await get_note(note_id)
     if not response.data:
         raise HTTPException(status_code=404, detail="Note not found")
-    return response.data
+    return _respond(response.data, _rows_etag([response.data]), if_none_match)
 
 @app.patch("/notes/{note_id}", response_model=Note, dependencies=[Depends(get_api_key)])
 async def patch_note(note_id: int, content: str):
-    response = await update_note(note_id, content)
+    response = await update_note(note_id, content=content)
     if not response.data:
         raise HTTPException(status_code=404, detail="Note not found")
-    return response.data
\ No newline at end of file
+    return JSONBytesResponse(response.data[0], headers={"ETag": _rows_etag(response.data)})
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+The Supabase backend: the ``notes`` table over PostgREST, through the pooled
+client in db.py.
+
+PostgREST has no ranking and no grouping by array elements, so ``search`` is a
+case-insensitive substring match and ``tag_counts`` counts the tags column
+page by page; crud builds its in-process indexes on top of this backend.
+"""
+
+import asyncio
+from collections import Counter
+
+from db import PostgrestClient, quote
+from storage import StorageBackend, SUMMARY_COLUMNS
+from tag_index import normalize_tag
+
+
+def _ilike_filter(query: str) -> str:
+    pattern = quote(f"*{query}*")
+    return f"(title.ilike.{pattern},content.ilike.{pattern})"
+
+
+class PostgrestBackend(StorageBackend):
+    """Supabase through the pooled PostgREST client"""
+
+    def __init__(self, client: PostgrestClient):
+        self.client = client
+
+    @classmethod
+    def from_env(cls) -> "PostgrestBackend":
+        return cls(PostgrestClient.from_env())
+
+    async def list_notes(self, columns, order_by, after, limit):
+        params = None
+        if after is not None:
+            if order_by == "id":
+                params = {"id": f"gt.{int(after[0])}"}
+            else:
+                updated_at, note_id = quote(after[0]), int(after[1])
+                params = {"or": f"(updated_at.gt.{updated_at},"
+                                f"and(updated_at.eq.{updated_at},id.gt.{note_id}))"}
+        order = "id.asc" if order_by == "id" else "updated_at.asc,id.asc"
+        response = await self.client.select("notes", columns, params=params, order=order, limit=limit)
+        return response.data or []
+
+    async def get_note(self, note_id):
+        response = await self.client.select("notes", params={"id": f"eq.{note_id}"}, single=True)
+        return response.data
+
+    async def get_notes(self, note_ids):
+        id_list = ",".join(str(int(i)) for i in note_ids)
+        response = await self.client.select("notes", params={"id": f"in.({id_list})"})
+        return response.data or []
+
+    async def insert_notes(self, rows):
+        response = await self.client.insert("notes", rows)
+        return response.data or []
+
+    async def update_note(self, note_id, values, expected_updated_at=None):
+        params = {"id": f"eq.{note_id}"}
+        if expected_updated_at is not None:
+            params["updated_at"] = f"eq.{quote(expected_updated_at)}"
+        response = await self.client.update("notes", values, params=params)
+        return response.data or []
+
+    async def update_notes(self, rows):
+        # A PATCH sets the same values on every row it matches, so one per note;
+        # the client's concurrency limit bounds how many run at once
+        responses = await asyncio.gather(*(
+            self.client.update("notes", {k: v for k, v in row.items() if k not in ("id", "change_seq")},
+                               params={"id": f"eq.{int(row['id'])}"})
+            for row in rows))
+        return [note for response in responses for note in response.data or []]
+
+    async def delete_notes(self, note_ids):
+        id_list = ",".join(str(int(i)) for i in note_ids)
+        response = await self.client.delete("notes", params={"id": f"in.({id_list})"})
+        return [row["id"] for row in response.data or []]
+
+    async def list_changes(self, columns, after, since, limit):
+        # One query on the note_changes view (notes UNION ALL tombstones, see
+        # the README), so both come from the same snapshot
+        params = None
+        if after is not None:
+            params = {"change_seq": f"gt.{int(after)}"}
+        elif since is not None:
+            params = {"changed_at": f"gte.{quote(since)}"}
+        if columns != "*":
+            columns = f"{columns},deleted,deleted_at"
+        response = await self.client.select("note_changes", columns, params=params,
+                                            order="change_seq.asc", limit=limit)
+        notes, deleted = [], []
+        for row in response.data or []:
+            if row.pop("deleted"):
+                deleted.append({"id": row["id"], "deleted_at": row["deleted_at"], "change_seq": row["change_seq"]})
+            else:
+                row.pop("deleted_at", None)
+                row.pop("changed_at", None)
+                notes.append(row)
+        return notes, deleted
+
+    async def search(self, query, limit):
+        response = await self.client.select("notes", params={"or": _ilike_filter(query)}, limit=limit)
+        return response.data or []
+
+    async def iter_search(self, query, limit=None, page_size=200):
+        # Unranked, so page through the matches in id order
+        last_id, sent = 0, 0
+        while limit is None or sent < limit:
+            size = page_size if limit is None else min(page_size, limit - sent)
+            response = await self.client.select("notes", params=[
+                ("or", _ilike_filter(query)), ("id", f"gt.{last_id}")
+            ], order="id.asc", limit=size)
+            rows = response.data or []
+            for row in rows:
+                yield row
+            sent += len(rows)
+            if len(rows) < size:
+                return
+            last_id = rows[-1]["id"]
+
+    async def query_tags(self, tags, match, exclude, limit):
+        if any("*" in t for t in list(tags) + list(exclude)):
+            raise ValueError("Tag patterns are available once the tag index has loaded")
+        params = []
+        if tags:
+            tag_list = ",".join(quote(t) for t in tags)
+            params.append(("tags", f"{'ov' if match == 'any' else 'cs'}.{{{tag_list}}}"))
+        if exclude:
+            params.append(("tags", f"not.ov.{{{','.join(quote(t) for t in exclude)}}}"))
+        response = await self.client.select(
+            "notes", SUMMARY_COLUMNS, params=params, order="id.asc", limit=limit, count=True
+        )
+        return response.data or [], response.count
+
+    async def tag_counts(self, prefix=None, page_size=1000):
+        prefix = normalize_tag(prefix) if prefix else ""
+        counts: Counter = Counter()
+        last_id = 0
+        while True:
+            response = await self.client.select("notes", "id,tags", params={"id": f"gt.{last_id}"},
+                                                order="id.asc", limit=page_size)
+            rows = response.data or []
+            for row in rows:
+                tags = {normalize_tag(t) for t in row.get("tags") or [] if isinstance(t, str)}
+                counts.update(t for t in tags if t and t.startswith(prefix))
+            if len(rows) < page_size:
+                return dict(sorted(counts.items()))
+            last_id = rows[-1]["id"]
+
+    async def connect(self, connections=1):
+        await self.client.connect(connections)
+
+    async def close(self):
+        await self.client.aclose()
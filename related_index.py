@@ -0,0 +1,376 @@
+"""
+Offline "related notes": cosine similarity of hashed TF-IDF vectors.
+
+Each note becomes a ``dim``-dimensional float32 vector. Every distinct token
+of its title (counted twice) and content is hashed with crc32 to one dimension
+and a sign, weighted by ``(1 + log tf) * idf`` and added in; the sum is
+L2-normalised. Signed feature hashing keeps dot products close to those of the
+full sparse TF-IDF vectors while the matrix stays dense and small: 100k notes
+at 256 dimensions is 100 MB, and a query is one matrix-vector product and an
+``argpartition``. No model or network is involved.
+
+Document frequencies are counted in ``DF_BUCKETS`` hashed buckets. The first
+full build fits them on every note before any vector is made; afterwards
+notes added later bump them, while edits reuse them as they are. Delete the
+files to refit from scratch.
+
+With a ``path``, the matrix is a memory-mapped ``.npy`` file. The document
+frequencies (``.df.npy``) and a manifest (``.json``: note id, row, updated_at)
+are stored next to it. On restart a note whose updated_at matches the
+manifest keeps its row, so only notes changed in the meantime are vectorised
+again. Rows of deleted notes are zeroed, and reused once a manifest that no
+longer points at them has been saved: until then a restart after a crash
+would load the old manifest, which still maps the deleted note to that row.
+
+``finish()`` and ``save()`` are coroutines so a large vault doesn't stall the
+event loop: the first build fits df and vectorises in chunks of
+``FINISH_CHUNK`` notes, yielding between them, and a save snapshots the
+manifest on the loop and writes the files on a worker thread.
+
+NumPy is optional; without it ``enabled`` is False and crud leaves this index
+out. It is imported, and a saved matrix loaded, by ``open()`` on first use
+rather than at import, so a process that starts up doesn't wait for either
+before it can serve.
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Optional: related-note search is off without it. Imported by open()
+np = None
+
+from search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+DF_BUCKETS = 1 << 20
+DEFAULT_DIM = 256
+MAX_DIM = 2048  # dimension bits come from bits 20-30 of the hash
+_HASH_MEMO_LIMIT = 1_000_000
+SAVE_EVERY = 1000  # writes between manifest saves; a stale manifest only costs re-vectorising
+FINISH_CHUNK = 500  # notes handled by finish() between yields to the event loop
+DEFAULT_PATH = os.path.join("data", "related.npy")
+
+
+class RelatedIndex:
+    """Note vectors in a (memory-mapped) matrix with cosine top-k queries"""
+
+    def __init__(self, path: Optional[str] = None, dim: int = DEFAULT_DIM, enabled: bool = True):
+        if not 0 < dim <= MAX_DIM:
+            raise ValueError(f"dim must be between 1 and {MAX_DIM}")
+        self.enabled = enabled and importlib.util.find_spec("numpy") is not None
+        self.ready = False
+        self.path = path
+        self.dim = dim
+        self._hashes: Dict[str, int] = {}
+        self._opened = False
+        self._save_lock: Optional[asyncio.Lock] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._reset()
+
+    def open(self):
+        """Import NumPy and load the saved matrix, if there is one; once"""
+        global np
+        if self._opened or not self.enabled:
+            return
+        self._opened = True
+        import numpy as np
+        self._reset()
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.path and os.path.exists(self._manifest_path):
+            try:
+                self._load()
+            except Exception:
+                logger.exception("Could not load the related-notes index from %s; rebuilding", self.path)
+                self._reset()
+
+    def _reset(self):
+        self._rows: Dict[int, int] = {}  # note id -> row
+        self._versions: Dict[int, Any] = {}  # note id -> updated_at of its vector
+        self._titles: Dict[int, str] = {}
+        self._free: List[int] = []
+        self._released: List[int] = []  # freed since the last save; reusable after the next
+        self._count = 0  # rows ever used; rows past it are unallocated
+        self._docs = 0  # notes counted in _df
+        self._fitted = False
+        # First build only: note id -> (token hashes, term frequencies) until df is fit
+        self._pending: Dict[int, Tuple[Any, Any]] = {}
+        # Notes seen by the current build; rows of the others are dropped at finish()
+        self._seen: Optional[Set[int]] = set()
+        self._unsaved = 0
+        if self._opened:
+            self._df = np.zeros(DF_BUCKETS, np.uint32)
+            self._ids = np.full(0, -1, np.int64)  # row -> note id, -1 when free
+            self._vectors = np.zeros((0, self.dim), np.float32)
+
+    @classmethod
+    def from_env(cls) -> "RelatedIndex":
+        return cls(
+            path=os.getenv("RELATED_INDEX_PATH", DEFAULT_PATH) or None,
+            dim=int(os.getenv("RELATED_DIM", DEFAULT_DIM)),
+            enabled=os.getenv("RELATED_INDEX", "1").lower() not in ("0", "false", "no", "off"),
+        )
+
+    def __len__(self):
+        return len(self._rows) + len(self._pending)
+
+    def __contains__(self, note_id: int) -> bool:
+        return note_id in self._rows or note_id in self._pending
+
+    # -- features
+
+    def _hash(self, token: str) -> int:
+        h = self._hashes.get(token)
+        if h is None:
+            if len(self._hashes) >= _HASH_MEMO_LIMIT:
+                self._hashes.clear()
+            h = self._hashes[token] = zlib.crc32(token.encode("utf-8"))
+        return h
+
+    def _features(self, title: str, content: str) -> Tuple[Any, Any]:
+        counts = Counter(tokenize(title) * 2 + tokenize(content))
+        hashes = np.fromiter((self._hash(t) for t in counts), np.uint32, len(counts))
+        tf = np.fromiter(counts.values(), np.float32, len(counts))
+        return hashes, tf
+
+    def _vector(self, hashes, tf):
+        vector = np.zeros(self.dim, np.float32)
+        if not len(hashes):
+            return vector
+        df = self._df[hashes & (DF_BUCKETS - 1)]
+        idf = np.log((1 + self._docs) / (1.0 + df)) + 1.0
+        signs = np.where(hashes >> 31, -1.0, 1.0)
+        weights = (1.0 + np.log(tf)) * idf * signs
+        dims = (hashes >> 20) & (MAX_DIM - 1)
+        vector += np.bincount(dims % self.dim, weights, minlength=self.dim).astype(np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _count_df(self, hashes):
+        self._df[np.unique(hashes & (DF_BUCKETS - 1))] += 1
+        self._docs += 1
+
+    # -- updates
+
+    def add(self, note: Dict[str, Any]):
+        """Vectorise ``note``, replacing its previous vector"""
+        self.open()
+        note_id = note["id"]
+        updated_at = note.get("updated_at")
+        previous = self._versions.get(note_id)
+        if self._seen is not None:
+            self._seen.add(note_id)
+        if previous and updated_at and previous > updated_at:
+            return  # a newer version is already indexed
+        self._titles[note_id] = note.get("title") or ""
+        if "content" not in note:
+            return  # a metadata-only row leaves the vector as it was
+        if updated_at and previous == updated_at and note_id in self:
+            return  # unchanged since the vector was made (e.g. loaded from disk)
+        hashes, tf = self._features(note.get("title") or "", note.get("content") or "")
+        self._versions[note_id] = updated_at
+        if not self._fitted:
+            self._pending[note_id] = (hashes, tf)
+            return
+        # A note still waiting in _pending was counted when df was fit
+        if self._pending.pop(note_id, None) is None and note_id not in self._rows:
+            self._count_df(hashes)
+        # Allocate first: growing the matrix replaces self._vectors
+        row = self._row_for(note_id)
+        self._vectors[row] = self._vector(hashes, tf)
+        self._written()
+
+    def remove(self, note_id: int):
+        self.open()
+        self._versions.pop(note_id, None)
+        self._titles.pop(note_id, None)
+        self._pending.pop(note_id, None)
+        row = self._rows.pop(note_id, None)
+        if row is not None:
+            self._ids[row] = -1
+            self._vectors[row] = 0
+            (self._released if self.path else self._free).append(row)
+            self._written()
+
+    def _written(self):
+        self._unsaved += 1
+        if self.ready and self._unsaved >= SAVE_EVERY and (self._save_task is None or self._save_task.done()):
+            self._unsaved = 0
+            self._save_task = asyncio.ensure_future(self._autosave())
+
+    async def _autosave(self):
+        try:
+            await self.save()
+        except Exception:
+            logger.exception("Saving the related-notes index to %s failed", self.path)
+
+    async def finish(self):
+        """End of the startup build: fit df if needed, drop notes that are gone, save.
+        Notes added or removed while it yields are taken into account."""
+        self.open()
+        if self._seen is not None:
+            for note_id in [i for i in self._rows if i not in self._seen]:
+                self.remove(note_id)
+            self._seen = None
+        if not self._fitted:
+            counted: Set[int] = set()
+            while True:
+                todo = [i for i in self._pending if i not in counted]
+                if not todo:
+                    break
+                for start in range(0, len(todo), FINISH_CHUNK):
+                    chunk = [i for i in todo[start:start + FINISH_CHUNK] if i in self._pending]
+                    if chunk:
+                        buckets = np.concatenate([np.unique(self._pending[i][0] & (DF_BUCKETS - 1)) for i in chunk])
+                        self._df += np.bincount(buckets, minlength=DF_BUCKETS).astype(np.uint32)
+                        self._docs += len(chunk)
+                        counted.update(chunk)
+                    await asyncio.sleep(0)
+            # From here add() writes vectors itself and takes its note out of _pending
+            self._fitted = True
+            self._ensure_capacity(self._count + len(self._pending))
+            while self._pending:
+                for _ in range(min(FINISH_CHUNK, len(self._pending))):
+                    note_id, (hashes, tf) = self._pending.popitem()
+                    row = self._row_for(note_id)
+                    self._vectors[row] = self._vector(hashes, tf)
+                await asyncio.sleep(0)
+        await self.save()
+
+    def _row_for(self, note_id: int) -> int:
+        row = self._rows.get(note_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = self._count
+                self._ensure_capacity(row + 1)
+                self._count += 1
+            self._rows[note_id] = row
+            self._ids[row] = note_id
+        return row
+
+    def _ensure_capacity(self, rows: int):
+        capacity = len(self._ids)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+        ids = np.full(capacity, -1, np.int64)
+        ids[:self._count] = self._ids[:self._count]
+        self._ids = ids
+        if self.path:
+            tmp = self.path + ".tmp"
+            vectors = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+            vectors[:self._count] = self._vectors[:self._count]
+            vectors.flush()
+            del vectors
+            self._vectors = None  # unmap before replacing the file
+            os.replace(tmp, self.path)
+            self._vectors = np.load(self.path, mmap_mode="r+")
+        else:
+            vectors = np.zeros((capacity, self.dim), np.float32)
+            vectors[:self._count] = self._vectors[:self._count]
+            self._vectors = vectors
+
+    # -- persistence
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.splitext(self.path)[0] + ".json"
+
+    @property
+    def _df_path(self) -> str:
+        return os.path.splitext(self.path)[0] + ".df.npy"
+
+    async def save(self):
+        """Flush the matrix, then write df and the manifest that points into it.
+        The state is copied on the event loop; the disk writes run on a worker thread."""
+        if not (self._opened and self.path and self._fitted):
+            return
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        async with self._save_lock:
+            if len(self._ids) == 0:
+                self._ensure_capacity(1)
+            self._unsaved = 0
+            released = len(self._released)
+            manifest = {
+                "version": 1, "dim": self.dim, "docs": self._docs, "count": self._count,
+                "free": self._free + self._released,
+                "notes": [[note_id, row, self._versions.get(note_id)] for note_id, row in self._rows.items()],
+            }
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write_files, self._vectors, self._df.copy(), manifest)
+            # The manifest on disk no longer names the notes these rows held
+            self._free.extend(self._released[:released])
+            del self._released[:released]
+
+    def _write_files(self, vectors, df, manifest: Dict[str, Any]):
+        vectors.flush()
+        with open(self._df_path + ".tmp", "wb") as fh:
+            np.save(fh, df)
+        os.replace(self._df_path + ".tmp", self._df_path)
+        with open(self._manifest_path + ".tmp", "w") as fh:
+            json.dump(manifest, fh, separators=(",", ":"))
+        os.replace(self._manifest_path + ".tmp", self._manifest_path)
+
+    def _load(self):
+        with open(self._manifest_path) as fh:
+            manifest = json.load(fh)
+        if manifest.get("dim") != self.dim:
+            raise ValueError(f"index has dim {manifest.get('dim')}, RELATED_DIM is {self.dim}")
+        vectors = np.load(self.path, mmap_mode="r+")
+        if vectors.shape[1] != self.dim or vectors.shape[0] < manifest["count"]:
+            raise ValueError("matrix does not match the manifest")
+        self._vectors = vectors
+        self._df = np.load(self._df_path)
+        self._docs = manifest["docs"]
+        self._count = manifest["count"]
+        self._free = list(manifest["free"])
+        self._ids = np.full(len(vectors), -1, np.int64)
+        for note_id, row, updated_at in manifest["notes"]:
+            self._rows[note_id] = row
+            self._ids[row] = note_id
+            self._versions[note_id] = updated_at
+        self._fitted = True
+
+    # -- queries
+
+    def _top(self, query, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        n = self._count
+        if n == 0 or k <= 0:
+            return []
+        scores = self._vectors[:n] @ query
+        scores[self._ids[:n] < 0] = -np.inf
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        k = min(k, n)
+        top = np.argpartition(scores, n - k)[n - k:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self._ids[row]), round(float(scores[row]), 4)) for row in top if scores[row] > 0]
+
+    def related(self, note_id: int, k: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """(note id, cosine) of the ``k`` notes most similar to ``note_id``; None if unknown"""
+        row = self._rows.get(note_id)
+        if row is None:
+            return None
+        return self._top(np.array(self._vectors[row]), k, exclude=row)
+
+    def similar(self, text: str, k: int = 10) -> List[Tuple[int, float]]:
+        """(note id, cosine) of the ``k`` notes most similar to free text"""
+        query = self._vector(*self._features("", text))
+        return self._top(query, k) if query.any() else []
+
+    def title(self, note_id: int) -> Optional[str]:
+        return self._titles.get(note_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"notes": len(self._rows), "dim": self.dim, "rows": self._count,
+                "bytes": self._count * self.dim * 4, "path": self.path}
@@ -13,6 +13,15 @@ class NoteBase(BaseModel):
 class NoteCreate(NoteBase):
     pass
 
+# Metadata-only view returned by paginated listings
+class NoteSummary(BaseModel):
+    id: int
+    title: str
+    tags: Optional[List[str]] = None
+    size_bytes: Optional[int] = None
+    updated_at: datetime
+    change_seq: Optional[int] = None
+
 # Full note model
 class Note(NoteBase):
     id: int
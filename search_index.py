@@ -0,0 +1,183 @@
+"""
+In-process BM25 full-text index over note titles and content.
+
+Each indexed version of a note gets an internal document number. Postings are
+stored per term as two parallel ``array('i')`` columns (docno, term frequency),
+which keeps a 100k-note vault at a few bytes per posting instead of a dict entry
+each. Updating a note appends a new document and marks the old docno dead; dead
+postings are skipped at query time and purged by ``compact()`` once they make
+up a large share of the index. Document frequencies are kept per term for
+live documents only, so they don't grow with every edit.
+"""
+
+import heapq
+import math
+import re
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SNIPPET_CHARS = 160
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def make_snippet(content: Optional[str], terms: Iterable[str], width: int = SNIPPET_CHARS) -> str:
+    """Window of ``content`` around the first occurrence of any query term"""
+    if not content:
+        return ""
+    lowered = content.lower()
+    first = -1
+    for term in terms:
+        match = re.search(r"\b" + re.escape(term) + r"\b", lowered)
+        if match and (first < 0 or match.start() < first):
+            first = match.start()
+    start = max(0, first - width // 3) if first >= 0 else 0
+    end = min(len(content), start + width)
+    snippet = " ".join(content[start:end].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(content) else "")
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking, updated one note at a time"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, title_weight: int = 3):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.ready = False
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._df: Dict[str, int] = {}  # term -> live documents containing it
+        self._docs: List[Optional[Tuple[int, str, Any, str, Any]]] = []  # docno -> note fields
+        self._doc_len = array("i")
+        self._by_note: Dict[int, int] = {}  # note id -> live docno
+        self._total_len = 0
+        self._dead_postings = 0
+        self._live_postings = 0
+
+    def __len__(self):
+        return len(self._by_note)
+
+    def add(self, note: Dict[str, Any]):
+        """Index ``note``, replacing any older version of it"""
+        note_id = note["id"]
+        current = self._by_note.get(note_id)
+        if current is not None:
+            updated_at = self._docs[current][4]
+            if updated_at and note.get("updated_at") and updated_at > note["updated_at"]:
+                return  # a newer version is already indexed
+            self._retire(current)
+
+        title, content = note.get("title") or "", note.get("content") or ""
+        counts: Dict[str, int] = {}
+        for term in tokenize(title):
+            counts[term] = counts.get(term, 0) + self.title_weight
+        for term in tokenize(content):
+            counts[term] = counts.get(term, 0) + 1
+
+        docno = len(self._docs)
+        self._docs.append((note_id, title, note.get("tags"), content, note.get("updated_at")))
+        length = sum(counts.values())
+        self._doc_len.append(length)
+        self._total_len += length
+        self._by_note[note_id] = docno
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("i"))
+            postings[0].append(docno)
+            postings[1].append(tf)
+            self._df[term] = self._df.get(term, 0) + 1
+        self._live_postings += len(counts)
+
+    def remove(self, note_id: int):
+        docno = self._by_note.get(note_id)
+        if docno is not None:
+            self._retire(docno)
+
+    def _retire(self, docno: int):
+        note_id, title, _, content, _ = self._docs[docno]
+        unique = set(tokenize(title)) | set(tokenize(content))
+        terms = len(unique)
+        for term in unique:
+            df = self._df[term] - 1
+            if df:
+                self._df[term] = df
+            else:
+                del self._df[term]
+        self._docs[docno] = None
+        self._total_len -= self._doc_len[docno]
+        self._dead_postings += terms
+        self._live_postings -= terms
+        if self._by_note.get(note_id) == docno:
+            del self._by_note[note_id]
+        if self._dead_postings > 100_000 and self._dead_postings > self._live_postings:
+            self.compact()
+
+    def compact(self):
+        """Drop postings of retired documents and renumber the live ones"""
+        live = [d for d in self._docs if d is not None]
+        self._postings.clear()
+        self._df.clear()
+        self._docs, self._doc_len, self._by_note = [], array("i"), {}
+        self._total_len = self._dead_postings = self._live_postings = 0
+        for note_id, title, tags, content, updated_at in live:
+            self.add({"id": note_id, "title": title, "tags": tags,
+                      "content": content, "updated_at": updated_at})
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Top ``limit`` notes for ``query`` by BM25 score, with snippets"""
+        return list(self.iter_search(query, limit))
+
+    def iter_search(self, query: str, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Like ``search`` but yields hits best-first; snippets are built lazily"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        live_docs = len(self._by_note)
+        if not terms or not live_docs:
+            return
+
+        avg_len = self._total_len / live_docs or 1.0
+        k1, b, docs, doc_len = self.k1, self.b, self._docs, self._doc_len
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            df = self._df.get(term, 0)
+            if postings is None or not df:
+                continue
+            docnos, tfs = postings
+            idf = math.log(1 + (live_docs - df + 0.5) / (df + 0.5))
+            norm, scale = k1 * (1 - b), k1 * b / avg_len
+            for docno, tf in zip(docnos, tfs):
+                if docs[docno] is None:
+                    continue
+                scores[docno] = scores.get(docno, 0.0) + idf * tf * (k1 + 1) / (tf + norm + scale * doc_len[docno])
+
+        by_score = lambda item: item[1]  # noqa: E731
+        if limit is None:
+            ranked = sorted(scores.items(), key=by_score, reverse=True)
+        else:
+            ranked = heapq.nlargest(limit, scores.items(), key=by_score)
+        for docno, score in ranked:
+            entry = docs[docno]
+            if entry is None:
+                continue  # retired while the caller was consuming results
+            note_id, title, tags, content, updated_at = entry
+            yield {
+                "id": note_id,
+                "title": title,
+                "tags": tags,
+                "updated_at": updated_at,
+                "score": round(score, 4),
+                "snippet": make_snippet(content, terms),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "notes": len(self._by_note),
+            "terms": len(self._postings),
+            "postings": self._live_postings,
+            "dead_postings": self._dead_postings,
+        }
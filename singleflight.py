@@ -0,0 +1,75 @@
+"""
+Coalescing of concurrent identical reads ("singleflight").
+
+``await flights.do(key, fetch)`` runs ``fetch()`` unless a call with the same
+key is already in flight, in which case it waits for that call and gets the
+same result (or exception). A burst of requests for one hot note therefore
+costs one backend query.
+
+Results are only shared while the query runs; nothing is kept after it
+completes, so a caller never sees data older than a query that was in
+flight when it arrived. Writes call ``forget`` for the keys they affect, so a
+read started after a write never joins a query that began before it.
+
+The query runs in its own task: a caller that is cancelled (a client that
+disconnected) leaves it running for the others.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+import metrics
+
+COALESCED_READS = metrics.registry.counter(
+    "mcp_coalesced_reads_total",
+    "Reads by whether they ran a backend query (leader) or shared one in flight (shared)",
+    ("operation", "role"))
+
+
+class SingleFlight:
+    """In-flight read deduplication keyed by tuples, with leader/shared counters"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, "asyncio.Future"] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """``await fetch()``, shared with every concurrent caller passing the same ``key``"""
+        operation = key[0] if isinstance(key, tuple) and key else str(key)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(fetch())
+            flight.add_done_callback(lambda done: self._finished(key, done))
+            self.leaders += 1
+            role = "leader"
+        else:
+            self.shared += 1
+            role = "shared"
+        if metrics.ENABLED:
+            COALESCED_READS.inc(str(operation), role)
+        return await asyncio.shield(flight)
+
+    def _finished(self, key: Hashable, flight: "asyncio.Future"):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            flight.exception()  # retrieved, even if every caller was cancelled
+
+    def forget(self, key: Hashable):
+        """Later callers of ``key`` start a new query; current ones keep theirs"""
+        self._flights.pop(key, None)
+
+    def forget_prefix(self, prefix: Hashable):
+        """``forget`` every tuple key whose first element is ``prefix``"""
+        for key in [k for k in self._flights if isinstance(k, tuple) and k and k[0] == prefix]:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        reads = self.leaders + self.shared
+        return {
+            "in_flight": len(self._flights),
+            "backend_reads": self.leaders,
+            "shared_reads": self.shared,
+            "coalesced_ratio": round(self.shared / reads, 4) if reads else 0.0,
+        }
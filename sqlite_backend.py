@@ -0,0 +1,461 @@
+"""
+Local SQLite storage for single-user deployments and benchmarks.
+
+The database runs in WAL mode, so readers never wait for the writer, with a
+busy timeout so concurrent writers queue instead of failing. Next to the
+``notes`` table it keeps:
+
+- ``notes_fts``, an FTS5 external-content table over title and content,
+  ranked with bm25() (titles weigh 3x, as in the in-process index)
+- ``note_tags(tag, note_id)``, the normalized tags of every note, so tag
+  queries and ``project/*`` / ``proj*`` patterns are index range scans
+- ``note_tombstones(id, deleted_at, change_seq)``, one row per deleted note,
+  for ``changes_since``
+- ``note_change_seq``, the last change number; every insert, update and
+  delete takes the next one, stored in ``notes.change_seq`` or the tombstone.
+  SQLite has a single writer, so the numbers follow commit order
+
+All of them are maintained by triggers, so every write path keeps them in sync.
+``tags`` is stored as a JSON array and timestamps as ISO 8601 UTC strings.
+
+Calls run on a small thread pool with one connection per thread, keeping disk
+I/O off the event loop.
+
+- ``SQLITE_PATH``     database file, created on first use (default notes.db)
+- ``SQLITE_THREADS``  worker threads / connections (default 4)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import record_db
+from search_index import tokenize
+from storage import StorageBackend, SUMMARY_COLUMNS
+from tag_index import normalize_tag
+
+COLUMNS = ("id", "title", "content", "tags", "size_bytes", "created_at", "updated_at", "change_seq")
+TITLE_WEIGHT = 3.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '[]',
+    size_bytes INTEGER,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    change_seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS notes_updated_at_id ON notes (updated_at, id);
+
+CREATE TABLE IF NOT EXISTS note_tags (
+    tag TEXT NOT NULL,
+    note_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, note_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS note_tags_note_id ON note_tags (note_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, content, content='notes', content_rowid='id', tokenize="unicode61 tokenchars '_'"
+);
+
+CREATE TABLE IF NOT EXISTS note_tombstones (
+    id INTEGER PRIMARY KEY,
+    deleted_at TEXT NOT NULL,
+    change_seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS note_tombstones_deleted_at_id ON note_tombstones (deleted_at, id);
+
+CREATE TABLE IF NOT EXISTS note_change_seq (value INTEGER NOT NULL);
+INSERT INTO note_change_seq (value) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM note_change_seq);
+
+CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    INSERT OR IGNORE INTO note_tags (tag, note_id)
+        SELECT normalize_tag(value), new.id FROM json_each(new.tags) WHERE normalize_tag(value) <> '';
+END;
+CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    DELETE FROM note_tags WHERE note_id = old.id;
+END;
+-- Separate from notes_ai/notes_ad so databases created before tombstones get them too
+CREATE TRIGGER IF NOT EXISTS notes_ai_tombstone AFTER INSERT ON notes BEGIN
+    DELETE FROM note_tombstones WHERE id = new.id;
+END;
+-- Replaced by notes_ad_change, which also numbers the delete
+DROP TRIGGER IF EXISTS notes_ad_tombstone;
+CREATE TRIGGER IF NOT EXISTS notes_au_text AFTER UPDATE OF title, content ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_au_tags AFTER UPDATE OF tags ON notes BEGIN
+    DELETE FROM note_tags WHERE note_id = old.id;
+    INSERT OR IGNORE INTO note_tags (tag, note_id)
+        SELECT normalize_tag(value), new.id FROM json_each(new.tags) WHERE normalize_tag(value) <> '';
+END;
+"""
+
+# Created after _migrate has added change_seq to older databases
+CHANGES_SCHEMA = """
+CREATE UNIQUE INDEX IF NOT EXISTS notes_change_seq ON notes (change_seq);
+CREATE INDEX IF NOT EXISTS note_tombstones_change_seq ON note_tombstones (change_seq);
+
+-- change_seq itself is left out of UPDATE OF, so these don't fire each other
+CREATE TRIGGER IF NOT EXISTS notes_ai_change AFTER INSERT ON notes BEGIN
+    UPDATE note_change_seq SET value = value + 1;
+    UPDATE notes SET change_seq = (SELECT value FROM note_change_seq) WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS notes_au_change
+AFTER UPDATE OF title, content, tags, size_bytes, created_at, updated_at ON notes BEGIN
+    UPDATE note_change_seq SET value = value + 1;
+    UPDATE notes SET change_seq = (SELECT value FROM note_change_seq) WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS notes_ad_change AFTER DELETE ON notes BEGIN
+    UPDATE note_change_seq SET value = value + 1;
+    INSERT OR REPLACE INTO note_tombstones (id, deleted_at, change_seq)
+        VALUES (old.id, utc_now(), (SELECT value FROM note_change_seq));
+END;
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _sql_normalize_tag(tag: Any) -> str:
+    return normalize_tag(tag) if isinstance(tag, str) else ""
+
+
+def _note(row: sqlite3.Row) -> Dict[str, Any]:
+    note = dict(row)
+    if "tags" in note:
+        note["tags"] = json.loads(note["tags"]) if note["tags"] else []
+    return note
+
+
+def _encode(values: Dict[str, Any]) -> Dict[str, Any]:
+    unknown = set(values) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    if "tags" in values:
+        values = dict(values, tags=json.dumps(values["tags"] or []))
+    return values
+
+
+def _select_list(columns: str) -> str:
+    if columns == "*":
+        return "*"
+    names = [c.strip() for c in columns.split(",")]
+    if not set(names) <= set(COLUMNS):
+        raise ValueError(f"Unknown columns in {columns!r}")
+    return ", ".join(names)
+
+
+def _tag_condition(pattern: str) -> Tuple[str, list]:
+    """SQL over ``note_tags.tag`` for an exact tag, ``prefix*`` or ``parent/*``"""
+    pattern = normalize_tag(pattern)
+    if pattern.endswith("/*"):
+        parent = pattern[:-2]
+        return "(tag = ? OR (tag >= ? AND tag < ?))", [parent, *_prefix_range(parent + "/")]
+    if pattern.endswith("*"):
+        if pattern == "*":
+            return "1", []
+        return "(tag >= ? AND tag < ?)", list(_prefix_range(pattern[:-1]))
+    return "tag = ?", [pattern]
+
+
+def _prefix_range(prefix: str) -> Tuple[str, str]:
+    # Every string starting with ``prefix`` sorts in [prefix, upper)
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _match_query(query: str) -> str:
+    # Tokens are \w+ runs, so quoting them is enough to keep FTS5 syntax out
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(tokenize(query)))
+
+
+class SqliteBackend(StorageBackend):
+    """Notes in a local SQLite file"""
+
+    native_indexes = True
+
+    def __init__(self, path: str, threads: int = 4):
+        self.path = path
+        self.threads = threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            conn.executescript(CHANGES_SCHEMA)
+        finally:
+            conn.close()
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Add change_seq to databases created before it, and number the notes
+        and tombstones that have none in the order they last changed"""
+        with self._transaction(conn):
+            for table, stamp in (("notes", "updated_at"), ("note_tombstones", "deleted_at")):
+                if "change_seq" not in {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER")
+                ids = [r["id"] for r in conn.execute(
+                    f"SELECT id FROM {table} WHERE change_seq IS NULL ORDER BY {stamp}, id")]
+                last = self._change_seq(conn)
+                conn.executemany(f"UPDATE {table} SET change_seq = ? WHERE id = ?",
+                                 [(last + n, note_id) for n, note_id in enumerate(ids, 1)])
+                conn.execute("UPDATE note_change_seq SET value = ?", (last + len(ids),))
+
+    @staticmethod
+    def _change_seq(conn: sqlite3.Connection) -> int:
+        # Within the writing transaction this is the number the triggers just assigned
+        return conn.execute("SELECT value FROM note_change_seq").fetchone()[0]
+
+    @classmethod
+    def from_env(cls) -> "SqliteBackend":
+        return cls(os.getenv("SQLITE_PATH") or "notes.db", int(os.getenv("SQLITE_THREADS") or 4))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.create_function("normalize_tag", 1, _sql_normalize_tag, deterministic=True)
+        conn.create_function("utc_now", 0, _now)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    async def _run(self, operation: str, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix="sqlite")
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(self._executor, lambda: fn(self._connection(), *args))
+        except Exception:
+            record_db("sqlite", operation, time.perf_counter() - start, failed=True)
+            raise
+        record_db("sqlite", operation, time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: sqlite3.Connection, mode: str = "IMMEDIATE"):
+        conn.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    async def list_notes(self, columns, order_by, after, limit):
+        where, args = "", []
+        if after is not None:
+            if order_by == "id":
+                where, args = "WHERE id > ?", [int(after[0])]
+            else:
+                where = "WHERE updated_at > ? OR (updated_at = ? AND id > ?)"
+                args = [after[0], after[0], int(after[1])]
+        order = "id" if order_by == "id" else "updated_at, id"
+        sql = f"SELECT {_select_list(columns)} FROM notes {where} ORDER BY {order} LIMIT ?"
+
+        def run(conn):
+            return [_note(r) for r in conn.execute(sql, args + [limit])]
+        return await self._run("list_notes", run)
+
+    @staticmethod
+    def _change_condition(after: Optional[int], since: Optional[str], stamp: str) -> Tuple[str, list]:
+        if after is not None:
+            return "WHERE change_seq > ?", [int(after)]
+        if since is not None:
+            return f"WHERE {stamp} >= ?", [since]
+        return "", []
+
+    async def list_changes(self, columns, after, since, limit):
+        notes_where, args = self._change_condition(after, since, "updated_at")
+        deleted_where, _ = self._change_condition(after, since, "deleted_at")
+        notes_sql = f"SELECT {_select_list(columns)} FROM notes {notes_where} ORDER BY change_seq LIMIT ?"
+        deleted_sql = f"SELECT id, deleted_at, change_seq FROM note_tombstones {deleted_where} ORDER BY change_seq LIMIT ?"
+
+        def run(conn):
+            # One read transaction, so both SELECTs see the same snapshot
+            with self._transaction(conn, "DEFERRED"):
+                notes = [_note(r) for r in conn.execute(notes_sql, args + [limit])]
+                deleted = [dict(r) for r in conn.execute(deleted_sql, args + [limit])]
+            return notes, deleted
+        return await self._run("list_changes", run)
+
+    async def get_note(self, note_id):
+        def run(conn):
+            row = conn.execute("SELECT * FROM notes WHERE id = ?", (note_id,)).fetchone()
+            return _note(row) if row else None
+        return await self._run("get_note", run)
+
+    async def get_notes(self, note_ids):
+        ids = [int(i) for i in note_ids]
+        sql = f"SELECT * FROM notes WHERE id IN ({','.join('?' * len(ids))})"
+
+        def run(conn):
+            return [_note(r) for r in conn.execute(sql, ids)]
+        return await self._run("get_notes", run) if ids else []
+
+    def _insert(self, conn, row: Dict[str, Any]) -> Dict[str, Any]:
+        now = _now()
+        # The triggers number every write, so a change_seq read back with the row is dropped
+        values = _encode({k: v for k, v in row.items() if k != "change_seq"})
+        values = {"created_at": now, "updated_at": now, **values}
+        names = list(values)
+        sql = f"INSERT INTO notes ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) RETURNING *"
+        note = _note(conn.execute(sql, list(values.values())).fetchone())
+        # RETURNING shows the row before the AFTER triggers numbered it
+        note["change_seq"] = self._change_seq(conn)
+        return note
+
+    async def insert_notes(self, rows):
+        def run(conn):
+            with self._transaction(conn):
+                return [self._insert(conn, row) for row in rows]
+        return await self._run("insert_notes", run)
+
+    async def update_note(self, note_id, values, expected_updated_at=None):
+        values = _encode(values)
+        assignments = ", ".join(f"{c} = ?" for c in values)
+        where, params = "id = ?", list(values.values()) + [note_id]
+        if expected_updated_at is not None:
+            where += " AND updated_at = ?"
+            params.append(expected_updated_at)
+
+        def run(conn):
+            with self._transaction(conn):
+                cursor = conn.execute(f"UPDATE notes SET {assignments} WHERE {where} RETURNING *", params)
+                rows = [_note(r) for r in cursor]
+                for row in rows:
+                    row["change_seq"] = self._change_seq(conn)
+                return rows
+        return await self._run("update_note", run)
+
+    async def update_notes(self, rows):
+        def run(conn):
+            updated = []
+            with self._transaction(conn):
+                for row in rows:
+                    values = _encode({k: v for k, v in row.items() if k not in ("id", "change_seq")})
+                    assignments = ", ".join(f"{c} = ?" for c in values)
+                    note = conn.execute(f"UPDATE notes SET {assignments} WHERE id = ? RETURNING *",
+                                        list(values.values()) + [row["id"]]).fetchone()
+                    if note is not None:
+                        note = _note(note)
+                        note["change_seq"] = self._change_seq(conn)
+                        updated.append(note)
+            return updated
+        return await self._run("update_notes", run)
+
+    async def delete_notes(self, note_ids):
+        ids = [int(i) for i in note_ids]
+        sql = f"DELETE FROM notes WHERE id IN ({','.join('?' * len(ids))}) RETURNING id"
+
+        def run(conn):
+            with self._transaction(conn):
+                return [r["id"] for r in conn.execute(sql, ids).fetchall()]
+        return await self._run("delete_notes", run) if ids else []
+
+    def _search(self, conn, match: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        rank = f"bm25(notes_fts, {TITLE_WEIGHT}, 1.0)"
+        sql = (f"SELECT notes.*, -{rank} AS score FROM notes_fts "
+               f"JOIN notes ON notes.id = notes_fts.rowid "
+               f"WHERE notes_fts MATCH ? ORDER BY {rank} LIMIT ? OFFSET ?")
+        rows = [_note(r) for r in conn.execute(sql, (match, limit, offset))]
+        for row in rows:
+            row["score"] = round(row["score"], 4)
+        return rows
+
+    async def search(self, query, limit):
+        match = _match_query(query)
+        if not match:
+            return []
+        return await self._run("search", self._search, match, limit, 0)
+
+    async def iter_search(self, query, limit=None, page_size=200):
+        match = _match_query(query)
+        sent = 0
+        while match and (limit is None or sent < limit):
+            size = page_size if limit is None else min(page_size, limit - sent)
+            rows = await self._run("iter_search", self._search, match, size, sent)
+            for row in rows:
+                yield row
+            sent += len(rows)
+            if len(rows) < size:
+                return
+
+    async def query_tags(self, tags, match, exclude, limit):
+        if not tags:
+            selects, args = ["SELECT id FROM notes"], []
+        else:
+            groups = [list(tags)] if match == "any" else [[t] for t in tags]
+            selects, args = [], []
+            for group in groups:
+                conditions = [_tag_condition(t) for t in group]
+                selects.append("SELECT DISTINCT note_id FROM note_tags WHERE "
+                               + " OR ".join(c for c, _ in conditions))
+                args += [a for _, values in conditions for a in values]
+        compound = " INTERSECT ".join(selects)
+        if exclude:
+            conditions = [_tag_condition(t) for t in exclude]
+            compound += " EXCEPT SELECT note_id FROM note_tags WHERE " + " OR ".join(c for c, _ in conditions)
+            args += [a for _, values in conditions for a in values]
+        matched = f"WITH matched(id) AS ({compound}) "
+        columns = ", ".join(f"notes.{c}" for c in SUMMARY_COLUMNS.split(","))
+
+        def run(conn):
+            with self._transaction(conn, "DEFERRED"):
+                count = conn.execute(matched + "SELECT count(*) FROM matched", args).fetchone()[0]
+                rows = conn.execute(
+                    matched + f"SELECT {columns} FROM matched JOIN notes ON notes.id = matched.id "
+                              "ORDER BY notes.id LIMIT ?", args + [-1 if limit is None else limit])
+                return [_note(r) for r in rows], count
+        return await self._run("query_tags", run)
+
+    async def tag_counts(self, prefix=None):
+        where, args = "", []
+        if prefix and normalize_tag(prefix):
+            where, args = "WHERE tag >= ? AND tag < ?", list(_prefix_range(normalize_tag(prefix)))
+        sql = f"SELECT tag, count(*) FROM note_tags {where} GROUP BY tag ORDER BY tag"
+
+        def run(conn):
+            return {tag: count for tag, count in conn.execute(sql, args)}
+        return await self._run("tag_counts", run)
+
+    async def connect(self, connections=1):
+        # Each executor thread opens its own connection on first use
+        await asyncio.gather(*(self._run("connect", lambda conn: conn.execute("SELECT 1").fetchone())
+                               for _ in range(max(1, min(connections, self.threads)))))
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
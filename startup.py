@@ -0,0 +1,132 @@
+"""
+Cold-start timing, optional warm-up, and readiness.
+
+After Render's free tier idles the service, the next request waits for a
+whole process start, so the start is timed in phases:
+
+- ``import``    process start until the server is configured: interpreter,
+  imports and tool registration (measured from the process start time on
+  Linux, elsewhere from when this module was imported)
+- ``http_app``  building the FastAPI app (HTTP transport only)
+- ``connect``   opening database connections (warm-up only)
+- ``indexes``   loading every note into the in-process indexes
+- ``cache``     priming the note cache (warm-up only)
+- ``ready``     process start until the server reports ready
+
+Each phase is logged, exported as ``mcp_startup_seconds{phase}`` and
+reported by ``/health``.
+
+With ``MCP_WARMUP=1`` the server connects, builds the indexes and primes the
+cache before it reports ready, and ``/health`` answers 503 until then, so a
+health-checked deploy only sends traffic to a warm process. Without it the
+server reports ready at once and builds the indexes in the background, as
+before.
+
+- ``MCP_WARMUP``              1 to warm up before reporting ready (default off)
+- ``MCP_WARMUP_CONNECTIONS``  database connections to open (default 4)
+- ``MCP_WARMUP_TIMEOUT``      seconds after which the server reports ready
+  even if warm-up is still running (default 60)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = metrics.registry.gauge("mcp_startup_seconds", "Duration of each startup phase", ("phase",))
+
+
+def _process_age() -> Optional[float]:
+    """Seconds since this process started, from /proc (Linux); None elsewhere"""
+    try:
+        with open("/proc/self/stat") as fh:
+            stat = fh.read()
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        # starttime is field 22; count from after the command name, which may contain spaces
+        ticks = int(stat.rsplit(")", 1)[1].split()[19])
+        return max(0.0, uptime - ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# perf_counter() at process start, as near as we can tell
+_STARTED = time.perf_counter() - (_process_age() or 0.0)
+
+
+class Startup:
+    """Phase timings and the ready flag ``/health`` reports"""
+
+    def __init__(self, warmup: bool = False, connections: int = 4, timeout: float = 60.0):
+        self.warmup = warmup
+        self.connections = connections
+        self.timeout = timeout
+        self.ready = not warmup
+        self.phases: Dict[str, float] = {}
+        self._task: Optional[asyncio.Future] = None
+
+    @classmethod
+    def from_env(cls) -> "Startup":
+        return cls(
+            warmup=os.getenv("MCP_WARMUP", "0").lower() in ("1", "true", "yes", "on"),
+            connections=int(os.getenv("MCP_WARMUP_CONNECTIONS") or 4),
+            timeout=float(os.getenv("MCP_WARMUP_TIMEOUT") or 60),
+        )
+
+    @staticmethod
+    def elapsed() -> float:
+        """Seconds since the process started"""
+        return time.perf_counter() - _STARTED
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = seconds
+        if metrics.ENABLED:
+            STARTUP_SECONDS.set(seconds, phase)
+        logger.info("Startup phase %s: %.3fs", phase, seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_imported(self):
+        self.record("import", self.elapsed())
+
+    def mark_ready(self):
+        self.ready = True
+        self.record("ready", self.elapsed())
+
+    async def warm_up(self, steps: Sequence[Tuple[str, Callable[[], Awaitable[Any]]]]):
+        """Run each ``(phase, step)`` in order, timed, then report ready. After
+        ``timeout`` seconds the server reports ready anyway and the remaining
+        steps finish in the background; a step that fails is logged and skipped."""
+        async def run():
+            for name, step in steps:
+                with self.phase(name):
+                    try:
+                        await step()
+                    except Exception:
+                        logger.exception("Warm-up step %s failed; continuing", name)
+
+        self._task = asyncio.ensure_future(run())
+        done, _ = await asyncio.wait({self._task}, timeout=self.timeout)
+        if not done:
+            logger.warning("Warm-up still running after %gs; reporting ready", self.timeout)
+        self.mark_ready()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmup": self.warmup,
+            "uptime_seconds": round(self.elapsed(), 3),
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
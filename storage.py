@@ -0,0 +1,168 @@
+"""
+Storage backends behind crud.py.
+
+crud.py owns caching, the in-process indexes and input validation; a backend
+only moves rows in and out of the ``notes`` table. Two are available, picked
+with ``STORAGE_BACKEND``:
+
+- ``supabase`` (default): Supabase over PostgREST, see postgrest_backend.py
+  and db.py
+- ``sqlite``: a local SQLite file (``SQLITE_PATH``) with FTS5 search, for
+  single-user deployments and benchmarking without a network; see
+  sqlite_backend.py
+
+Each backend's module is imported only when that backend is picked, so a
+SQLite process never loads httpx. Use ``get_backend()`` for the process-wide
+instance: it is created on first use, so importing crud neither reads
+credentials nor opens the database, and every caller shares one connection
+pool. Settings may come from a ``.env`` file, loaded on import.
+
+Rows are plain dicts with the columns of the ``notes`` table; ``tags`` is a
+list of strings and timestamps are ISO 8601 strings. For delta sync, every
+insert, update and delete takes the next number of one database-wide change
+sequence, kept by triggers: notes carry it as ``change_seq``, and deleting a
+note leaves a ``note_tombstones(id, deleted_at, change_seq)`` row. Numbers are
+handed out in commit order, so a reader that has seen change N has seen every
+change before it.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKENDS = ("supabase", "sqlite")
+SUMMARY_COLUMNS = "id,title,tags,updated_at"
+
+
+class APIResponse:
+    """Same shape as the supabase-py response: ``.data`` and ``.count``
+
+    Paginated queries also set ``next_cursor`` (None on the last page).
+    """
+
+    def __init__(self, data: Any, count: Optional[int] = None, next_cursor: Optional[str] = None):
+        self.data = data
+        self.count = count
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f"APIResponse(data={self.data!r}, count={self.count!r})"
+
+
+class StorageBackend(ABC):
+    """Async access to the notes table"""
+
+    # True when the backend answers full-text and tag-pattern queries from its
+    # own indexes, so crud does not build the in-process ones
+    native_indexes = False
+
+    @abstractmethod
+    async def list_notes(self, columns: str, order_by: str, after: Optional[list],
+                         limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` rows ordered by ``order_by`` ("id" or "updated_at"),
+        starting just past the keyset ``after`` ([id] or [updated_at, id])"""
+
+    @abstractmethod
+    async def get_note(self, note_id: int) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_notes(self, note_ids: List[int]) -> List[Dict[str, Any]]:
+        """Rows for the ids that exist, in no particular order"""
+
+    @abstractmethod
+    async def insert_notes(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``rows`` and return them as stored, in input order"""
+
+    @abstractmethod
+    async def update_note(self, note_id: int, values: Dict[str, Any],
+                          expected_updated_at: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Apply ``values`` to one note; empty if it doesn't exist, or if
+        ``expected_updated_at`` is given and no longer matches the row's"""
+
+    @abstractmethod
+    async def update_notes(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply each row's values to the existing note with its ``id``; returns
+        the updated rows. Ids with no note are left out, never inserted, so a
+        note deleted meanwhile stays deleted."""
+
+    @abstractmethod
+    async def delete_notes(self, note_ids: List[int]) -> List[int]:
+        """Delete notes; returns the ids that existed"""
+
+    @abstractmethod
+    async def list_changes(self, columns: str, after: Optional[int], since: Optional[str],
+                           limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Changed notes and ``{"id", "deleted_at", "change_seq"}`` tombstones,
+        each ordered by ``change_seq`` and at most ``limit`` long, after change
+        ``after`` or, with ``since``, changed at or after that timestamp.
+
+        Both lists must come from one snapshot: read separately, a change
+        committed between the two reads could show up after an earlier one
+        that is missing, and a cursor past it would skip that one for good."""
+
+    @abstractmethod
+    async def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Full rows matching ``query``, best first when the backend ranks
+        (a ``score`` key is then set on each row)"""
+
+    @abstractmethod
+    def iter_search(self, query: str, limit: Optional[int] = None,
+                    page_size: int = 200) -> AsyncIterator[Dict[str, Any]]:
+        """Like ``search`` but fetched page by page"""
+
+    @abstractmethod
+    async def query_tags(self, tags: List[str], match: str, exclude: List[str],
+                         limit: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        """id/title/tags/updated_at rows in id order plus the total match count"""
+
+    @abstractmethod
+    async def tag_counts(self, prefix: Optional[str] = None) -> Dict[str, int]:
+        """Number of notes per normalized tag, only tags starting with the
+        normalized ``prefix`` when given, in tag order"""
+
+    async def connect(self, connections: int = 1):
+        """Open up to ``connections`` connections now, ahead of the first query"""
+
+    async def close(self):
+        pass
+
+
+def backend_class(name: Optional[str] = None) -> Type[StorageBackend]:
+    """The backend class named by ``name`` or ``STORAGE_BACKEND`` (default supabase)"""
+    name = (name or os.getenv("STORAGE_BACKEND") or "supabase").lower()
+    if name == "supabase":
+        from postgrest_backend import PostgrestBackend
+        return PostgrestBackend
+    if name == "sqlite":
+        from sqlite_backend import SqliteBackend
+        return SqliteBackend
+    raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(BACKENDS)}, not {name!r}")
+
+
+def create_backend(name: Optional[str] = None) -> StorageBackend:
+    """A new backend named by ``name`` or ``STORAGE_BACKEND``, configured from the environment"""
+    return backend_class(name).from_env()
+
+
+_shared: Optional[StorageBackend] = None
+
+
+def get_backend() -> StorageBackend:
+    """The backend shared by the whole process, created on first use"""
+    global _shared
+    if _shared is None:
+        _shared = create_backend()
+    return _shared
+
+
+async def close_backend():
+    """Close the shared backend, if it was ever created"""
+    global _shared
+    backend, _shared = _shared, None
+    if backend is not None:
+        await backend.close()
@@ -0,0 +1,136 @@
+"""
+In-memory tag -> note id index.
+
+Each tag maps to a sorted ``array('q')`` of note ids, and the tag names are
+kept in a sorted list so prefix (``proj*``) and hierarchy (``project/*``)
+patterns resolve with a bisect instead of a scan. Tags are compared
+case-insensitively with any leading ``#`` dropped, as Obsidian does.
+
+The index also keeps a small summary per note (title, tags, updated_at) so
+tag queries can be answered without touching the database.
+"""
+
+from array import array
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+MATCH_MODES = ("any", "all")
+
+
+def normalize_tag(tag: str) -> str:
+    return tag.strip().lstrip("#").lower()
+
+
+class TagIndex:
+    """Sorted posting arrays per tag with any/all/not queries"""
+
+    def __init__(self):
+        self.ready = False
+        self._postings: Dict[str, array] = {}
+        self._names: List[str] = []  # sorted tag names
+        # id -> (title, normalized tags, updated_at, tags as stored)
+        self._notes: Dict[int, Tuple[str, Tuple[str, ...], Any, List[str]]] = {}
+
+    def __len__(self):
+        return len(self._notes)
+
+    def add(self, note: Dict[str, Any]):
+        """Index ``note``'s tags, replacing whatever was indexed for it before"""
+        note_id = note["id"]
+        previous = self._notes.get(note_id)
+        if previous and previous[2] and note.get("updated_at") and previous[2] > note["updated_at"]:
+            return  # a newer version is already indexed
+        tags = tuple(dict.fromkeys(normalize_tag(t) for t in note.get("tags") or [] if normalize_tag(t)))
+        old_tags = previous[1] if previous else ()
+        for tag in set(old_tags) - set(tags):
+            self._discard(tag, note_id)
+        for tag in set(tags) - set(old_tags):
+            postings = self._postings.get(tag)
+            if postings is None:
+                postings = self._postings[tag] = array("q")
+                insort(self._names, tag)
+            pos = bisect_left(postings, note_id)
+            postings.insert(pos, note_id)
+        self._notes[note_id] = (note.get("title"), tags, note.get("updated_at"), list(note.get("tags") or []))
+
+    def remove(self, note_id: int):
+        previous = self._notes.pop(note_id, None)
+        for tag in previous[1] if previous else ():
+            self._discard(tag, note_id)
+
+    def _discard(self, tag: str, note_id: int):
+        postings = self._postings.get(tag)
+        if postings is None:
+            return
+        pos = bisect_left(postings, note_id)
+        if pos < len(postings) and postings[pos] == note_id:
+            del postings[pos]
+        if not postings:
+            del self._postings[tag]
+            del self._names[bisect_left(self._names, tag)]
+
+    def expand(self, pattern: str) -> List[str]:
+        """Tags matched by ``pattern``: exact, ``prefix*`` or ``parent/*``"""
+        pattern = normalize_tag(pattern)
+        if pattern.endswith("/*"):
+            parent = pattern[:-2]
+            return ([parent] if parent in self._postings else []) + self._with_prefix(parent + "/")
+        if pattern.endswith("*"):
+            return self._with_prefix(pattern[:-1])
+        return [pattern] if pattern in self._postings else []
+
+    def _with_prefix(self, prefix: str) -> List[str]:
+        out = []
+        for i in range(bisect_left(self._names, prefix), len(self._names)):
+            name = self._names[i]
+            if not name.startswith(prefix):
+                break
+            out.append(name)
+        return out
+
+    def _matching(self, pattern: str) -> Set[int]:
+        ids: Set[int] = set()
+        for tag in self.expand(pattern):
+            ids.update(self._postings[tag])
+        return ids
+
+    def query(self, tags: Iterable[str] = (), match: str = "any",
+              exclude: Iterable[str] = ()) -> List[int]:
+        """Sorted ids of notes matching ``any``/``all`` of ``tags`` and none of ``exclude``.
+
+        With no ``tags`` every note is a candidate, so ``exclude`` alone acts as NOT.
+        """
+        if match not in MATCH_MODES:
+            raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+        patterns = list(tags)
+        if not patterns:
+            result = set(self._notes)
+        elif match == "any":
+            result = set()
+            for pattern in patterns:
+                result |= self._matching(pattern)
+        else:
+            # Smallest set first keeps the intersections cheap
+            sets = sorted((self._matching(p) for p in patterns), key=len)
+            result = sets[0]
+            for other in sets[1:]:
+                result &= other
+                if not result:
+                    break
+        for pattern in exclude:
+            if not result:
+                break
+            result -= self._matching(pattern)
+        return sorted(result)
+
+    def summary(self, note_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._notes.get(note_id)
+        if entry is None:
+            return None
+        title, _, updated_at, tags = entry
+        return {"id": note_id, "title": title, "tags": tags, "updated_at": updated_at}
+
+    def counts(self, prefix: Optional[str] = None) -> Dict[str, int]:
+        """Number of notes per tag, optionally only tags under ``prefix``"""
+        names = self._with_prefix(normalize_tag(prefix)) if prefix else self._names
+        return {name: len(self._postings[name]) for name in names}
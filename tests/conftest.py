@@ -0,0 +1,25 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# crud picks its backend and background features at import
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["RELATED_INDEX"] = "0"
+os.environ["WRITE_BEHIND"] = "0"
+os.environ["INDEX_SYNC_INTERVAL"] = "0"
+
+
+@pytest.fixture
+def crud(tmp_path, monkeypatch):
+    """crud on a fresh SQLite database, with an empty cache"""
+    import crud
+    import storage
+
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "notes.db"))
+    crud.cache.clear()
+    yield crud
+    asyncio.run(storage.close_backend())
@@ -0,0 +1,65 @@
+import asyncio
+
+
+async def _pull(crud, mirror, cursor, limit, between_pages=None):
+    """Apply changes_since pages to ``mirror`` until caught up; returns the
+    cursor to poll with and the change_seq of every change seen, in order"""
+    seen = []
+    pages = 0
+    while True:
+        page = (await crud.changes_since(cursor, limit)).data
+        assert len(page["notes"]) + len(page["deleted"]) <= limit
+        for note in page["notes"]:
+            mirror[note["id"]] = note["content"]
+        for tombstone in page["deleted"]:
+            mirror.pop(tombstone["id"], None)
+        seen += sorted(row["change_seq"] for row in page["notes"] + page["deleted"])
+        cursor = page["next_cursor"]
+        pages += 1
+        if between_pages is not None:
+            await between_pages(pages)
+        if not page["has_more"]:
+            return cursor, seen
+
+
+async def _database(crud):
+    return {row["id"]: row["content"] async for row in crud.iter_notes()}
+
+
+def test_paging_over_interleaved_updates_and_deletes(crud):
+    async def run():
+        ids = [row["note"]["id"] for row in (await crud.create_notes(
+            [{"title": f"note {i}", "content": f"v0 {i}"} for i in range(8)])).data]
+        mirror = {}
+        cursor, seen = await _pull(crud, mirror, None, 3)
+        assert mirror == await _database(crud)
+        assert seen == sorted(seen)
+
+        # Writes between polls, including to notes already paged past
+        await crud.update_note(ids[1], content="v1 1")
+        await crud.delete_notes([ids[2]])
+        await crud.update_note(ids[5], content="v1 5")
+        await crud.delete_notes([ids[0]])
+        new = (await crud.create_note("late", "v0 late")).data[0]["id"]
+
+        # Writes while the next poll is paging: a note paged past is updated
+        # again, one not reached yet is deleted, another is created
+        async def between_pages(page):
+            if page == 1:
+                await crud.update_note(ids[1], content="v2 1")
+                await crud.delete_notes([ids[5]])
+                await crud.create_note("later", "v0 later")
+
+        cursor, more = await _pull(crud, mirror, cursor, 2, between_pages)
+        assert mirror == await _database(crud)
+        assert mirror[ids[1]] == "v2 1" and mirror[new] == "v0 late"
+        assert ids[0] not in mirror and ids[2] not in mirror and ids[5] not in mirror
+        # Every change is delivered once, in commit order
+        assert more == sorted(more) and len(set(more)) == len(more)
+        assert min(more) > max(seen)
+
+        # An idle poll returns nothing and keeps the cursor
+        page = (await crud.changes_since(cursor, 2)).data
+        assert page == {"notes": [], "deleted": [], "next_cursor": cursor, "has_more": False}
+
+    asyncio.run(run())
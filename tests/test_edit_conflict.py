@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+
+def _interfere(crud, monkeypatch, times):
+    """Let another writer change the note just before each of the first
+    ``times`` guarded updates; returns the list of attempts"""
+    backend = crud.get_backend()
+    update_note = backend.update_note
+    attempts = []
+
+    async def racing_update(note_id, values, expected_updated_at=None):
+        if expected_updated_at is not None:
+            attempts.append(expected_updated_at)
+            if len(attempts) <= times:
+                await update_note(note_id, {"content": f"other writer {len(attempts)}",
+                                            "updated_at": crud._now()})
+        return await update_note(note_id, values, expected_updated_at)
+
+    monkeypatch.setattr(backend, "update_note", racing_update)
+    return attempts
+
+
+def test_edit_retries_on_a_fresh_read(crud, monkeypatch):
+    async def run():
+        note_id = (await crud.create_note("Log", "start")).data[0]["id"]
+        attempts = _interfere(crud, monkeypatch, times=1)
+        response = await crud.append_to_note(note_id, "appended")
+        return attempts, response, (await crud.get_backend().get_note(note_id))["content"]
+
+    attempts, response, content = asyncio.run(run())
+    assert len(attempts) == 2
+    assert response.data["changes"]
+    # The second attempt re-applied the edit to the other writer's content
+    assert content == "other writer 1\nappended\n"
+
+
+def test_edit_conflict_fails_after_retries(crud, monkeypatch):
+    async def run():
+        note_id = (await crud.create_note("Log", "start")).data[0]["id"]
+        attempts = _interfere(crud, monkeypatch, times=crud.EDIT_RETRIES)
+        with pytest.raises(crud.ConflictError) as raised:
+            await crud.append_to_note(note_id, "appended")
+        return note_id, attempts, raised.value, (await crud.get_backend().get_note(note_id))["content"]
+
+    note_id, attempts, error, content = asyncio.run(run())
+    assert len(attempts) == crud.EDIT_RETRIES
+    assert error.note_id == note_id
+    # The edit never landed on top of the other writer's last version
+    assert content == f"other writer {crud.EDIT_RETRIES}"
+
+
+def test_edit_with_stale_expected_updated_at_fails_at_once(crud, monkeypatch):
+    async def run():
+        note = (await crud.create_note("Log", "start")).data[0]
+        await crud.update_note(note["id"], content="changed")
+        attempts = _interfere(crud, monkeypatch, times=0)
+        with pytest.raises(crud.ConflictError):
+            await crud.append_to_note(note["id"], "appended", expected_updated_at=note["updated_at"])
+        return attempts
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex  # noqa: E402
+
+
+def test_scores_stay_positive_after_edits():
+    index = SearchIndex()
+    for note_id in range(1, 11):
+        index.add({"id": note_id, "title": f"note {note_id}", "content": "alpha filler",
+                   "updated_at": "2024-01-01T00:00:00"})
+    index.add({"id": 11, "title": "other", "content": "alpha beta",
+               "updated_at": "2024-01-01T00:00:00"})
+    for round_ in range(3):
+        for note_id in range(1, 12):
+            content = "alpha beta" if note_id == 11 else f"alpha filler edit {round_}"
+            index.add({"id": note_id, "title": f"note {note_id}", "content": content,
+                       "updated_at": f"2024-01-0{round_ + 2}T00:00:00"})
+
+    hits = index.search("alpha beta", limit=20)
+    assert len(hits) == 11
+    assert all(hit["score"] > 0 for hit in hits)
+    # The note matching both terms ranks first
+    assert hits[0]["id"] == 11
+    assert hits[0]["score"] > hits[1]["score"]
+
+
+def test_removed_notes_drop_out_of_document_frequency():
+    index = SearchIndex()
+    for note_id in range(1, 6):
+        index.add({"id": note_id, "title": "t", "content": "gamma"})
+    for note_id in range(1, 5):
+        index.remove(note_id)
+    hits = index.search("gamma")
+    assert [hit["id"] for hit in hits] == [5]
+    assert hits[0]["score"] > 0
+    assert index._df["gamma"] == 1
@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+from write_behind import WriteBehind
+
+
+def _row(note_id, content):
+    return {"id": note_id, "title": f"note {note_id}", "content": content, "tags": [],
+            "updated_at": f"2024-01-01T00:00:0{len(content) % 10}"}
+
+
+def _crash(writes):
+    """Drop ``writes`` the way a killed process would: no flush, no close"""
+    os.close(writes._fd)
+
+
+def test_replay_after_crash_flushes_latest_rows(tmp_path):
+    path = str(tmp_path / "writes.log")
+
+    async def before_crash():
+        writes = WriteBehind(path, fsync=False, enabled=True)
+        await writes.append(_row(1, "first"))
+        await writes.append(_row(2, "other"))
+        await writes.append(_row(1, "second"))
+        _crash(writes)
+
+    asyncio.run(before_crash())
+    # The last line may be torn by the crash
+    with open(path, "ab") as fh:
+        fh.write(b'{"row":{"id":3,"con')
+
+    written = []
+
+    async def after_restart():
+        writes = WriteBehind(path, fsync=False, enabled=True)
+        assert {note_id: row["content"] for note_id, row in writes.pending.items()} == {1: "second", 2: "other"}
+
+        async def write(rows):
+            written.extend(rows)
+
+        writes.start(write)
+        await writes.flush()
+        await writes.close()
+        return writes
+
+    writes = asyncio.run(after_restart())
+    assert sorted((row["id"], row["content"]) for row in written) == [(1, "second"), (2, "other")]
+    assert not writes.pending
+    assert os.path.getsize(path) == 0
+
+
+def test_delete_discards_pending_write(tmp_path):
+    path = str(tmp_path / "writes.log")
+    written = []
+
+    async def write(rows):
+        written.extend(rows)
+
+    async def run():
+        writes = WriteBehind(path, flush_interval=60, fsync=False, enabled=True)
+        writes.start(write)
+        await writes.append(_row(1, "keep"))
+        await writes.append(_row(2, "drop"))
+        await writes.discard([2])
+        assert list(writes.pending) == [1]
+        _crash(writes)
+
+    asyncio.run(run())
+    # Neither a replay nor its flush brings the deleted note's write back
+    replayed = WriteBehind(path, fsync=False, enabled=True)
+    assert list(replayed.pending) == [1]
+
+    async def flush():
+        replayed.start(write)
+        await replayed.flush()
+        await replayed.close()
+
+    asyncio.run(flush())
+    assert [row["id"] for row in written] == [1]
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Sync an Obsidian vault directory into the notes table.
+
+Every markdown file becomes one note: the title is the file name, the content
+is the file as-is and the tags come from the YAML frontmatter plus inline
+#tags. A manifest in the vault (.obsidian-mcp-sync.json) remembers each file's
+size, mtime, content hash and note id, so a re-sync only reads files whose
+size or mtime changed and only uploads files whose hash changed. Files removed
+from the vault are deleted from the database (unless --keep-deleted).
+
+The sync runs in its own process, so a running server learns of the notes
+it wrote from the changes feed, which it polls every ``INDEX_SYNC_INTERVAL``
+seconds (default 30). Until then, or always with ``INDEX_SYNC_INTERVAL=0``,
+that server's search, tag, link and related-notes indexes miss them; restart
+it to pick them up at once.
+
+    python vault_sync.py ~/Obsidian/MyVault
+    python vault_sync.py ~/Obsidian/MyVault --dry-run
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+MANIFEST_NAME = ".obsidian-mcp-sync.json"
+SKIP_DIRS = {".obsidian", ".trash", ".git"}
+INLINE_TAG_RE = re.compile(r"(?<![\w&/#])#([^\s#.,;:!?()\[\]{}\"'`]+)")
+FENCE_RE = re.compile(r"^(```|~~~).*?^\1", re.MULTILINE | re.DOTALL)
+INLINE_CODE_RE = re.compile(r"`[^`\n]*`")
+
+
+def split_frontmatter(text: str) -> Tuple[Dict[str, Any], str]:
+    """Parse a leading ``---`` YAML block; returns (frontmatter, body)"""
+    if not text.startswith("---"):
+        return {}, text
+    end = re.search(r"^(---|\.\.\.)\s*$", text[3:], re.MULTILINE)
+    first_line_end = text.find("\n")
+    if end is None or first_line_end < 0 or text[3:first_line_end].strip():
+        return {}, text
+    try:
+        data = yaml.safe_load(text[first_line_end + 1:3 + end.start()]) or {}
+    except yaml.YAMLError:
+        return {}, text
+    return (data if isinstance(data, dict) else {}), text[3 + end.end():]
+
+
+def extract_tags(frontmatter: Dict[str, Any], body: str) -> List[str]:
+    tags: List[str] = []
+    raw = frontmatter.get("tags", frontmatter.get("tag"))
+    if isinstance(raw, str):
+        raw = re.split(r"[,\s]+", raw)
+    for tag in raw or []:
+        if tag is not None and str(tag).strip():
+            tags.append(str(tag).strip().lstrip("#"))
+
+    text = INLINE_CODE_RE.sub("", FENCE_RE.sub("", body))
+    for tag in INLINE_TAG_RE.findall(text):
+        if not tag.isdigit():  # "#123" is not a tag in Obsidian
+            tags.append(tag)
+    return list(dict.fromkeys(tags))
+
+
+def parse_file(vault: str, relpath: str) -> Dict[str, Any]:
+    """Read, hash and parse one file (runs in a worker process)"""
+    path = os.path.join(vault, relpath)
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    stat = os.stat(path)
+    text = raw.decode("utf-8", errors="replace")
+    frontmatter, body = split_frontmatter(text)
+    return {
+        "path": relpath,
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "title": os.path.splitext(os.path.basename(relpath))[0],
+        "content": text,
+        "tags": extract_tags(frontmatter, body),
+    }
+
+
+def scan_vault(vault: str) -> Dict[str, os.stat_result]:
+    files = {}
+    for root, dirs, names in os.walk(vault):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith(".")]
+        for name in names:
+            if name.endswith(".md"):
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, vault)] = os.stat(path)
+    return files
+
+
+def load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path) as fh:
+            return json.load(fh).get("files", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(path: str, files: Dict[str, Dict[str, Any]]):
+    # Written after every batch, atomically, so an interrupted sync never
+    # forgets a note it created (which would duplicate it next time)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump({"version": 1, "files": files}, fh)
+    os.replace(tmp, path)
+
+
+class Progress:
+    def __init__(self, label: str, total: int):
+        self.label, self.total, self.done = label, total, 0
+        self.start = self.last = time.perf_counter()
+
+    def advance(self, n: int = 1, force: bool = False):
+        self.done += n
+        now = time.perf_counter()
+        if force or now - self.last >= 1.0 or self.done == self.total:
+            self.last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            print(f"   {self.label}: {self.done}/{self.total} ({rate:,.0f}/s)", flush=True)
+
+
+async def sync_vault(vault: str, dry_run: bool = False, delete: bool = True,
+                     workers: Optional[int] = None, batch_size: Optional[int] = None) -> Dict[str, int]:
+    import crud
+
+    batch_size = min(batch_size or crud.MAX_BATCH_SIZE, crud.MAX_BATCH_SIZE)
+    manifest_path = os.path.join(vault, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    started = time.perf_counter()
+
+    files = scan_vault(vault)
+    print(f"🔍 {len(files)} markdown files in {vault} ({len(manifest)} known)")
+
+    # Unchanged size and mtime: skip without reading the file
+    candidates = [p for p, st in files.items()
+                  if p not in manifest
+                  or manifest[p].get("size") != st.st_size
+                  or manifest[p].get("mtime_ns") != st.st_mtime_ns]
+
+    parsed: List[Dict[str, Any]] = []
+    if candidates:
+        progress = Progress("parsed", len(candidates))
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [loop.run_in_executor(pool, parse_file, vault, p) for p in candidates]
+            for future in asyncio.as_completed(futures):
+                parsed.append(await future)
+                progress.advance()
+
+    creates, updates, touched = [], [], 0
+    for item in parsed:
+        known = manifest.get(item["path"])
+        if known and known.get("hash") == item["hash"]:
+            # Touched but identical: just remember the new mtime
+            known.update(mtime_ns=item["mtime_ns"], size=item["size"])
+            touched += 1
+        elif known and known.get("id") is not None:
+            updates.append(item)
+        else:
+            creates.append(item)
+
+    removed = [p for p in manifest if p not in files]
+    stats = {"files": len(files), "created": 0, "updated": 0, "deleted": 0,
+             "unchanged": len(files) - len(creates) - len(updates), "failed": 0}
+    print(f"📋 {len(creates)} new, {len(updates)} changed, {len(removed)} removed, "
+          f"{stats['unchanged']} unchanged")
+    if dry_run:
+        return stats
+
+    def record(item, note_id):
+        manifest[item["path"]] = {"id": note_id, "hash": item["hash"],
+                                  "mtime_ns": item["mtime_ns"], "size": item["size"]}
+
+    upload = Progress("uploaded", len(creates) + len(updates))
+    for i in range(0, len(creates), batch_size):
+        batch = creates[i:i + batch_size]
+        response = await crud.create_notes([
+            {"title": it["title"], "content": it["content"], "tags": it["tags"]} for it in batch])
+        for item, result in zip(batch, response.data):
+            if result["success"]:
+                record(item, result["note"]["id"])
+                stats["created"] += 1
+            else:
+                stats["failed"] += 1
+                print(f"   ❌ {item['path']}: {result['error']}", file=sys.stderr)
+        save_manifest(manifest_path, manifest)
+        upload.advance(len(batch), force=True)
+
+    for i in range(0, len(updates), batch_size):
+        batch = updates[i:i + batch_size]
+        response = await crud.update_notes([
+            {"id": manifest[it["path"]]["id"], "title": it["title"],
+             "content": it["content"], "tags": it["tags"]} for it in batch])
+        for item, result in zip(batch, response.data):
+            if result["success"]:
+                record(item, result["note"]["id"])
+                stats["updated"] += 1
+            elif result.get("error") == "Note not found":
+                # Deleted on the server: forget it so the next sync re-creates it
+                manifest.pop(item["path"], None)
+                stats["failed"] += 1
+                print(f"   ⚠️  {item['path']}: note was deleted remotely, will be re-created",
+                      file=sys.stderr)
+            else:
+                stats["failed"] += 1
+                print(f"   ❌ {item['path']}: {result['error']}", file=sys.stderr)
+        save_manifest(manifest_path, manifest)
+        upload.advance(len(batch), force=True)
+
+    if removed and delete:
+        ids = [manifest[p]["id"] for p in removed if manifest[p].get("id") is not None]
+        for i in range(0, len(ids), batch_size):
+            response = await crud.delete_notes(ids[i:i + batch_size])
+            stats["deleted"] += len(response.data)
+        for path in removed:
+            manifest.pop(path)
+    elif removed:
+        for path in removed:
+            manifest.pop(path)
+
+    if touched or removed or not os.path.exists(manifest_path):
+        save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Synced in {elapsed:.1f}s: {stats['created']} created, {stats['updated']} updated, "
+          f"{stats['deleted']} deleted, {stats['unchanged']} unchanged, {stats['failed']} failed "
+          f"({len(files) / max(elapsed, 1e-9):,.0f} files/s)")
+    await crud.stop_write_behind()
+    await crud.close_backend()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync an Obsidian vault into the notes database")
+    parser.add_argument("vault", help="path to the vault directory")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change, upload nothing")
+    parser.add_argument("--keep-deleted", action="store_true",
+                        help="don't delete notes whose files were removed from the vault")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=None, help="notes per database request")
+    args = parser.parse_args()
+
+    vault = os.path.abspath(os.path.expanduser(args.vault))
+    if not os.path.isdir(vault):
+        print(f"❌ Not a directory: {vault}")
+        sys.exit(1)
+    stats = asyncio.run(sync_vault(vault, args.dry_run, not args.keep_deleted, args.workers, args.batch_size))
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Write-behind for note updates: acknowledge once logged, write to the database in batches.
+
+With ``WRITE_BEHIND=1`` an update is merged into the note's full row, appended
+to a local append-only log (one JSON line, fsynced) and acknowledged. The
+fsync runs on a worker thread, and appends that arrive while one is running
+share the next (group commit), so the event loop never waits on the disk. A
+background flusher waits ``WRITE_FLUSH_INTERVAL`` seconds for more writes,
+keeps only the latest row per note, and writes them with one bulk update per
+``WRITE_BATCH_SIZE`` notes. A note saved on every keystroke costs one log
+append per save and one database write per interval.
+
+Rows waiting to be flushed are kept in ``pending`` so reads in this process
+see them (crud checks it before the cache and the database). On startup the
+log is replayed into ``pending``, so acknowledged writes survive a crash and
+are flushed once the database is reachable. Deleting a note drops its pending
+row and logs a ``{"delete": id}`` line, so neither a flush nor a replay
+brings the note back; a flush only updates notes that still exist, so one
+deleted by another client isn't either. Once everything logged has been
+flushed the log is truncated; while rows remain it is rewritten with only
+those.
+
+Settings come from the environment:
+
+- ``WRITE_BEHIND``          1 to enable (default off: every write is a round trip)
+- ``WRITE_LOG_PATH``        the log file (default ``data/writes.log``; a
+  ``writes.log`` left in the working directory by an older version is still used)
+- ``WRITE_FLUSH_INTERVAL``  seconds a write may wait before it is flushed (default 0.5)
+- ``WRITE_BATCH_SIZE``      notes per bulk update (default 200)
+- ``WRITE_LOG_FSYNC``       0 to skip fsync per append (survives a crash of the
+  process, not of the machine)
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING_WRITES = metrics.registry.gauge("mcp_write_behind_pending", "Notes with logged writes not yet flushed")
+FLUSHED_WRITES = metrics.registry.counter(
+    "mcp_write_behind_rows_total",
+    "Logged writes by outcome: flushed, coalesced (superseded before a flush) or failed (retried later)",
+    ("outcome",))
+
+# Longest wait between retries while the database keeps failing
+MAX_RETRY_DELAY = 30.0
+
+DEFAULT_PATH = os.path.join("data", "writes.log")
+LEGACY_PATH = "writes.log"
+
+
+class WriteBehind:
+    """Durable log of pending note rows plus the task that flushes them"""
+
+    def __init__(self, path: str = DEFAULT_PATH, flush_interval: float = 0.5, batch_size: int = 200,
+                 fsync: bool = True, enabled: bool = False):
+        self.enabled = enabled
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync
+        self.pending: Dict[int, Dict[str, Any]] = {}  # note id -> row to write
+        self.flushed = 0
+        self.coalesced = 0
+        self.failures = 0
+        self._records = 0  # lines in the log
+        self._written = 0  # lines ever appended; _synced of them are known durable
+        self._synced = 0
+        self._syncing: Optional[asyncio.Future] = None
+        self._fd: Optional[int] = None
+        self._write: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        if enabled:
+            self._replay()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+    @classmethod
+    def from_env(cls) -> "WriteBehind":
+        return cls(
+            # Unflushed writes may still sit in a log at the old default location
+            path=os.getenv("WRITE_LOG_PATH") or (LEGACY_PATH if os.path.exists(LEGACY_PATH) else DEFAULT_PATH),
+            flush_interval=float(os.getenv("WRITE_FLUSH_INTERVAL", 0.5)),
+            batch_size=int(os.getenv("WRITE_BATCH_SIZE", 200)),
+            fsync=os.getenv("WRITE_LOG_FSYNC", "1").lower() not in ("0", "false", "no", "off"),
+            enabled=os.getenv("WRITE_BEHIND", "0").lower() in ("1", "true", "yes", "on"),
+        )
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as fh:
+            for number, line in enumerate(fh, 1):
+                try:
+                    record = json.loads(line)
+                    if "delete" in record:
+                        self.pending.pop(record["delete"], None)
+                    else:
+                        row = record["row"]
+                        self.pending[row["id"]] = row
+                except (ValueError, KeyError, TypeError):
+                    # Only the last line can be torn by a crash mid-append
+                    logger.warning("Skipping unreadable line %d of the write log %s", number, self.path)
+                    continue
+                self._records += 1
+        if self.pending:
+            logger.info("Replayed %d unflushed note writes from %s", len(self.pending), self.path)
+        self._gauge()
+
+    def start(self, write: Callable[[List[Dict[str, Any]]], Awaitable[Any]]):
+        """Flush with ``write(rows)`` from now on (a bulk update that raises on failure)"""
+        self._write = write
+        if self.enabled and self._task is None:
+            self._wake = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            if self.pending:
+                self._wake.set()
+
+    async def append(self, row: Dict[str, Any]):
+        """Log ``row`` (a full note row with ``id``) and queue it for the next
+        flush; returns once the line is on disk"""
+        self._log({"row": row})
+        if row["id"] in self.pending:
+            self.coalesced += 1
+            if metrics.ENABLED:
+                FLUSHED_WRITES.inc("coalesced")
+        self.pending[row["id"]] = row
+        self._gauge()
+        if self._wake is not None:
+            self._wake.set()
+        await self._sync()
+
+    def _log(self, record: Dict[str, Any]):
+        os.write(self._fd, json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        self._records += 1
+        self._written += 1
+
+    async def _sync(self):
+        """Wait until every line written so far has been fsynced"""
+        if not self.fsync:
+            return
+        target = self._written
+        while self._synced < target:
+            if self._syncing is None:
+                self._syncing = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self._syncing)
+
+    async def _fsync(self):
+        upto = self._written
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, self._fd)
+            self._synced = max(self._synced, upto)
+        finally:
+            self._syncing = None
+
+    async def discard(self, note_ids: Iterable[int]):
+        """Drop pending rows of notes that are being deleted and log the deletes.
+        Waits for a flush in progress, which may be writing those rows."""
+        if not self.enabled:
+            return
+        if self._lock is None:
+            self._discard(note_ids)
+        else:
+            async with self._lock:
+                self._discard(note_ids)
+        await self._sync()
+
+    def _discard(self, note_ids: Iterable[int]):
+        for note_id in note_ids:
+            if self.pending.pop(note_id, None) is not None:
+                self._log({"delete": note_id})
+        self._gauge()
+
+    async def _run(self):
+        delay = self.flush_interval
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(delay)  # let more writes to the same notes arrive
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Flushing %d logged note writes failed; retrying", len(self.pending))
+                delay = min(max(delay, 0.5) * 2, MAX_RETRY_DELAY)
+                self._wake.set()
+            else:
+                delay = self.flush_interval
+
+    async def flush(self, note_ids: Optional[Iterable[int]] = None):
+        """Write pending rows now (only those of ``note_ids`` if given); raises if the write fails"""
+        if not self.pending or self._lock is None:
+            return
+        wanted = None if note_ids is None else set(note_ids)
+        async with self._lock:
+            while True:
+                batch = [row for note_id, row in self.pending.items() if wanted is None or note_id in wanted]
+                if not batch:
+                    break
+                batch = batch[:self.batch_size]
+                try:
+                    await self._write(batch)
+                except Exception:
+                    self.failures += len(batch)
+                    if metrics.ENABLED:
+                        FLUSHED_WRITES.inc("failed", amount=len(batch))
+                    raise
+                for row in batch:
+                    # A newer write that arrived meanwhile stays queued
+                    if self.pending.get(row["id"]) is row:
+                        del self.pending[row["id"]]
+                self.flushed += len(batch)
+                if metrics.ENABLED:
+                    FLUSHED_WRITES.inc("flushed", amount=len(batch))
+            # The old file's descriptor is replaced, so no fsync may be using it
+            while self._syncing is not None:
+                await asyncio.shield(self._syncing)
+            self._compact()
+            self._gauge()
+
+    def has_pending(self, note_ids: Iterable[int]) -> bool:
+        return bool(self.pending) and any(note_id in self.pending for note_id in note_ids)
+
+    def _compact(self):
+        """Shrink the log to the rows still pending"""
+        if self._records == len(self.pending):
+            return
+        if not self.pending:
+            os.ftruncate(self._fd, 0)
+        else:
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as fh:
+                for row in self.pending.values():
+                    fh.write(json.dumps({"row": row}, separators=(",", ":")).encode() + b"\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+            os.close(self._fd)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._records = len(self.pending)
+        # Every pending row is in the new, fsynced file; dropped ones need no durability
+        self._synced = self._written
+
+    async def close(self):
+        """Stop the flusher after a last flush; anything unflushed stays in the log"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("%d note writes stay in %s until the next start", len(self.pending), self.path)
+
+    def _gauge(self):
+        if metrics.ENABLED:
+            PENDING_WRITES.set(len(self.pending))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.pending),
+            "flushed": self.flushed,
+            "coalesced": self.coalesced,
+            "failed_attempts": self.failures,
+            "log_records": self._records,
+            "path": self.path if self.enabled else None,
+        }